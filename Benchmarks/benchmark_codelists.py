@@ -0,0 +1,87 @@
+"""Compares parsing and partitioning a synthetic codelists file the size of the production all.ttl into one Graph per
+concept scheme, as the OTLEnumerationCreator used to, with the concept uri tuples of parse_graph_to_dict: the time
+until the codelists are ready and the memory they keep. Also times the lazy index, looking up as many schemes as a
+subset typically uses. Run from the repository root with:
+python -m Benchmarks.benchmark_codelists"""
+
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import rdflib
+from rdflib import Graph, RDF, SKOS
+
+from LazyCodelistIndex import LazyCodelistIndex
+from OTLEnumerationCreator import OTLEnumerationCreator
+
+SCHEME = 'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/'
+CONCEPT = 'https://wegenenverkeer.data.vlaanderen.be/id/concept/'
+
+
+def write_codelists(path: Path, scheme_count: int, concepts_per_scheme: int):
+    with open(path, 'w', encoding='utf-8') as ttl_file:
+        ttl_file.write('@prefix skos: <http://www.w3.org/2004/02/skos/core#> .\n')
+        for s in range(scheme_count):
+            scheme_uri = f'<{SCHEME}Kl{s}>'
+            ttl_file.write(f'{scheme_uri} a skos:ConceptScheme; skos:prefLabel "keuzelijst {s}"@nl; '
+                           f'skos:definition "Keuzelijst {s}."@nl.\n')
+            for c in range(concepts_per_scheme):
+                ttl_file.write(f'<{CONCEPT}Kl{s}/waarde-{c}> a skos:Concept; skos:definition "waarde {c}"@nl; '
+                               f'skos:inScheme {scheme_uri}; skos:notation "waarde-{c}"; '
+                               f'skos:prefLabel "waarde {c}"@nl; skos:topConceptOf {scheme_uri}.\n')
+
+
+def parse_graph_to_graphs(path_ttl_file: Path) -> dict:
+    """The previous partitioning, one Graph per concept scheme, only for comparison."""
+    g = rdflib.Graph()
+    g.parse(path_ttl_file, format="turtle")
+    keuzelijst_dict = {}
+    for keuzelijst_uri in set(g.subjects(predicate=RDF.type, object=SKOS.ConceptScheme)):
+        keuzelijst_graph = Graph()
+        for triple in g.triples((keuzelijst_uri, None, None)):
+            keuzelijst_graph.add(triple)
+        for keuzelijst_waarde_uri in g.subjects(predicate=SKOS.inScheme, object=keuzelijst_uri):
+            for triple in g.triples((keuzelijst_waarde_uri, None, None)):
+                keuzelijst_graph.add(triple)
+        keuzelijst_dict[str(keuzelijst_uri)] = keuzelijst_graph
+    return keuzelijst_dict
+
+
+def measure(function, path: Path) -> (float, float, float):
+    """Returns the seconds until ready, and the peak and the retained MiB. The memory is measured in a second run,
+    tracemalloc slows the parsing down too much to time it."""
+    start = time.perf_counter()
+    function(path)
+    duration = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    codelists = function(path)
+    # the parsed graph has reference cycles, only the garbage collector frees it
+    gc.collect()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del codelists
+    return duration, peak / 1024 / 1024, size / 1024 / 1024
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ttl_path = Path(temp_dir) / 'all.ttl'
+        write_codelists(ttl_path, scheme_count=700, concepts_per_scheme=30)
+        print(f'{ttl_path.stat().st_size / 1024 / 1024:.1f} MiB codelists file')
+        for name, function in [('graph per scheme', parse_graph_to_graphs),
+                               ('concept tuples', OTLEnumerationCreator.parse_graph_to_dict)]:
+            duration, peak, retained = measure(function, ttl_path)
+            print(f'{name:16} ready in {duration:.2f} s, peak {peak:.0f} MiB, retained {retained:.1f} MiB')
+
+        start = time.perf_counter()
+        index = LazyCodelistIndex(ttl_path.read_bytes())
+        index_duration = time.perf_counter() - start
+        start = time.perf_counter()
+        for scheme_uri in list(index)[:40]:
+            index.get(scheme_uri)
+        print(f'lazy index       ready in {index_duration:.2f} s, 40 schemes looked up in '
+              f'{time.perf_counter() - start:.2f} s')
@@ -0,0 +1,70 @@
+"""Times writing the shapes of a synthetic OTL model sequentially, in a Graph serialized as Turtle and streamed to
+N-Triples, and with build_shapes_in_parallel for a growing number of processes.
+Run from the repository root with: python -m Benchmarks.benchmark_parallel_build"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from rdflib import Graph
+
+from Benchmarks.synthetic_rows import create_class_rows, create_property_rows, create_complex_attribute_rows
+from NTriplesWriter import NTriplesWriter
+from OTLShaclGenerator import OTLShaclGenerator
+
+
+def add_stages(g, stage_rows):
+    shape_index = {}
+    OTLShaclGenerator.add_classes_to_graph(g, stage_rows['classes'])
+    OTLShaclGenerator.add_properties_to_graph(g, stage_rows['properties'], shape_index=shape_index)
+    OTLShaclGenerator.add_complex_attributes_to_graph(g, stage_rows['complex'], shape_index=shape_index)
+
+
+def build_graph(stage_rows, path: Path):
+    g = Graph()
+    add_stages(g, stage_rows)
+    g.serialize(format='turtle', destination=path)
+
+
+def stream(stage_rows, path: Path):
+    with NTriplesWriter(path) as writer:
+        add_stages(writer, stage_rows)
+
+
+def build_in_parallel(stage_rows, path: Path, jobs: int):
+    with NTriplesWriter(path) as writer:
+        OTLShaclGenerator.build_shapes_in_parallel(writer, stage_rows=stage_rows, jobs=jobs)
+
+
+def compare(duration: float, baseline: float) -> str:
+    if duration <= baseline:
+        return f'{baseline / duration:.2f}x faster'
+    return f'{duration / baseline:.2f}x slower'
+
+
+if __name__ == '__main__':
+    class_count = 5000
+    datatype_count = class_count // 5
+    stage_rows = {'classes': create_class_rows(class_count),
+                  'properties': create_property_rows(class_count=class_count, datatype_count=datatype_count),
+                  'complex': create_complex_attribute_rows(datatype_count=datatype_count, attributes_per_datatype=5)}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / 'shacl'
+        start = time.perf_counter()
+        build_graph(stage_rows, path)
+        sequential_time = time.perf_counter() - start
+        print(f'sequential, graph + turtle: {sequential_time:.2f}s ({os.cpu_count()} cpus available)')
+
+        start = time.perf_counter()
+        stream(stage_rows, path)
+        stream_time = time.perf_counter() - start
+        print(f'sequential, streamed: {stream_time:.2f}s ({compare(stream_time, sequential_time)})')
+
+        for jobs in [2, 4]:
+            start = time.perf_counter()
+            build_in_parallel(stage_rows, path, jobs)
+            parallel_time = time.perf_counter() - start
+            print(f'{jobs} jobs: {parallel_time:.2f}s ({compare(parallel_time, sequential_time)} than graph + turtle, '
+                  f'{compare(parallel_time, stream_time)} than streamed)')
@@ -0,0 +1,50 @@
+"""Compares the datatype-to-shape linking of add_attributes_to_graph: graph query per row versus building the shape
+index and looking the rows up in it, for datatypes used by a few shapes and by many shapes.
+Run from the repository root with: python -m Benchmarks.benchmark_shape_index"""
+
+import time
+
+from rdflib import Graph, RDFS, URIRef, SH
+
+from Benchmarks.synthetic_rows import create_property_rows, create_complex_attribute_rows
+from OTLShaclGenerator import OTLShaclGenerator
+
+
+def links_by_query(g: Graph, rows: [tuple]) -> [tuple]:
+    """The lookup as it was done before the shape index: one query on the shapes graph per row."""
+    return [(subj, SH.property, URIRef(row[9] + 'Shape'))
+            for row in rows
+            for subj in g.subjects(predicate=RDFS.comment, object=URIRef(row[1]))]
+
+
+def links_by_index(property_rows: [tuple], rows: [tuple]) -> [tuple]:
+    shape_index = {}
+    OTLShaclGenerator.add_rows_to_shape_index(shape_index, 'properties', property_rows)
+    return [(subj, SH.property, URIRef(row[9] + 'Shape'))
+            for row in rows
+            for subj in shape_index.get(URIRef(row[1]), ())]
+
+
+def best_of(repeat: int, function) -> (float, list):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+if __name__ == '__main__':
+    for class_count in [500, 1000, 2000, 4000]:
+        for label, datatype_count in [('few shapes per datatype', class_count // 5),
+                                      ('many shapes per datatype', 10)]:
+            property_rows = create_property_rows(class_count=class_count, datatype_count=datatype_count)
+            attribute_rows = create_complex_attribute_rows(datatype_count=datatype_count, attributes_per_datatype=5)
+            g = OTLShaclGenerator.add_properties_to_graph(Graph(), property_rows)
+
+            query_time, query_links = best_of(3, lambda: links_by_query(g, attribute_rows))
+            index_time, index_links = best_of(3, lambda: links_by_index(property_rows, attribute_rows))
+
+            assert set(query_links) == set(index_links)
+            print(f'{class_count:>5} classes, {label}: query {query_time:.3f}s, build index and look up '
+                  f'{index_time:.3f}s ({query_time / index_time:.1f}x)')
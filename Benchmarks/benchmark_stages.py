@@ -0,0 +1,41 @@
+"""Times every shape building stage of the generator on a synthetic OTL model, so changes to the hot loops can be
+tracked. Run from the repository root with: python -m Benchmarks.benchmark_stages"""
+
+import time
+
+from rdflib import Graph
+
+from Benchmarks.synthetic_rows import create_class_rows, create_property_rows, create_complex_attribute_rows, \
+    create_union_attribute_rows, create_relation_rows
+from OTLShaclGenerator import OTLShaclGenerator
+
+
+def time_stage(name: str, function, repeat: int = 3):
+    durations = []
+    for _ in range(repeat):
+        g = Graph()
+        start = time.perf_counter()
+        function(g)
+        durations.append(time.perf_counter() - start)
+    print(f'{name:<22} {len(g):>8} triples  best of {repeat}: {min(durations):.3f}s')
+
+
+if __name__ == '__main__':
+    class_count = 4000
+    datatype_count = class_count // 5
+    class_rows = create_class_rows(class_count)
+    property_rows = create_property_rows(class_count=class_count, datatype_count=datatype_count)
+    complex_rows = create_complex_attribute_rows(datatype_count=datatype_count, attributes_per_datatype=5)
+    union_rows = create_union_attribute_rows(datatype_count=datatype_count // 4, attributes_per_datatype=4)
+    relation_rows = create_relation_rows(class_count=class_count // 10, relation_count=10, targets_per_class=3)
+    shape_index = {}
+    OTLShaclGenerator.add_rows_to_shape_index(shape_index, 'properties', property_rows)
+
+    time_stage('classes', lambda g: OTLShaclGenerator.add_classes_to_graph(g, class_rows))
+    time_stage('owl classes', lambda g: OTLShaclGenerator.add_owl_classes_to_graph(g, class_rows))
+    time_stage('properties', lambda g: OTLShaclGenerator.add_properties_to_graph(g, property_rows))
+    time_stage('complex attributes', lambda g: OTLShaclGenerator.add_complex_attributes_to_graph(
+        g, complex_rows, shape_index={k: dict(v) for k, v in shape_index.items()}))
+    time_stage('union attributes', lambda g: OTLShaclGenerator.add_union_attributes_to_graph(
+        g, union_rows, shape_index={k: dict(v) for k, v in shape_index.items()}))
+    time_stage('relations', lambda g: OTLShaclGenerator.add_relations_to_graph(g, relation_rows))
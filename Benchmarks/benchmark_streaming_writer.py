@@ -0,0 +1,56 @@
+"""Compares the peak memory of building the class, property and complex attribute shapes of a synthetic OTL model in a
+Graph and serializing it as Turtle, with writing the same stages straight to N-Triples with the NTriplesWriter.
+Run from the repository root with: python -m Benchmarks.benchmark_streaming_writer"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from rdflib import Graph
+
+from Benchmarks.synthetic_rows import create_class_rows, create_property_rows, create_complex_attribute_rows
+from NTriplesWriter import NTriplesWriter
+from OTLShaclGenerator import OTLShaclGenerator
+
+
+def add_stages(g, class_rows, property_rows, attribute_rows):
+    shape_index = {}
+    OTLShaclGenerator.add_classes_to_graph(g, class_rows)
+    OTLShaclGenerator.add_properties_to_graph(g, property_rows, shape_index=shape_index)
+    OTLShaclGenerator.add_complex_attributes_to_graph(g, attribute_rows, shape_index=shape_index)
+
+
+def measure(function) -> (float, float):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak / 1024 / 1024
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for class_count in [1000, 4000]:
+            datatype_count = class_count // 5
+            class_rows = create_class_rows(class_count)
+            property_rows = create_property_rows(class_count=class_count, datatype_count=datatype_count)
+            attribute_rows = create_complex_attribute_rows(datatype_count=datatype_count, attributes_per_datatype=5)
+
+            def build_graph():
+                g = Graph()
+                add_stages(g, class_rows, property_rows, attribute_rows)
+                g.serialize(format='turtle', destination=Path(tmp_dir) / 'shacl.ttl')
+
+            def stream():
+                with NTriplesWriter(Path(tmp_dir) / 'shacl.nt') as writer:
+                    add_stages(writer, class_rows, property_rows, attribute_rows)
+
+            graph_time, graph_peak = measure(build_graph)
+            stream_time, stream_peak = measure(stream)
+            size = os.path.getsize(Path(tmp_dir) / 'shacl.nt') / 1024 / 1024
+            print(f'{class_count:>5} classes ({size:.1f} MB N-Triples): graph + turtle {graph_time:.2f}s, '
+                  f'peak {graph_peak:.1f} MB; streaming {stream_time:.2f}s, peak {stream_peak:.1f} MB')
@@ -0,0 +1,71 @@
+"""Compares the typed subset model with the plain sqlite3 tuples: memory per record, and the time to get the rows of
+a subset by querying SQLite versus loading a saved model. Run from the repository root with:
+python -m Benchmarks.benchmark_subset_model"""
+
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from Benchmarks.synthetic_rows import create_property_rows
+from OTLShaclGenerator import OTLShaclGenerator
+from OTLSubsetModel import OTLSubsetModel, PropertyRecord
+from SQLDbReader import SQLDbReader
+
+
+class SlotsPropertyRecord:
+    """The __slots__ alternative to the PropertyRecord NamedTuple, only for comparison."""
+    __slots__ = PropertyRecord._fields
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+
+def bytes_per_record(create_records, rows: [tuple]) -> float:
+    tracemalloc.start()
+    records = create_records(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(records)
+
+
+def best_time(function, repeat: int = 5) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+if __name__ == '__main__':
+    # the field values are shared by all representations, so only the record containers are measured
+    rows = create_property_rows(class_count=50000, datatype_count=1000)
+    print(f'{len(rows)} property records')
+    print(f'tuple       {bytes_per_record(lambda r: [tuple([*row]) for row in r], rows):6.1f} bytes per record')
+    print(f'NamedTuple  {bytes_per_record(lambda r: list(map(PropertyRecord._make, r)), rows):6.1f} bytes per record')
+    print(f'__slots__   {bytes_per_record(lambda r: [SlotsPropertyRecord(*row) for row in r], rows):6.1f} '
+          f'bytes per record')
+
+    subset_path = Path('OTL_Dynamische_borden.db')
+
+    def read_rows():
+        with SQLDbReader(subset_path) as reader:
+            OTLShaclGenerator.read_model_from_reader(reader)
+
+    with SQLDbReader(subset_path) as subset_reader:
+        model = OTLShaclGenerator.read_model_from_reader(subset_reader)
+    large_model = OTLSubsetModel.from_rows(classes=[], properties=rows, inheritances=[], union_attributes=[],
+                                           complex_attributes=[], primitive_attributes=[], enums=[], relations=[])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = Path(temp_dir) / 'subset.model'
+        model.save(model_path)
+        print(f'{subset_path}: query {best_time(read_rows) * 1000:.1f} ms, '
+              f'load saved model {best_time(lambda: OTLSubsetModel.load(model_path)) * 1000:.1f} ms')
+
+        large_model_path = Path(temp_dir) / 'large.model'
+        save_time = best_time(lambda: large_model.save(large_model_path), repeat=3)
+        load_time = best_time(lambda: OTLSubsetModel.load(large_model_path), repeat=3)
+        print(f'{len(rows)} synthetic properties: save {save_time * 1000:.1f} ms, load {load_time * 1000:.1f} ms, '
+              f'{large_model_path.stat().st_size / 1024 / 1024:.1f} MiB')
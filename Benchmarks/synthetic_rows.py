@@ -0,0 +1,53 @@
+"""Builds synthetic OTL subset rows in the same positional layout as the read_*_from_reader queries, so the
+generator stages can be timed on a model of arbitrary size without needing a large subset database."""
+
+IMEL = 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#'
+ONDERDEEL = 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#'
+XSD_STRING = 'http://www.w3.org/2001/XMLSchema#string'
+
+
+def create_class_rows(class_count: int) -> [tuple]:
+    return [(f'Class {i}', f'Class{i}', f'{ONDERDEEL}Class{i}', f'definition {i}', '', 0, '')
+            for i in range(class_count)]
+
+
+def create_property_rows(class_count: int, datatype_count: int) -> [tuple]:
+    """One primitive and one complex property per class, the complex ones spread over the datatypes."""
+    rows = []
+    for i in range(class_count):
+        class_uri = f'{ONDERDEEL}Class{i}'
+        rows.append((f'name{i}', f'name {i}', '', class_uri, '1', '1', f'{class_uri}.name', XSD_STRING, 0, '', 0,
+                     '', '', 'OSLODatatypePrimitive'))
+        rows.append((f'complex{i}', f'complex {i}', '', class_uri, '1', '1', f'{class_uri}.complex',
+                     f'{IMEL}DtcType{i % datatype_count}', 0, '', 0, '', '', 'OSLODatatypeComplex'))
+    return rows
+
+
+def create_complex_attribute_rows(datatype_count: int, attributes_per_datatype: int) -> [tuple]:
+    rows = []
+    for d in range(datatype_count):
+        dtc_uri = f'{IMEL}DtcType{d}'
+        for a in range(attributes_per_datatype):
+            rows.append((f'DtcType{d}', dtc_uri, f'Type {d}', '', f'attr{a}', f'attr {a}', dtc_uri, '1', '1',
+                         f'{dtc_uri}.attr{a}', XSD_STRING, '', '', 'OSLODatatypePrimitive'))
+    return rows
+
+
+def create_union_attribute_rows(datatype_count: int, attributes_per_datatype: int) -> [tuple]:
+    rows = []
+    for d in range(datatype_count):
+        dtu_uri = f'{IMEL}DtuType{d}'
+        for a in range(attributes_per_datatype):
+            rows.append((f'DtuType{d}', dtu_uri, f'Union {d}', '', f'attr{a}', f'attr {a}', dtu_uri, '0', '1',
+                         f'{dtu_uri}.attr{a}', XSD_STRING, '', '', 'OSLODatatypePrimitive'))
+    return rows
+
+
+def create_relation_rows(class_count: int, relation_count: int, targets_per_class: int) -> [tuple]:
+    rows = []
+    for r in range(relation_count):
+        for i in range(class_count):
+            for t in range(targets_per_class):
+                rows.append(('', '', f'{ONDERDEEL}Class{i}', f'{ONDERDEEL}Class{(i + t + 1) % class_count}',
+                             f'{ONDERDEEL}Relation{r}', 'Source -> Destination', '', ''))
+    return rows
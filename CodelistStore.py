@@ -0,0 +1,130 @@
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Mapping, Tuple
+
+from rdflib import URIRef
+
+from LazyCodelistIndex import LazyCodelistIndex
+from OTLEnumerationCreator import OTLEnumerationCreator
+
+
+class CodelistStore:
+    """Thread safe store of the codelists (concept scheme uri -> concept uris) of every environment. The codelists of
+    an environment are loaded once with an OTLEnumerationCreator, on first use or with prefetch, also when several
+    threads ask for them at the same time. When the codelists of all environments are estimated to take more than
+    max_size bytes, the least recently used environments are evicted, and loaded again when they are needed. The size
+    of a lazy index is estimated again whenever get_concepts parses more of it."""
+    default_max_size = 512 * 1024 * 1024
+
+    def __init__(self, max_size: int = default_max_size, cache_dir: Path = None,
+                 codelist_paths: Dict[str, Path] = None, offline: bool = False, lazy: bool = False,
+                 loader: Callable[[str], Mapping[str, Tuple[URIRef, ...]]] = None):
+        """cache_dir, offline and lazy are passed to the OTLEnumerationCreator of every environment, codelist_paths
+        maps an environment to its local codelists file. A loader replaces the OTLEnumerationCreator."""
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.codelist_paths = codelist_paths or {}
+        self.offline = offline
+        self.lazy = lazy
+        self.loader = loader or self.load
+        self.lock = threading.Lock()
+        # env -> future with its codelists, from least to most recently used
+        self.futures: OrderedDict[str, Future] = OrderedDict()
+        self.sizes: Dict[str, int] = {}
+
+    def load(self, env: str) -> Mapping[str, Tuple[URIRef, ...]]:
+        return OTLEnumerationCreator(oslo_collector=None, env=env, cache_dir=self.cache_dir,
+                                     codelist_path=self.codelist_paths.get(env), offline=self.offline,
+                                     lazy=self.lazy).read_codelists()
+
+    def get_codelists(self, env: str = OTLEnumerationCreator.default_environment) -> Mapping[str, Tuple[URIRef, ...]]:
+        with self.lock:
+            future = self.futures.get(env)
+            load = future is None
+            if load:
+                future = Future()
+                self.futures[env] = future
+            else:
+                self.futures.move_to_end(env)
+
+        if load:
+            try:
+                codelists = self.loader(env)
+            except BaseException as exc:
+                with self.lock:
+                    if self.futures.get(env) is future:
+                        del self.futures[env]
+                future.set_exception(exc)
+                raise
+            future.set_result(codelists)
+            with self.lock:
+                if self.futures.get(env) is future:
+                    self.sizes[env] = self.get_size(codelists)
+                    self.evict(keep=env)
+        return future.result()
+
+    def get_concepts(self, keuzelijstnaam: str,
+                     env: str = OTLEnumerationCreator.default_environment) -> Tuple[URIRef, ...]:
+        codelists = self.get_codelists(env)
+        if not isinstance(codelists, LazyCodelistIndex):
+            return OTLEnumerationCreator.get_concepts(codelists, keuzelijstnaam)
+        parsed_count = len(codelists.concepts)
+        try:
+            return OTLEnumerationCreator.get_concepts(codelists, keuzelijstnaam)
+        finally:
+            if len(codelists.concepts) != parsed_count:
+                self.update_size(env, codelists)
+
+    def update_size(self, env: str, codelists: Mapping[str, Tuple[URIRef, ...]]):
+        """Estimates the size of the codelists of env again, if they are still stored, and evicts other
+        environments when the store no longer fits in max_size."""
+        with self.lock:
+            future = self.futures.get(env)
+            if future is not None and future.done() and future.result() is codelists:
+                self.sizes[env] = self.get_size(codelists)
+                self.evict(keep=env)
+
+    def put(self, env: str, codelists: Mapping[str, Tuple[URIRef, ...]]):
+        """Stores codelists that were loaded elsewhere, replacing those of the environment."""
+        future = Future()
+        future.set_result(codelists)
+        with self.lock:
+            self.futures[env] = future
+            self.futures.move_to_end(env)
+            self.sizes[env] = self.get_size(codelists)
+            self.evict(keep=env)
+
+    def prefetch(self, envs: Iterable[str]):
+        """Loads the codelists of the environments at the same time."""
+        envs = list(envs)
+        with ThreadPoolExecutor(max_workers=max(len(envs), 1)) as executor:
+            for future in [executor.submit(self.get_codelists, env) for env in envs]:
+                future.result()
+
+    def evict(self, keep: str):
+        """Evicts the least recently used, loaded environments other than keep until the store fits in max_size.
+        Must be called holding the lock."""
+        for env in list(self.futures):
+            if sum(self.sizes.values()) <= self.max_size:
+                return
+            if env != keep and env in self.sizes:
+                del self.futures[env]
+                del self.sizes[env]
+
+    @staticmethod
+    def get_size(codelists: Mapping[str, Tuple[URIRef, ...]]) -> int:
+        """Estimates the bytes the codelists take: the uri strings, the tuples and the dictionary. For a lazy index,
+        the codelists text and the concepts parsed so far."""
+        if isinstance(codelists, LazyCodelistIndex):
+            size = len(codelists.text) + sys.getsizeof(codelists.statements)
+            items = list(codelists.concepts.items())
+        else:
+            size = sys.getsizeof(codelists)
+            items = codelists.items()
+        for scheme_uri, concepts in items:
+            size += sys.getsizeof(scheme_uri) + sys.getsizeof(concepts)
+            size += sum(sys.getsizeof(concept_uri) for concept_uri in concepts)
+        return size
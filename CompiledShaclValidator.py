@@ -0,0 +1,427 @@
+import logging
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pyshacl import validate
+from rdflib import BNode, Graph, Literal, OWL, RDF, RDFS, SH, URIRef, XSD
+from rdflib.collection import Collection
+
+SH_AND = URIRef('http://www.w3.org/ns/shacl#and')
+SH_OR = URIRef('http://www.w3.org/ns/shacl#or')
+SH_XONE = URIRef('http://www.w3.org/ns/shacl#xone')
+SH_IN = URIRef('http://www.w3.org/ns/shacl#in')
+SH_CLASS = URIRef('http://www.w3.org/ns/shacl#class')
+
+# (focus node, result path, value node, source shape, source constraint component, severity)
+ValidationResult = Tuple[object, Optional[object], Optional[object], object, URIRef, URIRef]
+# subject -> predicate -> objects of the data graph
+DataIndex = Dict[object, Dict[URIRef, List]]
+
+
+class UncompiledShapeError(Exception):
+    """A shape uses something that is not compiled, it is validated with pyshacl instead."""
+
+
+class CompiledShaclValidator:
+    """Validates data graphs against shapes that are compiled to python functions, one per shape, instead of going
+    through the general engine of pyshacl. Only the part of SHACL that OTLShaclGenerator uses is compiled: the
+    targets, sh:property, sh:path with sh:alternativePath, sh:minCount, sh:maxCount, sh:datatype, sh:nodeKind, sh:in,
+    sh:pattern, sh:class, sh:or, sh:and and sh:xone. Shapes that use anything else are validated with pyshacl. The
+    conforms flag and the validation results are the same as those of pyshacl.validate."""
+    ignored_predicates = {RDF.type, RDFS.label, RDFS.comment, OWL.deprecated, SH.name, SH.description}
+    target_predicates = [SH.targetClass, SH.targetSubjectsOf, SH.targetObjectsOf, SH.targetNode]
+    compiled_predicates = {SH.property, SH.path, SH.minCount, SH.maxCount, SH.datatype, SH.nodeKind, SH_IN,
+                           SH.pattern, SH.flags, SH_CLASS, SH_OR, SH_AND, SH_XONE}
+    # predicates that a compiled shape can have more than once
+    repeatable_predicates = {RDF.type, SH.property, SH_CLASS, SH.pattern} | set(target_predicates)
+    node_kinds = {SH.BlankNode: (BNode,), SH.IRI: (URIRef,), SH.Literal: (Literal,),
+                  SH.BlankNodeOrIRI: (BNode, URIRef), SH.BlankNodeOrLiteral: (BNode, Literal),
+                  SH.IRIOrLiteral: (URIRef, Literal)}
+    datatype_value_types = {XSD.string: (str, bytes), RDF.langString: (str, bytes), XSD.integer: int,
+                            XSD.float: float, XSD.decimal: Decimal, XSD.boolean: bool, XSD.date: date,
+                            XSD.time: time, XSD.dateTime: datetime}
+
+    def __init__(self, shacl_graph: Graph):
+        self.shacl_graph = shacl_graph
+        self.checks: Dict[object, Callable] = {}
+        # (shape, targets, check) of the shapes with targets that are compiled
+        self.shapes = []
+        fallback_shapes = []
+        for shape in self.get_target_shapes(shacl_graph):
+            try:
+                self.shapes.append((shape, self.get_targets(shape), self.compile_shape(shape, ())))
+            except UncompiledShapeError as exc:
+                logging.info(f'{shape} is validated with pyshacl: {exc}')
+                fallback_shapes.append(shape)
+        self.fallback_graph = self.get_shapes_closure(shacl_graph, fallback_shapes) if fallback_shapes else None
+        self.target_classes = {c for _, targets, _ in self.shapes for c in targets[SH.targetClass]}
+        self.target_predicate_uris = {p for _, targets, _ in self.shapes
+                                      for p in targets[SH.targetSubjectsOf] | targets[SH.targetObjectsOf]}
+
+    @classmethod
+    def get_target_shapes(cls, shacl_graph: Graph) -> List:
+        shapes = {s for p in cls.target_predicates + [SH.target] for s in shacl_graph.subjects(p, None)}
+        for shape_type in [SH.NodeShape, SH.PropertyShape]:
+            shapes.update(s for s in shacl_graph.subjects(RDF.type, shape_type)
+                          if (s, RDF.type, RDFS.Class) in shacl_graph)
+        return sorted(shapes)
+
+    def get_targets(self, shape) -> Dict[URIRef, Set]:
+        return {p: set(self.shacl_graph.objects(shape, p)) for p in self.target_predicates}
+
+    def compile_shape(self, shape, evaluation_path: Tuple) -> Callable[[object, DataIndex, dict, list], bool]:
+        """Returns a function (focus node, data index, superclasses, results) -> conforms, that appends the validation
+        results of the shape for the focus node to results. Raises UncompiledShapeError for what can not be
+        compiled."""
+        if shape in self.checks:
+            return self.checks[shape]
+        if shape in evaluation_path:
+            raise UncompiledShapeError('recursive shapes are not compiled')
+        evaluation_path = evaluation_path + (shape,)
+        g = self.shacl_graph
+        for p in set(g.predicates(shape, None)):
+            if p not in self.ignored_predicates and p not in self.compiled_predicates and \
+                    p not in self.target_predicates:
+                raise UncompiledShapeError(f'{p} is not compiled')
+            if p not in self.repeatable_predicates and len(list(g.objects(shape, p))) > 1:
+                raise UncompiledShapeError(f'more than one {p} is not compiled')
+        if (shape, RDF.type, RDFS.Class) in g:
+            raise UncompiledShapeError('implicit class targets are not compiled')
+
+        path = g.value(shape, SH.path)
+        get_values = self.compile_path(path)
+        constraints = []
+        for p, compile_constraint in [(SH.minCount, self.compile_min_count), (SH.maxCount, self.compile_max_count),
+                                      (SH.datatype, self.compile_datatype), (SH.nodeKind, self.compile_node_kind),
+                                      (SH_IN, self.compile_in), (SH.pattern, self.compile_pattern),
+                                      (SH_CLASS, self.compile_class), (SH_OR, self.compile_logical),
+                                      (SH_AND, self.compile_logical), (SH_XONE, self.compile_logical),
+                                      (SH.property, self.compile_property)]:
+            if (shape, p, None) in g:
+                constraints.append(compile_constraint(shape, path, p, evaluation_path))
+
+        def check(focus, index: DataIndex, superclasses: dict, results: list) -> bool:
+            values = get_values(focus, index)
+            conforms = True
+            for constraint in constraints:
+                if not constraint(focus, values, index, superclasses, results):
+                    conforms = False
+            return conforms
+
+        self.checks[shape] = check
+        return check
+
+    def compile_path(self, path) -> Callable[[object, DataIndex], Tuple]:
+        if path is None:
+            return lambda focus, index: (focus,)
+        if isinstance(path, URIRef):
+            return lambda focus, index: index.get(focus, {}).get(path, ())
+        g = self.shacl_graph
+        alternatives = g.value(path, SH.alternativePath)
+        if set(g.predicates(path, None)) != {SH.alternativePath} or alternatives is None:
+            raise UncompiledShapeError(f'sh:path {path} is not compiled')
+        predicates = list(Collection(g, alternatives))
+        if not all(isinstance(predicate, URIRef) for predicate in predicates):
+            raise UncompiledShapeError(f'sh:path {path} is not compiled')
+
+        def get_values(focus, index: DataIndex) -> Tuple:
+            objects = index.get(focus, {})
+            return tuple({value for predicate in predicates for value in objects.get(predicate, ())})
+
+        return get_values
+
+    @staticmethod
+    def make_result(results: list, focus, path, value, shape, component: URIRef):
+        results.append((focus, path, value, shape, component, SH.Violation))
+
+    def compile_count(self, shape, path, p: URIRef, too_many: bool) -> Callable:
+        count = int(self.shacl_graph.value(shape, p))
+        component = SH.MaxCountConstraintComponent if too_many else SH.MinCountConstraintComponent
+        make_result = self.make_result
+
+        def constraint(focus, values, index, superclasses, results) -> bool:
+            if (len(values) > count) if too_many else (len(values) < count):
+                make_result(results, focus, path, None, shape, component)
+                return False
+            return True
+
+        return constraint
+
+    def compile_min_count(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        return self.compile_count(shape, path, p, too_many=False)
+
+    def compile_max_count(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        return self.compile_count(shape, path, p, too_many=True)
+
+    def compile_value_test(self, shape, path, component: URIRef, test: Callable[[object], bool]) -> Callable:
+        """Returns a constraint with a result for every value that does not pass test."""
+        make_result = self.make_result
+
+        def constraint(focus, values, index, superclasses, results) -> bool:
+            conforms = True
+            for value in values:
+                if not test(value):
+                    make_result(results, focus, path, value, shape, component)
+                    conforms = False
+            return conforms
+
+        return constraint
+
+    def compile_datatype(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        """Follows the DatatypeConstraintComponent of pyshacl, that also checks the python value of the literals of
+        some xsd datatypes."""
+        datatype = self.shacl_graph.value(shape, p)
+        value_types = self.datatype_value_types.get(datatype)
+
+        def test(value) -> bool:
+            if not isinstance(value, Literal):
+                return False
+            if value.datatype == datatype:
+                if getattr(value, 'ill_typed', None) is True:
+                    return False
+            elif datatype == RDFS.Literal:
+                return True
+            elif datatype == RDFS.Datatype and value.datatype:
+                return True
+            elif not ((value.datatype is None and value.language is None and datatype == XSD.string) or
+                      (datatype == RDF.langString and value.language)):
+                return False
+            return value_types is None or isinstance(value.value, value_types)
+
+        return self.compile_value_test(shape, path, SH.DatatypeConstraintComponent, test)
+
+    def compile_node_kind(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        node_kind = self.shacl_graph.value(shape, p)
+        if node_kind not in self.node_kinds:
+            raise UncompiledShapeError(f'sh:nodeKind {node_kind} is not compiled')
+        node_types = self.node_kinds[node_kind]
+        return self.compile_value_test(shape, path, SH.NodeKindConstraintComponent,
+                                       lambda value: isinstance(value, node_types))
+
+    def compile_in(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        allowed_values = frozenset(Collection(self.shacl_graph, self.shacl_graph.value(shape, p)))
+        return self.compile_value_test(shape, path, SH.InConstraintComponent,
+                                       lambda value: value in allowed_values)
+
+    def compile_pattern(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        """Every value that does not match a pattern gives a result, per pattern."""
+        make_result = self.make_result
+        flags = str(self.shacl_graph.value(shape, SH.flags) or '')
+        if set(flags) - set('im'):
+            raise UncompiledShapeError(f'sh:flags {flags} is not compiled')
+        re_flags = (re.I if 'i' in flags else 0) | (re.M if 'm' in flags else 0)
+        matchers = [re.compile(str(pattern), re_flags) for pattern in self.shacl_graph.objects(shape, p)]
+
+        def constraint(focus, values, index, superclasses, results) -> bool:
+            conforms = True
+            for matcher in matchers:
+                for value in values:
+                    if not isinstance(value, BNode):
+                        if isinstance(value, Literal) and value.value is not None and \
+                                value.datatype in (None, RDF.langString, XSD.string):
+                            if matcher.search(str(value.value)):
+                                continue
+                        elif matcher.search(str(value)):
+                            continue
+                    make_result(results, focus, path, value, shape, SH.PatternConstraintComponent)
+                    conforms = False
+            return conforms
+
+        return constraint
+
+    def compile_class(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        """The values must have an rdf:type that is the class or one of its subclasses in the data."""
+        make_result = self.make_result
+        class_uris = list(self.shacl_graph.objects(shape, p))
+
+        def constraint(focus, values, index, superclasses, results) -> bool:
+            conforms = True
+            for class_uri in class_uris:
+                for value in values:
+                    if isinstance(value, Literal) or not any(
+                            class_uri in superclasses.get(value_type, (value_type,))
+                            for value_type in index.get(value, {}).get(RDF.type, ())):
+                        make_result(results, focus, path, value, shape, SH.ClassConstraintComponent)
+                        conforms = False
+            return conforms
+
+        return constraint
+
+    def compile_logical(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        make_result = self.make_result
+        members = list(Collection(self.shacl_graph, self.shacl_graph.value(shape, p)))
+        checks = [self.compile_shape(member, evaluation_path) for member in members]
+        if p == SH_OR:
+            component = SH.OrConstraintComponent
+            checks = list(dict.fromkeys(checks))
+            passes = lambda value, index, superclasses: any(check(value, index, superclasses, []) for check in checks)
+        elif p == SH_AND:
+            component = SH.AndConstraintComponent
+            checks = list(dict.fromkeys(checks))
+            passes = lambda value, index, superclasses: all(check(value, index, superclasses, []) for check in checks)
+        else:
+            component = SH.XoneConstraintComponent
+            passes = lambda value, index, superclasses: sum(
+                check(value, index, superclasses, []) for check in checks) == 1
+
+        def constraint(focus, values, index, superclasses, results) -> bool:
+            conforms = True
+            for value in values:
+                if not passes(value, index, superclasses):
+                    make_result(results, focus, path, value, shape, component)
+                    conforms = False
+            return conforms
+
+        return constraint
+
+    def compile_property(self, shape, path, p: URIRef, evaluation_path: Tuple) -> Callable:
+        """The results of the property shapes for every value are reported as they are."""
+        checks = [self.compile_shape(property_shape, evaluation_path)
+                  for property_shape in self.shacl_graph.objects(shape, p)]
+        for property_shape in self.shacl_graph.objects(shape, p):
+            if (property_shape, SH.path, None) not in self.shacl_graph:
+                raise UncompiledShapeError(f'sh:property {property_shape} without sh:path is not compiled')
+
+        def constraint(focus, values, index, superclasses, results) -> bool:
+            conforms = True
+            for check in checks:
+                for value in values:
+                    if not check(value, index, superclasses, results):
+                        conforms = False
+            return conforms
+
+        return constraint
+
+    @staticmethod
+    def index_graphs(graphs: Iterable[Graph]) -> DataIndex:
+        index = {}
+        for g in graphs:
+            for s, p, o in g:
+                objects = index.setdefault(s, {}).setdefault(p, [])
+                if o not in objects:
+                    objects.append(o)
+        return index
+
+    @staticmethod
+    def get_superclasses(index: DataIndex) -> Dict[object, Set]:
+        """Returns every class that is the rdf:type of a node with all its superclasses, following rdfs:subClassOf in
+        the data. A class is its own superclass."""
+        classes = {class_uri for objects in index.values() for class_uri in objects.get(RDF.type, ())}
+        classes.update(s for s, objects in index.items() if RDFS.subClassOf in objects)
+        superclasses = {}
+        for class_uri in classes:
+            found = {class_uri}
+            stack = [class_uri]
+            while stack:
+                for superclass in index.get(stack.pop(), {}).get(RDFS.subClassOf, ()):
+                    if superclass not in found:
+                        found.add(superclass)
+                        stack.append(superclass)
+            superclasses[class_uri] = found
+        return superclasses
+
+    def get_focus_nodes(self, targets: Dict[URIRef, Set], instances: Dict[object, Set],
+                        subjects_of: Dict[URIRef, Set], objects_of: Dict[URIRef, Set]) -> Set:
+        focus_nodes = set(targets[SH.targetNode])
+        for class_uri in targets[SH.targetClass]:
+            focus_nodes.update(instances.get(class_uri, ()))
+        for predicate in targets[SH.targetSubjectsOf]:
+            focus_nodes.update(subjects_of.get(predicate, ()))
+        for predicate in targets[SH.targetObjectsOf]:
+            focus_nodes.update(objects_of.get(predicate, ()))
+        return focus_nodes
+
+    def validate(self, data_graph: Graph, ont_graph: Graph = None, allow_infos: bool = False,
+                 allow_warnings: bool = False) -> Tuple[bool, Graph, str]:
+        """Validates like pyshacl.validate, with the ontology mixed into the data graph, returning
+        (conforms, results_graph, results_text)."""
+        index = self.index_graphs([data_graph] if ont_graph is None else [data_graph, ont_graph])
+        superclasses = self.get_superclasses(index)
+        instances, subjects_of, objects_of = {}, {}, {}
+        for node, objects in index.items():
+            for node_type in objects.get(RDF.type, ()):
+                for class_uri in superclasses[node_type] & self.target_classes:
+                    instances.setdefault(class_uri, set()).add(node)
+            for predicate in self.target_predicate_uris.intersection(objects):
+                subjects_of.setdefault(predicate, set()).add(node)
+                objects_of.setdefault(predicate, set()).update(objects[predicate])
+
+        results = []
+        for shape, targets, check in self.shapes:
+            for focus in self.get_focus_nodes(targets, instances, subjects_of, objects_of):
+                check(focus, index, superclasses, results)
+        conforms = not results
+
+        if self.fallback_graph is not None:
+            fallback_conforms, fallback_results_graph, _ = validate(
+                data_graph, shacl_graph=self.fallback_graph, ont_graph=ont_graph, allow_infos=allow_infos,
+                allow_warnings=allow_warnings)
+            conforms = conforms and fallback_conforms
+            results.extend(self.get_results(fallback_results_graph))
+        return (conforms, self.create_results_graph(conforms, results),
+                self.create_results_text(conforms, results))
+
+    @staticmethod
+    def get_results(results_graph: Graph) -> List[ValidationResult]:
+        """Returns the validation results of a pyshacl results graph."""
+        return [tuple(results_graph.value(result, p) for p in [SH.focusNode, SH.resultPath, SH.value, SH.sourceShape,
+                                                                 SH.sourceConstraintComponent, SH.resultSeverity])
+                for result in results_graph.subjects(RDF.type, SH.ValidationResult)]
+
+    def create_results_graph(self, conforms: bool, results: List[ValidationResult]) -> Graph:
+        results_graph = Graph()
+        for prefix, namespace in self.shacl_graph.namespaces():
+            results_graph.bind(prefix, namespace)
+        report = BNode()
+        results_graph.add((report, RDF.type, SH.ValidationReport))
+        results_graph.add((report, SH.conforms, Literal(conforms)))
+        for result in results:
+            result_node = BNode()
+            results_graph.add((report, SH.result, result_node))
+            results_graph.add((result_node, RDF.type, SH.ValidationResult))
+            for p, o in zip([SH.focusNode, SH.resultPath, SH.value, SH.sourceShape, SH.sourceConstraintComponent,
+                             SH.resultSeverity], result):
+                if o is not None:
+                    results_graph.add((result_node, p, o))
+        return results_graph
+
+    def create_results_text(self, conforms: bool, results: List[ValidationResult]) -> str:
+        """Returns a text in the format of pyshacl, without the messages."""
+        namespace_manager = self.shacl_graph.namespace_manager
+        text = f'Validation Report\nConforms: {conforms}\n'
+        if results:
+            text += f'Results ({len(results)}):\n'
+        for focus, path, value, shape, component, severity in results:
+            text += f'Constraint Violation in {component.split("#")[-1]} ({component}):\n'
+            text += f'\tSeverity: {severity.n3(namespace_manager)}\n'
+            text += f'\tSource Shape: {shape.n3(namespace_manager)}\n'
+            text += f'\tFocus Node: {focus.n3(namespace_manager)}\n'
+            if value is not None:
+                text += f'\tValue Node: {value.n3(namespace_manager)}\n'
+            if path is not None:
+                text += f'\tResult Path: {path.n3(namespace_manager)}\n'
+            text += '\n'
+        return text
+
+    @classmethod
+    def get_shapes_closure(cls, shacl_graph: Graph, shapes: Iterable) -> Graph:
+        """Returns the shapes with every blank node and shape they refer to."""
+        shape_nodes = {s for shape_type in [SH.NodeShape, SH.PropertyShape]
+                       for s in shacl_graph.subjects(RDF.type, shape_type)}
+        closure = Graph()
+        for prefix, namespace in shacl_graph.namespaces():
+            closure.bind(prefix, namespace)
+        nodes = list(shapes)
+        visited = set()
+        while nodes:
+            node = nodes.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            for triple in shacl_graph.triples((node, None, None)):
+                closure.add(triple)
+                if isinstance(triple[2], BNode) or triple[2] in shape_nodes:
+                    nodes.append(triple[2])
+        return closure
@@ -0,0 +1,105 @@
+import logging
+import re
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Tuple
+
+import rdflib
+from rdflib import URIRef, RDF, SKOS
+
+
+class LazyCodelistIndex(Mapping):
+    """The concepts of the concept schemes in a codelists Turtle text, parsed on demand. Building the index only scans
+    the text for the statements of every scheme and keeps their offsets, a lookup parses just the statements of that
+    scheme and keeps its concepts. A statement starts at the beginning of a line and ends with the first line ending
+    in a dot, as the codelists are serialized. If the statements of a scheme can not be parsed on
+    their own, the whole text is parsed once instead. Lookups from several threads are safe."""
+    statement_pattern = re.compile(rb'(?ms)^\S.*?\.[ \t\r]*$')
+    prefix_pattern = re.compile(rb'\A\s*(?:@prefix|@base|PREFIX|BASE)\b', re.IGNORECASE)
+    subject_pattern = re.compile(rb'\A(?:\s*#[^\n]*\n)*\s*<([^>]+)>')
+    # both start with a literal, so the regex engine can scan for them quickly
+    concept_scheme_pattern = re.compile(rb'ConceptScheme>?[\s,;.]')
+    type_pattern = re.compile(rb'(?:\sa|rdf:type|#type>)\s+(?:\S+\s*,\s*)*\S*[:#]ConceptScheme>?[\s,;.]')
+    in_scheme_pattern = re.compile(rb'inScheme>?\s+((?:<[^>]+>\s*,\s*)*<[^>]+>)')
+    uri_pattern = re.compile(rb'<([^>]+)>')
+
+    def __init__(self, text: bytes):
+        self.text = text
+        self.header = b''
+        # scheme uri -> (offset, end) of the statements that describe the scheme or one of its concepts
+        self.statements: Dict[str, List[Tuple[int, int]]] = {}
+        self.concepts: Dict[str, Tuple[URIRef, ...]] = {}
+        self.parsed_all = False
+        self.lock = threading.RLock()
+
+        header = []
+        for match in self.statement_pattern.finditer(text):
+            statement = match.group()
+            if self.prefix_pattern.match(statement):
+                header.append(statement)
+                continue
+            schemes = set()
+            subject = self.subject_pattern.match(statement)
+            if (subject is not None and self.concept_scheme_pattern.search(statement)
+                    and self.type_pattern.search(statement)):
+                schemes.add(subject.group(1).decode())
+            for in_scheme in self.in_scheme_pattern.finditer(statement):
+                schemes.update(uri.decode() for uri in self.uri_pattern.findall(in_scheme.group(1)))
+            for scheme in schemes:
+                self.statements.setdefault(scheme, []).append(match.span())
+        self.header = b''.join(header)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def __getitem__(self, scheme_uri: str) -> Tuple[URIRef, ...]:
+        concepts = self.concepts.get(scheme_uri)
+        if concepts is not None:
+            return concepts
+        with self.lock:
+            return self.parse_scheme(scheme_uri)
+
+    def parse_scheme(self, scheme_uri: str) -> Tuple[URIRef, ...]:
+        concepts = self.concepts.get(scheme_uri)
+        if concepts is not None:
+            return concepts
+        if self.parsed_all or scheme_uri not in self.statements:
+            raise KeyError(scheme_uri)
+
+        data = self.header + b'\n'.join(self.text[start:end] for start, end in self.statements[scheme_uri])
+        try:
+            g = rdflib.Graph().parse(data=data, format='turtle')
+        except Exception as exc:
+            logging.warning(f'Could not parse the statements of {scheme_uri} on their own, parsing all codelists: '
+                            f'{exc}')
+            self.parse_all()
+            return self.parse_scheme(scheme_uri)
+        if (URIRef(scheme_uri), RDF.type, SKOS.ConceptScheme) not in g:
+            del self.statements[scheme_uri]
+            raise KeyError(scheme_uri)
+        concepts = self.get_scheme_concepts(g, URIRef(scheme_uri))
+        self.concepts[scheme_uri] = concepts
+        return concepts
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.concepts if self.parsed_all else self.statements)
+
+    def __len__(self) -> int:
+        return len(self.concepts if self.parsed_all else self.statements)
+
+    def parse_all(self):
+        g = rdflib.Graph().parse(data=self.text, format='turtle')
+        self.concepts = {str(scheme_uri): self.get_scheme_concepts(g, scheme_uri)
+                         for scheme_uri in g.subjects(predicate=RDF.type, object=SKOS.ConceptScheme)}
+        self.parsed_all = True
+
+    @staticmethod
+    def get_scheme_concepts(g: rdflib.Graph, scheme_uri: URIRef) -> Tuple[URIRef, ...]:
+        return tuple(concept_uri for concept_uri in g.subjects(predicate=SKOS.inScheme, object=scheme_uri)
+                     if (concept_uri, RDF.type, SKOS.Concept) in g)
@@ -0,0 +1,53 @@
+import shutil
+from pathlib import Path
+
+from rdflib import URIRef, BNode, Literal
+
+
+class NTriplesWriter:
+    """NTriplesWriter writes triples as N-Triples lines straight to a file, so they never have to be held in a Graph.
+    It offers the add and addN methods the generator stages call on a Graph, so it can be passed in their place.
+    Triples that are added twice are written twice, which N-Triples consumers read as a single triple."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.triple_count = 0
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.file.close()
+
+    def add(self, triple: tuple):
+        s, p, o = triple
+        self.file.write(f'{self.term_to_nt(s)} {self.term_to_nt(p)} {self.term_to_nt(o)} .\n')
+        self.triple_count += 1
+
+    def addN(self, quads):
+        for s, p, o, _ in quads:
+            self.add((s, p, o))
+
+    def add_file(self, path: Path, triple_count: int):
+        """Appends an N-Triples file with triple_count triples, written by another NTriplesWriter."""
+        with open(path, 'r', encoding='utf-8') as nt_file:
+            shutil.copyfileobj(nt_file, self.file)
+        self.triple_count += triple_count
+
+    @staticmethod
+    def term_to_nt(term) -> str:
+        if isinstance(term, URIRef):
+            return f'<{term}>'
+        if isinstance(term, BNode):
+            return f'_:{term}'
+        if isinstance(term, Literal):
+            lexical = (str(term).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                       .replace('\r', '\\r'))
+            if term.language is not None:
+                return f'"{lexical}"@{term.language}'
+            if term.datatype is not None:
+                return f'"{lexical}"^^<{term.datatype}>'
+            return f'"{lexical}"'
+        raise ValueError(f'{term!r} can not be written as an N-Triples term')
@@ -1,18 +1,32 @@
+import hashlib
 import logging
+import os
+import pickle
+import tempfile
 from pathlib import Path
-from typing import Dict
+from typing import BinaryIO, Dict, Mapping, Tuple, Union
 from urllib.request import urlretrieve
 from zipfile import ZipFile
 
 import rdflib
 from otlmow_modelbuilder.AbstractDatatypeCreator import AbstractDatatypeCreator
 from otlmow_modelbuilder.OSLOCollector import OSLOCollector
-from rdflib import URIRef, Graph, RDF
+from rdflib import URIRef, RDF, SKOS
+
+from LazyCodelistIndex import LazyCodelistIndex
 
 
 class OTLEnumerationCreator(AbstractDatatypeCreator):
+    """Loads the codelists (concept scheme uri -> the uris of its concepts) of an environment with read_codelists,
+    the CodelistStore keeps them. Without a codelist_path they are downloaded. With a cache_dir, the download is kept
+    in <cache_dir>/<env>/all.ttl.zip and the parsed codelists in <cache_dir>/<env>/, keyed by the sha256 of the file
+    they were parsed from, so the same file is only parsed once. With a codelist_path (a local all.ttl or all.ttl.zip)
+    or offline, nothing is downloaded: offline uses the last download in the cache_dir. With lazy, the codelists are
+    only indexed and a scheme is parsed when it is looked up (see LazyCodelistIndex), which is faster when only a few
+    schemes are needed."""
     default_environment = 'prd'
-    graph_dict: Dict[str, Dict[str, Graph]] = {'prd': {}, 'tei': {}, 'dev': {}, 'aim': {}}
+    # part of the parsed cache file names, change it when the parsed form changes
+    parsed_cache_version = 2
     oslo_github_branch_mapping = {
         'prd': 'master',
         'tei': 'test',
@@ -20,64 +34,134 @@ class OTLEnumerationCreator(AbstractDatatypeCreator):
         'aim': 'aim'
     }
 
-    def __init__(self, oslo_collector: OSLOCollector, env: str = default_environment):
+    def __init__(self, oslo_collector: OSLOCollector, env: str = default_environment, cache_dir: Path = None,
+                 codelist_path: Path = None, offline: bool = False, lazy: bool = False):
         super().__init__(oslo_collector)
         self.oslo_collector = oslo_collector
         self.env = env
+        self.cache_dir = cache_dir
+        self.codelist_path = codelist_path
+        self.offline = offline
+        self.lazy = lazy
+        if offline and codelist_path is None and cache_dir is None:
+            raise ValueError('offline requires a codelist_path or a cache_dir with a previous download')
         logging.info("Created an instance of OTLEnumerationCreator")
 
-    def __enter__(self):
-        self.path_zip_file = Path(__file__).parent / "all.ttl.zip"
-        self.path_ttl_file = Path(__file__).parent / "all.ttl"
-        if self.env != 'unittest':
-            self.graph_dict[self.env] = self.download_unzip_and_parse_to_dict(env=self.env)
+    def read_codelists(self) -> Mapping[str, Tuple[URIRef, ...]]:
+        """Returns the codelists, a LazyCodelistIndex in lazy mode."""
+        if self.codelist_path is not None:
+            codelists = self.load_codelists(self.codelist_path)
+            logging.info(f"Loaded the enumerations from {self.codelist_path}")
+        elif self.offline:
+            codelists = self.load_codelists(self.get_cached_download_path())
+            logging.info("Loaded the enumerations from the previous download in the cache")
+        else:
+            codelists = self.download_unzip_and_parse_to_dict(env=self.env)
             logging.info("Downloaded, unzipped and parsed the enumerations ttl file")
-        return self
+        return codelists
+
+    def download_unzip_and_parse_to_dict(self, env: str = default_environment) -> Mapping[str, Tuple[URIRef, ...]]:
+        url = f"https://github.com/Informatievlaanderen/OSLO-codelistgenerated/raw/refs/heads/wegenenverkeer-{self.oslo_github_branch_mapping[env]}/all.ttl.zip"
+        if self.cache_dir is not None:
+            download_path = self.get_cached_download_path(env)
+            os.makedirs(download_path.parent, exist_ok=True)
+            # downloaded next to the previous download and renamed, so an interrupted download never replaces it
+            fd, temp_path = tempfile.mkstemp(dir=download_path.parent, prefix='.tmp-', suffix='.zip')
+            os.close(fd)
+            try:
+                urlretrieve(url, temp_path)
+                os.replace(temp_path, download_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return self.load_codelists(download_path, env=env)
+
+        # a temporary directory of its own, so processes downloading at the same time do not share files
+        with tempfile.TemporaryDirectory() as temp_dir:
+            download_path = Path(temp_dir) / 'all.ttl.zip'
+            urlretrieve(url, download_path)
+            return self.load_codelists(download_path, env=env)
+
+    def get_cached_download_path(self, env: str = None) -> Path:
+        if self.cache_dir is None:
+            raise ValueError('There is no cache_dir to keep the codelist download in')
+        return Path(self.cache_dir) / (env or self.env) / 'all.ttl.zip'
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.path_zip_file.exists():
-            self.path_zip_file.unlink()
-        if self.path_ttl_file.exists():
-            self.path_ttl_file.unlink()
+    def load_codelists(self, source_path: Path, env: str = None) -> Mapping[str, Tuple[URIRef, ...]]:
+        """Parses a local all.ttl or all.ttl.zip file, or loads the codelists parsed from a file with the same
+        contents before from the cache_dir. In lazy mode, the file is only indexed."""
+        source_path = Path(source_path)
+        if not source_path.is_file():
+            raise FileNotFoundError(f'{source_path} is not a valid path. File does not exist.')
+        if self.lazy:
+            if source_path.suffix == '.zip':
+                with ZipFile(source_path) as zip_ref:
+                    text = zip_ref.read(self.get_ttl_name(zip_ref))
+            else:
+                text = source_path.read_bytes()
+            return LazyCodelistIndex(text)
 
-    def download_unzip_and_parse_to_dict(self, env: str = default_environment) -> Dict[str, Graph]:
-        directory_to_extract_to = self.path_zip_file.parent
-        urlretrieve(f"https://github.com/Informatievlaanderen/OSLO-codelistgenerated/raw/refs/heads/wegenenverkeer-{self.oslo_github_branch_mapping[env]}/all.ttl.zip", self.path_zip_file)
-        with ZipFile(self.path_zip_file) as zip_ref:
-            zip_ref.extractall(directory_to_extract_to)
+        parsed_path = None
+        if self.cache_dir is not None:
+            parsed_path = (Path(self.cache_dir) / (env or self.env) /
+                           f'parsed-v{self.parsed_cache_version}-{self.hash_file(source_path)}.pickle')
+            if parsed_path.is_file():
+                with open(parsed_path, 'rb') as parsed_file:
+                    return pickle.load(parsed_file)
 
-        return self.parse_graph_to_dict(path_ttl_file=self.path_ttl_file)
+        if source_path.suffix == '.zip':
+            # parsed from the decompressed stream of the zip member, nothing is extracted to disk
+            with ZipFile(source_path) as zip_ref:
+                with zip_ref.open(self.get_ttl_name(zip_ref)) as ttl_stream:
+                    codelists = self.parse_graph_to_dict(path_ttl_file=ttl_stream)
+        else:
+            codelists = self.parse_graph_to_dict(path_ttl_file=source_path)
+
+        if parsed_path is not None:
+            os.makedirs(parsed_path.parent, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=parsed_path.parent, prefix='.tmp-', suffix='.pickle')
+            with os.fdopen(fd, 'wb') as parsed_file:
+                pickle.dump(codelists, parsed_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, parsed_path)
+        return codelists
+
+    @staticmethod
+    def get_ttl_name(zip_ref: ZipFile) -> str:
+        ttl_names = [name for name in zip_ref.namelist() if name.endswith('.ttl')]
+        if not ttl_names:
+            raise ValueError(f'{zip_ref.filename} does not contain a ttl file')
+        return ttl_names[0]
 
-    @classmethod
-    def get_graph(cls, keuzelijstnaam: str, env: str = default_environment):
+    @staticmethod
+    def hash_file(path: Path) -> str:
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as source_file:
+            for block in iter(lambda: source_file.read(1024 * 1024), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def get_concepts(codelists: Mapping[str, Tuple[URIRef, ...]], keuzelijstnaam: str) -> Tuple[URIRef, ...]:
         uri = f'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/{keuzelijstnaam}'
-        keuzelijst_graph = OTLEnumerationCreator.graph_dict[env].get(uri)
-        if keuzelijst_graph is None:
+        concepts = codelists.get(uri)
+        if concepts is None:
             test_uri = uri.replace('wegenenverkeer', 'wegenenverkeer-test')
-            keuzelijst_graph = OTLEnumerationCreator.graph_dict[env].get(test_uri)
-        if keuzelijst_graph is not None:
-            return keuzelijst_graph
-        raise ValueError(f"Graph for {keuzelijstnaam} not found in the graph_dict")
+            concepts = codelists.get(test_uri)
+        if concepts is not None:
+            return concepts
+        raise ValueError(f"Codelist {keuzelijstnaam} not found in the codelists")
 
     @staticmethod
-    def parse_graph_to_dict(path_ttl_file: Path) -> Dict[str, Graph]:
+    def parse_graph_to_dict(path_ttl_file: Union[Path, BinaryIO]) -> Dict[str, Tuple[URIRef, ...]]:
+        """Parses the codelists, from a path or a binary stream, and partitions them by concept scheme in one pass over
+        the skos:inScheme triples. Only the concept uris are kept, that is all the generator needs."""
         g = rdflib.Graph()
         g.parse(path_ttl_file, format="turtle")
 
-        keuzelijst_dict = {}
-        keuzelijst_uris = set(g.subjects(predicate=RDF.type, object=URIRef('http://www.w3.org/2004/02/skos/core#ConceptScheme')))
-
-        for keuzelijst_uri in keuzelijst_uris:
-            keuzelijst_graph = Graph()
-            for triple in g.triples((keuzelijst_uri, None, None)):
-                keuzelijst_graph.add(triple)
-
-            keuzelijst_waarde_uris = g.subjects(predicate=URIRef('http://www.w3.org/2004/02/skos/core#inScheme'),
-                                                object=keuzelijst_uri)
-            for keuzelijst_waarde_uri in keuzelijst_waarde_uris:
-                for triple in g.triples((keuzelijst_waarde_uri, None, None)):
-                    keuzelijst_graph.add(triple)
-
-            keuzelijst_dict[str(keuzelijst_uri)] = keuzelijst_graph
-        rdflib.term.URIRef('https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlTestKeuzelijst')
-        return keuzelijst_dict
+        concept_uris = set(g.subjects(predicate=RDF.type, object=SKOS.Concept))
+        concepts_per_scheme = {keuzelijst_uri: [] for keuzelijst_uri in
+                               g.subjects(predicate=RDF.type, object=SKOS.ConceptScheme)}
+        for concept_uri, keuzelijst_uri in g.subject_objects(predicate=SKOS.inScheme):
+            if concept_uri in concept_uris and keuzelijst_uri in concepts_per_scheme:
+                concepts_per_scheme[keuzelijst_uri].append(concept_uri)
+        return {str(keuzelijst_uri): tuple(concepts) for keuzelijst_uri, concepts in concepts_per_scheme.items()}
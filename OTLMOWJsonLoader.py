@@ -0,0 +1,163 @@
+import codecs
+import json
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Set, Tuple
+
+from rdflib import BNode, Graph, Literal, RDF, RDFS, URIRef, XSD
+
+from OTLShaclGenerator import OTLShaclGenerator, RELATIE_OBJECT_BRON, RELATIE_OBJECT_DOEL
+from SQLDbReader import SQLDbReader
+
+
+class OTLMOWJsonLoader:
+    """Maps OTLMOW json, a json array of assets with their typeURI, assetId and nested dicts for the complex datatypes,
+    straight to triples, with the attribute uris and datatypes of a subset database instead of json-ld context
+    processing. The array is parsed incrementally, one asset at a time, so a file is never in memory as a whole."""
+    asset_namespace = 'https://data.awvvlaanderen.be/id/asset/'
+    relation_namespace = 'https://data.awvvlaanderen.be/id/assetrelatie/'
+    # characters read at a time, more when a single asset does not fit
+    chunk_size = 1024 * 1024
+    # a decode error this close to the end of the buffer can be a number, literal or escape cut off by it
+    token_margin = 16
+    plain_literal_types = {str(XSD.string), str(RDFS.Literal)}
+
+    def __init__(self, subset_path: Path):
+        with SQLDbReader(subset_path) as reader:
+            # class or datatype uri -> attribute name -> (attribute uri, type uri)
+            self.attributes = self.read_attributes_from_reader(reader)
+            # type uri -> OSLODatatypeComplex, OSLODatatypePrimitive, OSLODatatypeUnion or OSLOEnumeration
+            self.item_tables: Dict[str, str] = dict(reader.perform_read_query(
+                'SELECT item_uri, item_tabel FROM TypeLinkTabel', params={}))
+            # enumeration uri -> uri of its concepts, without the concept name
+            self.concept_prefixes: Dict[str, str] = {
+                uri: codelist.replace('/id/conceptscheme/', '/id/concept/') + '/'
+                for uri, codelist in reader.perform_read_query('SELECT uri, codelist FROM OSLOEnumeration', params={})}
+            self.relation_uris: Set[str] = {row[0] for row in reader.perform_read_query(
+                'SELECT DISTINCT uri FROM OSLORelaties', params={})}
+
+    @staticmethod
+    def read_attributes_from_reader(reader) -> Dict[str, Dict[str, Tuple[URIRef, str]]]:
+        attributes = {}
+        for table in ['OSLOAttributen', 'OSLODatatypeComplexAttributen', 'OSLODatatypePrimitiveAttributen',
+                      'OSLODatatypeUnionAttributen']:
+            for class_uri, name, uri, type_uri in reader.perform_read_query(
+                    f'SELECT class_uri, name, uri, type FROM {table}', params={}):
+                attributes.setdefault(class_uri, {})[name] = (URIRef(uri), type_uri)
+        for class_uri, in reader.perform_read_query('SELECT uri FROM OSLOClass', params={}):
+            attributes.setdefault(class_uri, {})
+        return attributes
+
+    @classmethod
+    def iter_assets(cls, source: BinaryIO) -> Iterator[dict]:
+        """Yields the items of the json array in source one at a time."""
+        decoder = json.JSONDecoder()
+        utf8_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        buffer, position, end_of_file = '', 0, False
+        # the characters that can come next, { for an asset
+        expected = '['
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer):
+                character = buffer[position]
+                if character in expected and character != '{':
+                    position += 1
+                    if character == ']':
+                        return
+                    expected = ']{' if character == '[' else '{'
+                    continue
+                if character != '{' or '{' not in expected:
+                    raise ValueError(f'Expected one of {expected} instead of {character} in the json array of assets')
+                try:
+                    asset, position = decoder.raw_decode(buffer, position)
+                    expected = ',]'
+                    yield asset
+                    continue
+                except json.JSONDecodeError as exc:
+                    # only read on when the asset can be cut off by the end of the buffer, not for malformed json
+                    if end_of_file or not (exc.msg.startswith('Unterminated string')
+                                           or len(buffer) - exc.pos < cls.token_margin):
+                        raise
+            elif end_of_file:
+                raise ValueError('The json array of assets is not closed')
+            chunk = source.read(max(cls.chunk_size, len(buffer) - position))
+            end_of_file = not chunk
+            buffer = buffer[position:] + utf8_decoder.decode(chunk, final=end_of_file)
+            position = 0
+
+    def iter_triples(self, source: BinaryIO) -> Iterator[tuple]:
+        for asset in self.iter_assets(source):
+            yield from self.get_asset_triples(asset)
+
+    def load(self, source: BinaryIO, g: Graph = None) -> Graph:
+        if g is None:
+            g = Graph()
+        for triple in self.iter_triples(source):
+            g.add(triple)
+        return g
+
+    def get_asset_triples(self, asset: dict) -> List[tuple]:
+        """Relations also get RelatieObject.bron and RelatieObject.doel to the assets of their bronAssetId and
+        doelAssetId, as the relation shapes expect, instead of the bron and doel dicts of OTLMOW."""
+        type_uri = asset.get('typeURI') if isinstance(asset, dict) else None
+        if type_uri not in self.attributes:
+            raise ValueError(f'{type_uri} is not a class of the subset')
+        is_relation = type_uri in self.relation_uris
+        identificator = (asset.get('assetId') or {}).get('identificator')
+        if identificator is None:
+            subject = BNode()
+        else:
+            subject = URIRef((self.relation_namespace if is_relation else self.asset_namespace) + identificator)
+
+        triples = [(subject, RDF.type, URIRef(type_uri))]
+        if is_relation:
+            values = {name: value for name, value in asset.items() if name not in ['bron', 'doel']}
+            for name, predicate in [('bronAssetId', RELATIE_OBJECT_BRON), ('doelAssetId', RELATIE_OBJECT_DOEL)]:
+                related_identificator = (asset.get(name) or {}).get('identificator')
+                if related_identificator is not None:
+                    triples.append((subject, predicate, URIRef(self.asset_namespace + related_identificator)))
+        else:
+            values = asset
+        self.add_attribute_triples(triples, subject, type_uri, values)
+        return triples
+
+    def add_attribute_triples(self, triples: List[tuple], subject, class_uri: str, values: dict):
+        attributes = self.attributes.get(class_uri, {})
+        for name, value in values.items():
+            if name not in attributes:
+                raise ValueError(f'{name} is not an attribute of {class_uri}')
+            attribute_uri, type_uri = attributes[name]
+            for item in value if isinstance(value, list) else [value]:
+                if item is not None:
+                    triples.append((subject, attribute_uri, self.get_value_node(triples, type_uri, item)))
+
+    def get_value_node(self, triples: List[tuple], type_uri: str, value):
+        """Enumeration values become concept uris and complex and union values blank nodes. OTLMOW gives the value of
+        a primitive datatype like a KwantWrd or a Dte directly, that becomes a blank node with its waarde."""
+        if OTLShaclGenerator.is_literal_type(type_uri):
+            return self.get_literal(type_uri, value)
+        item_table = self.item_tables.get(type_uri)
+        if item_table == 'OSLOEnumeration':
+            if not isinstance(value, str):
+                raise ValueError(f'{value} is not a value of {type_uri}')
+            return URIRef(self.concept_prefixes[type_uri] + value)
+
+        node = BNode()
+        if isinstance(value, dict):
+            self.add_attribute_triples(triples, node, type_uri, value)
+        elif item_table == 'OSLODatatypePrimitive' and 'waarde' in self.attributes.get(type_uri, {}):
+            attribute_uri, waarde_type_uri = self.attributes[type_uri]['waarde']
+            triples.append((node, attribute_uri, self.get_value_node(triples, waarde_type_uri, value)))
+        else:
+            raise ValueError(f'{value} is not a value of {type_uri}')
+        return node
+
+    @classmethod
+    def get_literal(cls, type_uri: str, value) -> Literal:
+        """Literals get the datatype of the attribute, from their json text so rdflib checks it. Strings and json
+        values of the wrong type get the datatype of json-ld, so they still fail the datatype constraints."""
+        if isinstance(value, (dict, list)):
+            raise ValueError(f'{value} is not a value of {type_uri}')
+        if type_uri in cls.plain_literal_types:
+            return Literal(value)
+        return Literal(value if isinstance(value, str) else json.dumps(value), datatype=URIRef(type_uri))
@@ -1,65 +1,544 @@
-import concurrent
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Dict, List, Tuple
 
-from rdflib import Graph, Namespace, URIRef, RDF, RDFS, OWL, Literal, SH, BNode, SKOS
+from rdflib import Graph, Namespace, URIRef, RDF, RDFS, OWL, Literal, SH, BNode
 
+from CodelistStore import CodelistStore
+from LazyCodelistIndex import LazyCodelistIndex
+from NTriplesWriter import NTriplesWriter
 from OTLEnumerationCreator import OTLEnumerationCreator
+from OTLSubsetModel import OTLSubsetModel
 from SQLDbReader import SQLDbReader
+from ShaclManifest import ShaclManifest
+from ShaclOutputCache import ShaclOutputCache
+
+
+SH_AND = URIRef('http://www.w3.org/ns/shacl#and')
+SH_OR = URIRef('http://www.w3.org/ns/shacl#or')
+SH_XONE = URIRef('http://www.w3.org/ns/shacl#xone')
+SH_IN = URIRef('http://www.w3.org/ns/shacl#in')
+SH_CLASS = URIRef('http://www.w3.org/ns/shacl#class')
+RELATIE_OBJECT_BRON = URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject.bron')
+RELATIE_OBJECT_DOEL = URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject.doel')
+LITERAL_TRUE = Literal(True)
+LITERAL_ZERO = Literal(0)
+LITERAL_ONE = Literal(1)
+# datatype uri -> the shapes that reference it, in insertion order (the values are None)
+ShapeIndex = Dict[URIRef, Dict[URIRef, None]]
 
 
 class OTLShaclGenerator:
+    # the codelists of a worker process of generate_shacl_for_subsets, set by its initializer
+    worker_codelist_store: CodelistStore = None
+    # triples a stage collects before handing them to the graph, see flush_triples
+    triple_batch_size = 10000
+    # rows with the same value in this column are built in the same chunk (union constraints and relation constraints
+    # need all rows of one datatype or relation together)
+    stage_chunk_keys = {'classes': None, 'properties': None, 'union': 1, 'complex': 1, 'primitive': 1, 'relations': 4}
+    # tables the generator reads, hashed in the manifest of an incremental run
+    manifest_tables = ['OSLOClass', 'OSLOAttributen', 'InternalBaseClass', 'TypeLinkTabel', 'OSLODatatypeComplex',
+                       'OSLODatatypeComplexAttributen', 'OSLODatatypePrimitive', 'OSLODatatypePrimitiveAttributen',
+                       'OSLODatatypeUnion', 'OSLODatatypeUnionAttributen', 'OSLOEnumeration', 'OSLORelaties']
+
+    @staticmethod
+    def generate_shacl_from_otl(subset_path: Path, shacl_path: Path, ont_path: Path,
+                                union_encoding: str = 'pairwise', jobs: int = 1, codelist_store: CodelistStore = None,
+                                env: str = OTLEnumerationCreator.default_environment, in_memory: bool = False,
+                                materialize_inheritance: bool = False) -> (Graph, Graph):
+        OTLShaclGenerator.check_paths(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path)
+        with SQLDbReader(subset_path, in_memory=in_memory) as reader:
+            model = OTLShaclGenerator.read_model_from_reader(reader=reader)
+        return OTLShaclGenerator.generate_shacl_from_model(model=model, shacl_path=shacl_path, ont_path=ont_path,
+                                                           union_encoding=union_encoding, jobs=jobs,
+                                                           codelist_store=codelist_store, env=env,
+                                                           materialize_inheritance=materialize_inheritance)
+
+    @staticmethod
+    def read_model_from_reader(reader) -> OTLSubsetModel:
+        return OTLSubsetModel.from_rows(
+            classes=OTLShaclGenerator.read_classes_from_reader(reader=reader),
+            properties=OTLShaclGenerator.read_properties_from_reader(reader=reader),
+            inheritances=OTLShaclGenerator.read_inheritances_from_reader(reader=reader),
+            union_attributes=OTLShaclGenerator.read_union_attributes_from_reader(reader=reader),
+            complex_attributes=OTLShaclGenerator.read_complex_attributes_from_reader(reader=reader),
+            primitive_attributes=OTLShaclGenerator.read_primitive_attributes_from_reader(reader=reader),
+            enums=OTLShaclGenerator.read_enums_from_reader(reader=reader),
+            relations=OTLShaclGenerator.read_relations_from_reader(reader=reader))
+
+    @staticmethod
+    def generate_shacl_from_model(model: OTLSubsetModel, shacl_path: Path, ont_path: Path,
+                                  union_encoding: str = 'pairwise', jobs: int = 1, codelist_store: CodelistStore = None,
+                                  env: str = OTLEnumerationCreator.default_environment,
+                                  materialize_inheritance: bool = False) -> (Graph, Graph):
+        """Same as generate_shacl_from_otl, for a subset model that was already read or loaded from a file.
+        With materialize_inheritance, the subclasses are written into the target classes and the sh:class checks of
+        the shapes, so the shapes validate without the ontology graph and without rdfs inference. With jobs > 1, the
+        shapes are written to shacl_path as N-Triples, which is also valid Turtle, without building the shapes graph,
+        and None is returned in its place."""
+        class_rows = model.classes
+        property_rows = model.properties
+        union_attr_rows = model.union_attributes
+        complex_attr_rows = model.complex_attributes
+        primitive_attr_rows = model.primitive_attributes
+        enum_rows = model.enums
+        relation_rows = model.relations
+
+        g = OTLShaclGenerator.get_initial_graph()
+
+        # inheritances
+        h = OTLShaclGenerator.get_initial_graph()
+        h = OTLShaclGenerator.add_owl_classes_to_graph(g=h, rows=class_rows)
+        h = OTLShaclGenerator.add_inheritances_to_graph(g=h, rows=model.inheritances)
+
+        subclasses = OTLShaclGenerator.get_subclass_closure(model.inheritances) if materialize_inheritance else None
+
+        if jobs > 1:
+            stage_rows = {'classes': class_rows, 'properties': property_rows, 'union': union_attr_rows,
+                          'complex': complex_attr_rows, 'primitive': primitive_attr_rows, 'relations': relation_rows}
+            with NTriplesWriter(shacl_path) as writer:
+                writer.addN((s, p, o, writer) for s, p, o in g)
+                shape_index = OTLShaclGenerator.build_shapes_in_parallel(writer=writer, stage_rows=stage_rows,
+                                                                         jobs=jobs, union_encoding=union_encoding,
+                                                                         subclasses=subclasses)
+                OTLShaclGenerator.add_enums_to_graph(g=writer, rows=enum_rows, shape_index=shape_index,
+                                                     codelist_store=codelist_store, env=env)
+            h.serialize(format='turtle', destination=ont_path)
+            return None, h
+        else:
+            g = OTLShaclGenerator.add_classes_to_graph(g=g, rows=class_rows, subclasses=subclasses)
+
+            # datatype uri -> shapes that reference it (rdfs:comment), filled while the shapes are created
+            shape_index = {}
+
+            # properties
+            g = OTLShaclGenerator.add_properties_to_graph(g=g, rows=property_rows, shape_index=shape_index)
+
+            # union attributes
+            g = OTLShaclGenerator.add_union_attributes_to_graph(g=g, rows=union_attr_rows, shape_index=shape_index,
+                                                                union_encoding=union_encoding)
+
+            # complex attributes
+            g = OTLShaclGenerator.add_complex_attributes_to_graph(g=g, rows=complex_attr_rows,
+                                                                  shape_index=shape_index)
+
+            # primitive attributes
+            g = OTLShaclGenerator.add_primitive_attributes_to_graph(g=g, rows=primitive_attr_rows,
+                                                                    shape_index=shape_index)
+
+            # enums
+            g = OTLShaclGenerator.add_enums_to_graph(g=g, rows=enum_rows, shape_index=shape_index,
+                                                     codelist_store=codelist_store, env=env)
+
+            # relation
+            g = OTLShaclGenerator.add_relations_to_graph(g=g, rows=relation_rows, subclasses=subclasses)
+
+        g.serialize(format='turtle', destination=shacl_path)
+        h.serialize(format='turtle', destination=ont_path)
+
+        return g, h
+
+    @staticmethod
+    def generate_shacl_for_subsets(subset_paths: [Path], output_dir: Path, jobs: int = 1,
+                                   union_encoding: str = 'pairwise', codelist_store: CodelistStore = None,
+                                   env: str = OTLEnumerationCreator.default_environment
+                                   ) -> Dict[Path, Tuple[Path, Path]]:
+        """Generates the shacl and ontology files of every subset in a pool of jobs processes, writing them to
+        output_dir as generated_shacl_<subset>.ttl and generated_ont_<subset>.ttl. The codelists of env are loaded
+        once, unless the codelist_store already has them, and handed to every worker. A subset that fails is logged
+        and left out of the result, which maps every generated subset to its shacl and ontology path."""
+        names = [subset_path.stem for subset_path in subset_paths]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f'Subsets with the same file name would overwrite each other: {", ".join(duplicates)}')
+
+        if codelist_store is None:
+            codelist_store = CodelistStore()
+        codelists = codelist_store.get_codelists(env)
+
+        generated = {}
+        with ProcessPoolExecutor(max_workers=jobs, initializer=OTLShaclGenerator.set_codelists,
+                                 initargs=(env, codelists)) as executor:
+            futures = {}
+            for subset_path in subset_paths:
+                shacl_path = output_dir / f'generated_shacl_{subset_path.stem}.ttl'
+                ont_path = output_dir / f'generated_ont_{subset_path.stem}.ttl'
+                future = executor.submit(OTLShaclGenerator.generate_subset_files, subset_path=subset_path,
+                                         shacl_path=shacl_path, ont_path=ont_path, union_encoding=union_encoding,
+                                         env=env)
+                futures[future] = (subset_path, shacl_path, ont_path)
+            for future in as_completed(futures):
+                subset_path, shacl_path, ont_path = futures[future]
+                try:
+                    future.result()
+                except Exception as exc:
+                    logging.error(f'Could not generate the files of {subset_path}: {exc}')
+                    continue
+                logging.info(f'Generated {shacl_path} and {ont_path}')
+                generated[subset_path] = (shacl_path, ont_path)
+        return generated
+
+    @staticmethod
+    def set_codelists(env: str, codelists: Dict[str, Tuple[URIRef, ...]]):
+        """Worker initializer of generate_shacl_for_subsets, so the workers use the codelists of the parent."""
+        OTLShaclGenerator.worker_codelist_store = CodelistStore()
+        OTLShaclGenerator.worker_codelist_store.put(env, codelists)
+
+    @staticmethod
+    def generate_subset_files(subset_path: Path, shacl_path: Path, ont_path: Path, union_encoding: str, env: str):
+        OTLShaclGenerator.generate_shacl_from_otl(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path,
+                                                  union_encoding=union_encoding,
+                                                  codelist_store=OTLShaclGenerator.worker_codelist_store, env=env)
+
     @staticmethod
-    def generate_shacl_from_otl(subset_path: Path, shacl_path: Path, ont_path: Path) -> (Graph, Graph):
+    def generate_shacl_files_with_cache(subset_path: Path, shacl_path: Path, ont_path: Path, cache: ShaclOutputCache,
+                                        codelist_snapshot: str, union_encoding: str = 'pairwise', jobs: int = 1,
+                                        codelist_store: CodelistStore = None,
+                                        env: str = OTLEnumerationCreator.default_environment, in_memory: bool = False,
+                                        materialize_inheritance: bool = False) -> bool:
+        """Writes the shacl and ontology files of the subset, copying them from the cache if it holds them for the
+        same subset contents, codelist snapshot (e.g. the commit of the codelist repository), environment, generator
+        version and settings. Otherwise they are generated and stored in the cache. Returns True on a cache hit."""
+        OTLShaclGenerator.check_paths(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path)
+        if not os.path.isfile(subset_path):
+            raise FileNotFoundError(str(subset_path) + " is not a valid path. File does not exist.")
+        key = ShaclOutputCache.get_key(subset_path=subset_path, codelist_snapshot=codelist_snapshot,
+                                       env=env, generator_version=OTLShaclGenerator.get_generator_version(),
+                                       settings={'union_encoding': union_encoding,
+                                                 'materialize_inheritance': materialize_inheritance})
+        if cache.get(key, shacl_path=shacl_path, ont_path=ont_path):
+            logging.info(f'Copied the shacl and ontology files of {subset_path} from the cache')
+            return True
+
+        OTLShaclGenerator.generate_shacl_from_otl(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path,
+                                                  union_encoding=union_encoding, jobs=jobs,
+                                                  codelist_store=codelist_store, env=env, in_memory=in_memory,
+                                                  materialize_inheritance=materialize_inheritance)
+        cache.put(key, shacl_path=shacl_path, ont_path=ont_path)
+        return False
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def get_generator_version() -> str:
+        """Hash of the source of the generator and of the modules it reads the subset and the codelists with, so
+        cached output is not reused after one of them changed."""
+        digest = hashlib.sha256()
+        for module_class in [OTLShaclGenerator, SQLDbReader, OTLSubsetModel, OTLEnumerationCreator, CodelistStore,
+                             LazyCodelistIndex, NTriplesWriter]:
+            with open(sys.modules[module_class.__module__].__file__, 'rb') as source_file:
+                digest.update(source_file.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def stream_shacl_from_otl(subset_path: Path, shacl_path: Path, ont_path: Path,
+                              union_encoding: str = 'pairwise', codelist_store: CodelistStore = None,
+                              env: str = OTLEnumerationCreator.default_environment, in_memory: bool = False,
+                              materialize_inheritance: bool = False) -> (int, int):
+        """Generates the same shapes and ontology as generate_shacl_from_otl, but every stage writes its triples
+        straight to an N-Triples file instead of adding them to a Graph. Only the shape index and the enumeration
+        lists are kept in memory, the rows are read in batches. With materialize_inheritance, the inheritances are
+        read at once to compute the subclasses. Returns the number of triples written to the shacl and the ontology
+        file."""
+        OTLShaclGenerator.check_paths(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path)
+        with SQLDbReader(subset_path, in_memory=in_memory) as reader:
+            class_rows = OTLShaclGenerator.read_classes_from_reader(reader=reader)
+            inheritance_rows = OTLShaclGenerator.read_inheritances_from_reader(reader=reader,
+                                                                               lazy=not materialize_inheritance)
+            subclasses = OTLShaclGenerator.get_subclass_closure(inheritance_rows) if materialize_inheritance else None
+
+            with NTriplesWriter(ont_path) as h:
+                h.addN((s, p, o, h) for s, p, o in OTLShaclGenerator.get_initial_graph())
+                OTLShaclGenerator.add_owl_classes_to_graph(g=h, rows=class_rows)
+                OTLShaclGenerator.add_inheritances_to_graph(g=h, rows=inheritance_rows)
+
+            with NTriplesWriter(shacl_path) as g:
+                g.addN((s, p, o, g) for s, p, o in OTLShaclGenerator.get_initial_graph())
+                OTLShaclGenerator.add_classes_to_graph(g=g, rows=class_rows, subclasses=subclasses)
+
+                shape_index = {}
+                OTLShaclGenerator.add_properties_to_graph(
+                    g=g, rows=OTLShaclGenerator.read_properties_from_reader(reader=reader, lazy=True),
+                    shape_index=shape_index)
+                OTLShaclGenerator.add_union_attributes_to_graph(
+                    g=g, rows=OTLShaclGenerator.read_union_attributes_from_reader(reader=reader, lazy=True),
+                    shape_index=shape_index, union_encoding=union_encoding)
+                OTLShaclGenerator.add_complex_attributes_to_graph(
+                    g=g, rows=OTLShaclGenerator.read_complex_attributes_from_reader(reader=reader, lazy=True),
+                    shape_index=shape_index)
+                OTLShaclGenerator.add_primitive_attributes_to_graph(
+                    g=g, rows=OTLShaclGenerator.read_primitive_attributes_from_reader(reader=reader, lazy=True),
+                    shape_index=shape_index)
+                OTLShaclGenerator.add_enums_to_graph(
+                    g=g, rows=OTLShaclGenerator.read_enums_from_reader(reader=reader, lazy=True),
+                    shape_index=shape_index, codelist_store=codelist_store, env=env)
+                OTLShaclGenerator.add_relations_to_graph(
+                    g=g, rows=OTLShaclGenerator.read_relations_from_reader(reader=reader, lazy=True),
+                    subclasses=subclasses)
+
+        return g.triple_count, h.triple_count
+
+    @staticmethod
+    def check_paths(subset_path: Path, shacl_path: Path, ont_path: Path):
         if subset_path is None or str(subset_path) == '':
             raise FileNotFoundError(str(subset_path) + " is not a valid path. File does not exist.")
         if shacl_path is None or str(shacl_path) == '':
             raise ValueError(str(shacl_path) + " is not a valid path. Can not create shacl file.")
         if ont_path is None or str(ont_path) == '':
             raise ValueError(str(ont_path) + " is not a valid path. Can not create ontology file.")
-        reader = SQLDbReader(subset_path)
 
-        g = OTLShaclGenerator.get_initial_graph()
+    @staticmethod
+    def regenerate_shacl_from_otl(subset_path: Path, shacl_path: Path, ont_path: Path, manifest_path: Path = None,
+                                  union_encoding: str = 'pairwise', codelist_store: CodelistStore = None,
+                                  env: str = OTLEnumerationCreator.default_environment,
+                                  in_memory: bool = False) -> [str]:
+        """Incremental version of generate_shacl_from_otl. The manifest (next to the shacl file by default) keeps a
+        hash per table and per unit: a class with its properties, a datatype with its attributes, an enumeration or
+        a relation. Only the units whose rows changed, and the units linking into their shapes, are removed from the
+        existing shacl file and rebuilt. Without a usable manifest or output files everything is built. The
+        codelists are not hashed, delete the manifest to pick up a new codelist release, another env rebuilds
+        everything. Returns the rebuilt units."""
+        OTLShaclGenerator.check_paths(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path)
+        if manifest_path is None:
+            manifest_path = ShaclManifest.get_default_path(shacl_path)
+        settings = {'union_encoding': union_encoding, 'env': env}
+        manifest = ShaclManifest.load(manifest_path)
+        if manifest is not None and (manifest.settings != settings or not os.path.isfile(shacl_path) or
+                                     not os.path.isfile(ont_path)):
+            manifest = None
+
+        with SQLDbReader(subset_path, in_memory=in_memory) as reader:
+            table_hashes = OTLShaclGenerator.read_table_hashes(reader=reader)
+            if manifest is not None and manifest.table_hashes == table_hashes:
+                logging.info(f'{shacl_path} is up to date with {subset_path}')
+                return []
+
+            class_rows = OTLShaclGenerator.read_classes_from_reader(reader=reader)
+            inheritance_rows = OTLShaclGenerator.read_inheritances_from_reader(reader=reader)
+            stage_rows = {'classes': class_rows,
+                          'properties': OTLShaclGenerator.read_properties_from_reader(reader=reader),
+                          'union': OTLShaclGenerator.read_union_attributes_from_reader(reader=reader),
+                          'complex': OTLShaclGenerator.read_complex_attributes_from_reader(reader=reader),
+                          'primitive': OTLShaclGenerator.read_primitive_attributes_from_reader(reader=reader),
+                          'relations': OTLShaclGenerator.read_relations_from_reader(reader=reader)}
+            enum_rows = OTLShaclGenerator.read_enums_from_reader(reader=reader)
+        stage_indexes, shape_index = OTLShaclGenerator.get_stage_shape_indexes(stage_rows)
+        units = OTLShaclGenerator.get_shape_units(stage_rows=stage_rows, enum_rows=enum_rows,
+                                                  stage_indexes=stage_indexes, shape_index=shape_index)
+
+        if manifest is None:
+            g = OTLShaclGenerator.get_initial_graph()
+            g = OTLShaclGenerator.add_relatie_object_constraint_to_graph(g)
+            old_units = {}
+            rebuild_keys = set(units)
+        else:
+            g = Graph().parse(shacl_path, format='turtle')
+            old_units = manifest.units
+            rebuild_keys = {key for key, unit in units.items()
+                            if key not in old_units or old_units[key]['hash'] != unit['hash']}
+            removed_keys = set(old_units) - set(units)
+
+            # units linking into shapes that are rebuilt lose those links and have to be rebuilt as well
+            while True:
+                rebuilt_shapes = set()
+                for key in rebuild_keys | removed_keys:
+                    rebuilt_shapes.update(old_units.get(key, {}).get('subjects', []))
+                    rebuilt_shapes.update(units[key]['subjects'] if key in units else [])
+                linked_keys = {key for key, unit in units.items()
+                               if key not in rebuild_keys and not rebuilt_shapes.isdisjoint(unit['links'])}
+                if not linked_keys:
+                    break
+                rebuild_keys |= linked_keys
+
+            for key in rebuild_keys | removed_keys:
+                if key in old_units:
+                    OTLShaclGenerator.remove_unit_from_graph(g, old_units[key])
+
+        enum_rebuild_rows = []
+        for key, unit in units.items():
+            if key not in rebuild_keys:
+                continue
+            for stage, rows in unit['parts']:
+                if stage == 'enums':
+                    enum_rebuild_rows.extend(rows)
+                else:
+                    g = OTLShaclGenerator.add_stage_to_graph(g, stage=stage, rows=rows,
+                                                             shape_index=stage_indexes.get(stage),
+                                                             union_encoding=union_encoding)
+        if enum_rebuild_rows:
+            g = OTLShaclGenerator.add_enums_to_graph(g=g, rows=enum_rebuild_rows, shape_index=shape_index,
+                                                     codelist_store=codelist_store, env=env)
+        g.serialize(format='turtle', destination=shacl_path)
 
-        # classes
-        class_rows = OTLShaclGenerator.read_classes_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_classes_to_graph(g=g, rows=class_rows)
+        ont_tables = ('OSLOClass', 'InternalBaseClass')
+        if manifest is None or any(manifest.table_hashes.get(t) != table_hashes[t] for t in ont_tables):
+            h = OTLShaclGenerator.get_initial_graph()
+            h = OTLShaclGenerator.add_owl_classes_to_graph(g=h, rows=class_rows)
+            h = OTLShaclGenerator.add_inheritances_to_graph(g=h, rows=inheritance_rows)
+            h.serialize(format='turtle', destination=ont_path)
 
-        # inheritances
-        h = OTLShaclGenerator.get_initial_graph()
-        inheritance_rows = OTLShaclGenerator.read_inheritances_from_reader(reader=reader)
-        h = OTLShaclGenerator.add_owl_classes_to_graph(g=h, rows=class_rows)
-        h = OTLShaclGenerator.add_inheritances_to_graph(g=h, rows=inheritance_rows)
+        ShaclManifest(settings=settings, table_hashes=table_hashes,
+                      units={key: {'hash': unit['hash'], 'subjects': unit['subjects'], 'links': unit['links']}
+                             for key, unit in units.items()}).save(manifest_path)
+        logging.info(f'Rebuilt {len(rebuild_keys)} of {len(units)} units of {shacl_path}')
+        return [key for key in units if key in rebuild_keys]
 
-        # properties
-        property_rows = OTLShaclGenerator.read_properties_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_properties_to_graph(g=g, rows=property_rows)
+    @staticmethod
+    def read_table_hashes(reader) -> Dict[str, str]:
+        return {table: ShaclManifest.hash_rows(reader.perform_read_query(f'SELECT * FROM {table}', params={}))
+                for table in OTLShaclGenerator.manifest_tables}
 
-        # union attributes
-        union_attr_rows = OTLShaclGenerator.read_union_attributes_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_union_attributes_to_graph(g=g, rows=union_attr_rows)
+    @staticmethod
+    def get_shape_units(stage_rows: Dict[str, List[tuple]], enum_rows: [tuple],
+                        stage_indexes: Dict[str, ShapeIndex],
+                        shape_index: ShapeIndex) -> Dict[str, dict]:
+        """Splits the rows in units that can be rebuilt on their own. Per unit: the rows per stage (parts), the shapes
+        it owns (subjects), the shapes of other units it adds sh:property or sh:in links to (links) and a hash of
+        those rows and links."""
+        units = {}
+
+        def get_unit(key: str) -> dict:
+            if key not in units:
+                units[key] = {'parts': {}, 'subjects': [], 'links': []}
+            return units[key]
+
+        for row in stage_rows.get('classes', []):
+            unit = get_unit('class:' + row[2])
+            unit['parts'].setdefault('classes', []).append(row)
+            unit['subjects'].append(row[2] + 'Shape')
+        for row in stage_rows.get('properties', []):
+            unit = get_unit('class:' + row[3])
+            unit['parts'].setdefault('properties', []).append(row)
+            unit['subjects'].append(row[6] + 'Shape')
+        for stage in ('union', 'complex', 'primitive'):
+            for row in stage_rows.get(stage, []):
+                unit = get_unit(f'{stage}:{row[1]}')
+                if not unit['parts']:
+                    unit['links'] = [str(s) for s in stage_indexes[stage].get(URIRef(row[1]), [])]
+                    if stage == 'union':
+                        unit['subjects'].append(row[1] + 'UnionConstraint')
+                unit['parts'].setdefault(stage, []).append(row)
+                if not OTLShaclGenerator.is_literal_type(row[1]):
+                    unit['subjects'].append(row[9] + 'Shape')
+        for row in enum_rows:
+            # enumerations with the same codelist share one sh:in list
+            unit = get_unit('enum:' + row[0])
+            unit['parts'].setdefault('enums', []).append(row)
+            unit['links'].extend(str(s) for s in shape_index.get(URIRef(row[1]), {}))
+        for row in stage_rows.get('relations', []):
+            unit = get_unit('relation:' + row[4])
+            if not unit['parts']:
+                unit['subjects'].append(row[4] + 'RelationConstraint')
+            unit['parts'].setdefault('relations', []).append(row)
+
+        for unit in units.values():
+            unit['parts'] = list(unit['parts'].items())
+            unit['hash'] = ShaclManifest.hash_rows(unit['parts'] + [tuple(unit['links'])])
+        return units
 
-        # complex attributes
-        complex_attr_rows = OTLShaclGenerator.read_complex_attributes_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_complex_attributes_to_graph(g=g, rows=complex_attr_rows)
+    @staticmethod
+    def remove_unit_from_graph(g: Graph, unit: dict):
+        """Removes the triples of the shapes a unit owns, its sh:property and sh:in links into other shapes and the
+        blank nodes only those triples referenced."""
+        triples = []
+        for subject in unit['subjects']:
+            subject_ref = URIRef(subject)
+            triples.extend(g.triples((subject_ref, None, None)))
+            triples.extend(g.triples((None, SH.property, subject_ref)))
+        for link in unit['links']:
+            triples.extend(g.triples((URIRef(link), SH_IN, None)))
+
+        while triples:
+            triple = triples.pop()
+            g.remove(triple)
+            if isinstance(triple[2], BNode) and (None, None, triple[2]) not in g:
+                triples.extend(g.triples((triple[2], None, None)))
 
-        # primitive attributes
-        primitive_attr_rows = OTLShaclGenerator.read_primitive_attributes_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_primitive_attributes_to_graph(g=g, rows=primitive_attr_rows)
+    @staticmethod
+    def get_stage_shape_indexes(stage_rows: Dict[str, List[tuple]]) -> (Dict[str, ShapeIndex],
+                                                                        ShapeIndex):
+        """Computes the shape index the union, complex and primitive stages link against in the sequential build from
+        the rows of that stage and the ones before it. Returns those indexes per stage and the complete index."""
+        shape_index = {}
+        stage_indexes = {}
+        for stage, rows in stage_rows.items():
+            OTLShaclGenerator.add_rows_to_shape_index(shape_index=shape_index, stage=stage, rows=rows)
+            if stage in ('union', 'complex', 'primitive'):
+                stage_indexes[stage] = {datatype_ref: dict(shapes) for datatype_ref, shapes in shape_index.items()}
+        return stage_indexes, shape_index
 
-        # enums
-        enum_rows = OTLShaclGenerator.read_enums_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_enums_to_graph(g=g, rows=enum_rows)
+    @staticmethod
+    def build_shapes_in_parallel(writer: NTriplesWriter, stage_rows: Dict[str, List[tuple]], jobs: int,
+                                 union_encoding: str = 'pairwise', subclasses: Dict[str, List[str]] = None
+                                 ) -> ShapeIndex:
+        """Builds the shapes of the stages in stage_rows in a pool of jobs processes. Every worker writes a chunk of
+        rows of one stage to its own N-Triples file, the files are appended to writer in stage and chunk order, so
+        the triples are never merged into a Graph. The shape index a stage links against is computed up front from
+        the rows of that stage and the ones before it, so every stage sees the same index as in the sequential build.
+        Returns the complete shape index."""
+        stage_indexes, shape_index = OTLShaclGenerator.get_stage_shape_indexes(stage_rows)
+        tasks = []
+        for stage, rows in stage_rows.items():
+            for chunk in OTLShaclGenerator.chunk_rows(rows, jobs, key_index=OTLShaclGenerator.stage_chunk_keys[stage]):
+                tasks.append((stage, chunk, stage_indexes.get(stage)))
+
+        if 'relations' in stage_rows:
+            OTLShaclGenerator.add_relatie_object_constraint_to_graph(writer, subclasses=subclasses)
+
+        with tempfile.TemporaryDirectory() as chunk_dir, ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunk_paths = [Path(chunk_dir) / f'chunk_{index}.nt' for index in range(len(tasks))]
+            futures = [executor.submit(OTLShaclGenerator.build_partial_file, path=chunk_path, stage=stage, rows=chunk,
+                                       shape_index=stage_index, union_encoding=union_encoding, subclasses=subclasses)
+                       for chunk_path, (stage, chunk, stage_index) in zip(chunk_paths, tasks)]
+            for chunk_path, future in zip(chunk_paths, futures):
+                writer.add_file(chunk_path, triple_count=future.result())
+        return shape_index
 
-        # relation
-        relation_rows = OTLShaclGenerator.read_relations_from_reader(reader=reader)
-        g = OTLShaclGenerator.add_relations_to_graph(g=g, rows=relation_rows)
+    @staticmethod
+    def build_partial_file(path: Path, stage: str, rows: [tuple], shape_index: ShapeIndex = None,
+                           union_encoding: str = 'pairwise', subclasses: Dict[str, List[str]] = None) -> int:
+        """Writes the triples of the rows of one stage to an N-Triples file. Returns the number of triples."""
+        with NTriplesWriter(path) as writer:
+            OTLShaclGenerator.add_stage_to_graph(writer, stage=stage, rows=rows, shape_index=shape_index,
+                                                 union_encoding=union_encoding, subclasses=subclasses)
+        return writer.triple_count
 
-        g.serialize(format='turtle', destination=shacl_path)
-        h.serialize(format='turtle', destination=ont_path)
+    @staticmethod
+    def add_stage_to_graph(g: Graph, stage: str, rows: [tuple], shape_index: ShapeIndex = None,
+                           union_encoding: str = 'pairwise', subclasses: Dict[str, List[str]] = None) -> Graph:
+        if stage == 'classes':
+            OTLShaclGenerator.add_classes_to_graph(g, rows, subclasses=subclasses)
+        elif stage == 'properties':
+            OTLShaclGenerator.add_properties_to_graph(g, rows)
+        elif stage == 'union':
+            OTLShaclGenerator.add_union_attributes_to_graph(g, rows, shape_index=shape_index,
+                                                            union_encoding=union_encoding)
+        elif stage == 'complex':
+            OTLShaclGenerator.add_complex_attributes_to_graph(g, rows, shape_index=shape_index)
+        elif stage == 'primitive':
+            OTLShaclGenerator.add_primitive_attributes_to_graph(g, rows, shape_index=shape_index)
+        elif stage == 'relations':
+            OTLShaclGenerator.add_relation_constraints_to_graph(g, rows, subclasses=subclasses)
+        else:
+            raise ValueError(f'{stage} is not a valid stage')
+        return g
 
-        return g, h
+    @staticmethod
+    def chunk_rows(rows: [tuple], chunk_count: int, key_index: int = None) -> [[tuple]]:
+        """Splits rows in at most chunk_count chunks, keeping the order. Rows with the same value at key_index end up
+        in the same chunk."""
+        groups = {}
+        for index, row in enumerate(rows):
+            groups.setdefault(index if key_index is None else row[key_index], []).append(row)
+        group_list = list(groups.values())
+        chunk_size = max(1, -(-len(group_list) // chunk_count))
+        return [[row for group in group_list[i:i + chunk_size] for row in group]
+                for i in range(0, len(group_list), chunk_size)]
 
     @staticmethod
     def get_initial_graph() -> Graph:
@@ -90,6 +569,63 @@ class OTLShaclGenerator:
 
         return g
 
+    @staticmethod
+    def build_shape_index(g: Graph) -> ShapeIndex:
+        """Builds the datatype uri -> referencing shapes index from the rdfs:comment links already in the graph.
+        Used when a stage is called without an index that was kept up to date by the previous stages."""
+        shape_index = {}
+        for subj, obj in g.subject_objects(predicate=RDFS.comment):
+            if isinstance(obj, URIRef):
+                OTLShaclGenerator.add_to_shape_index(shape_index, obj, subj)
+        return shape_index
+
+    @staticmethod
+    def add_rows_to_shape_index(shape_index: ShapeIndex, stage: str, rows: [tuple]):
+        """Adds the entries the given stage adds to the shape index while creating its shapes, without creating them."""
+        if stage == 'properties':
+            for row in rows:
+                if not OTLShaclGenerator.is_literal_type(row[7]):
+                    OTLShaclGenerator.add_to_shape_index(shape_index, OTLShaclGenerator.get_uri_ref(row[7]),
+                                                         OTLShaclGenerator.get_uri_ref(row[6] + 'Shape'))
+        elif stage in ('union', 'complex', 'primitive'):
+            for row in rows:
+                if OTLShaclGenerator.is_literal_type(row[1]) or OTLShaclGenerator.is_literal_type(row[10]):
+                    continue
+                OTLShaclGenerator.add_to_shape_index(shape_index, OTLShaclGenerator.get_uri_ref(row[10]),
+                                                     OTLShaclGenerator.get_uri_ref(row[9] + 'Shape'))
+
+    @staticmethod
+    def add_triples(g: Graph, triples: Iterable[tuple]) -> Graph:
+        g.addN((s, p, o, g) for s, p, o in triples)
+        return g
+
+    @staticmethod
+    def flush_triples(g: Graph, triples: [tuple]):
+        """Hands the triples a stage collected so far to g once there are triple_batch_size of them, so a stage
+        writing to an NTriplesWriter keeps a bounded number of triples in memory."""
+        if len(triples) >= OTLShaclGenerator.triple_batch_size:
+            OTLShaclGenerator.add_triples(g, triples)
+            triples.clear()
+
+    @staticmethod
+    @lru_cache(maxsize=100000)
+    def get_uri_ref(uri: str) -> URIRef:
+        """Returns one shared URIRef per uri, so the hot loops do not create and validate the same term per row."""
+        return URIRef(uri)
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def get_int_literal(value: str) -> Literal:
+        return Literal(int(value))
+
+    @staticmethod
+    def is_literal_type(type_uri: str) -> bool:
+        return type_uri == str(RDFS.Literal) or 'http://www.w3.org/2001/XMLSchema' in type_uri
+
+    @staticmethod
+    def add_to_shape_index(shape_index: ShapeIndex, datatype_ref: URIRef, shape_ref: URIRef):
+        shape_index.setdefault(datatype_ref, {})[shape_ref] = None
+
     @staticmethod
     def read_classes_from_reader(reader) -> [tuple]:
         return reader.perform_read_query(
@@ -97,24 +633,34 @@ class OTLShaclGenerator:
             params={})
 
     @staticmethod
-    def add_classes_to_graph(g: Graph, rows: [tuple]) -> Graph:
+    def add_classes_to_graph(g: Graph, rows: [tuple], subclasses: Dict[str, List[str]] = None) -> Graph:
+        """With subclasses (see get_subclass_closure), every class shape also targets the subclasses of its class, so
+        the shapes apply to their instances without subclass inference at validation time."""
+        if subclasses is None:
+            subclasses = {}
+        triples = []
         for row in rows:
-            g.add((URIRef(row[2] + 'Shape'), RDF.type, SH.NodeShape))
-            g.add((URIRef(row[2] + 'Shape'), SH.targetClass, URIRef(row[2])))
-            g.add((URIRef(row[2] + 'Shape'), RDFS.label, Literal(row[0])))
+            shape_ref = OTLShaclGenerator.get_uri_ref(row[2] + 'Shape')
+            triples.append((shape_ref, RDF.type, SH.NodeShape))
+            triples.append((shape_ref, SH.targetClass, OTLShaclGenerator.get_uri_ref(row[2])))
+            for subclass_uri in subclasses.get(row[2], ()):
+                triples.append((shape_ref, SH.targetClass, OTLShaclGenerator.get_uri_ref(subclass_uri)))
+            triples.append((shape_ref, RDFS.label, Literal(row[0])))
             if row[6] != '':
-                g.add((URIRef(row[2] + 'Shape'), OWL.deprecated, Literal(True)))
-        return g
+                triples.append((shape_ref, OWL.deprecated, LITERAL_TRUE))
+            OTLShaclGenerator.flush_triples(g, triples)
+        return OTLShaclGenerator.add_triples(g, triples)
 
     @staticmethod
     def add_owl_classes_to_graph(g: Graph, rows: [tuple]) -> Graph:
-        for row in rows:
-            g.add((URIRef(row[2]), RDF.type, OWL.Class))
-        return g
+        triples = ((OTLShaclGenerator.get_uri_ref(row[2]), RDF.type, OWL.Class) for row in rows)
+        return OTLShaclGenerator.add_triples(g, triples)
 
     @staticmethod
-    def read_properties_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def read_properties_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        # lazy: iterate the rows in batches instead of fetching them all at once
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''SELECT name, label_nl, definition_nl, class_uri, kardinaliteit_min, kardinaliteit_max, uri, type, 
                     overerving, constraints, readonly, usagenote_nl, OSLOAttributen.deprecated_version, 
                     TypeLinkTabel.item_tabel 
@@ -123,92 +669,136 @@ class OTLShaclGenerator:
                 WHERE overerving = 0;''', params={})
 
     @staticmethod
-    def add_properties_to_graph(g: Graph, rows: [tuple]) -> Graph:
+    def add_properties_to_graph(g: Graph, rows: [tuple], shape_index: ShapeIndex = None) -> Graph:
+        if shape_index is None:
+            shape_index = {}
+        triples = []
         for row in rows:
-            class_ref = URIRef(row[3] + 'Shape')
-            shape_ref = URIRef(row[6] + 'Shape')
-
-            g.add((class_ref, SH.property, shape_ref))
-            g.add((shape_ref, RDF.type, SH.PropertyShape))
-            g.add((shape_ref, SH.path, URIRef(row[6])))
-            g.add((shape_ref, SH.name, Literal(row[0])))
-            g.add((shape_ref, RDFS.label, Literal(row[1])))
-
-            if row[7] == 'http://www.w3.org/2000/01/rdf-schema#Literal' or 'http://www.w3.org/2001/XMLSchema' in row[7]:
-                g.add((shape_ref, SH.nodeKind, SH.Literal))
-                g.add((shape_ref, SH.datatype, URIRef(row[7])))
+            class_ref = OTLShaclGenerator.get_uri_ref(row[3] + 'Shape')
+            shape_ref = OTLShaclGenerator.get_uri_ref(row[6] + 'Shape')
+            type_ref = OTLShaclGenerator.get_uri_ref(row[7])
+
+            triples.append((class_ref, SH.property, shape_ref))
+            triples.append((shape_ref, RDF.type, SH.PropertyShape))
+            triples.append((shape_ref, SH.path, OTLShaclGenerator.get_uri_ref(row[6])))
+            triples.append((shape_ref, SH.name, Literal(row[0])))
+            triples.append((shape_ref, RDFS.label, Literal(row[1])))
+
+            if OTLShaclGenerator.is_literal_type(row[7]):
+                triples.append((shape_ref, SH.nodeKind, SH.Literal))
+                triples.append((shape_ref, SH.datatype, type_ref))
             elif row[13] == 'OSLOEnumeration':
-                g.add((shape_ref, SH.nodeKind, SH.IRI))
-                g.add((shape_ref, RDFS.comment, URIRef(row[7])))
+                triples.append((shape_ref, SH.nodeKind, SH.IRI))
+                triples.append((shape_ref, RDFS.comment, type_ref))
+                OTLShaclGenerator.add_to_shape_index(shape_index, type_ref, shape_ref)
             else:
-                g.add((shape_ref, SH.nodeKind, SH.BlankNode))
-                g.add((shape_ref, RDFS.comment, URIRef(row[7])))
+                triples.append((shape_ref, SH.nodeKind, SH.BlankNode))
+                triples.append((shape_ref, RDFS.comment, type_ref))
+                OTLShaclGenerator.add_to_shape_index(shape_index, type_ref, shape_ref)
 
-            g.add((shape_ref, SH.minCount, Literal(0)))  # TODO can't enforce kardinaliteit_min = 1
+            triples.append((shape_ref, SH.minCount, LITERAL_ZERO))  # TODO can't enforce kardinaliteit_min = 1
             if row[5] != '*':
-                g.add((shape_ref, SH.maxCount, Literal(int(row[5]))))
+                triples.append((shape_ref, SH.maxCount, OTLShaclGenerator.get_int_literal(row[5])))
             if row[12] != '':
-                g.add((shape_ref, OWL.deprecated, Literal(True)))
-        return g
+                triples.append((shape_ref, OWL.deprecated, LITERAL_TRUE))
+            OTLShaclGenerator.flush_triples(g, triples)
+        return OTLShaclGenerator.add_triples(g, triples)
 
     @staticmethod
-    def read_inheritances_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def read_inheritances_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''SELECT base_uri, class_uri, deprecated_version FROM InternalBaseClass''',
             params={})
 
     @staticmethod
     def add_inheritances_to_graph(g: Graph, rows: [tuple]) -> Graph:
-        for row in rows:
-            g.add((URIRef(row[1]), RDFS.subClassOf, URIRef(row[0])))
-        return g
+        triples = ((OTLShaclGenerator.get_uri_ref(row[1]), RDFS.subClassOf, OTLShaclGenerator.get_uri_ref(row[0]))
+                   for row in rows)
+        return OTLShaclGenerator.add_triples(g, triples)
 
     @staticmethod
-    def read_complex_attributes_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def get_subclass_closure(inheritance_rows: Iterable[tuple]) -> Dict[str, List[str]]:
+        """Computes the transitive closure of the direct InternalBaseClass edges once: every base class uri with all
+        its direct and indirect subclasses, in depth first order."""
+        children = {}
+        for row in inheritance_rows:
+            children.setdefault(row[0], []).append(row[1])
+
+        closure = {}
+        for base_uri, direct_subclasses in children.items():
+            descendants = []
+            seen = {base_uri}
+            stack = list(reversed(direct_subclasses))
+            while stack:
+                class_uri = stack.pop()
+                if class_uri in seen:
+                    continue
+                seen.add(class_uri)
+                descendants.append(class_uri)
+                stack.extend(reversed(children.get(class_uri, [])))
+            closure[base_uri] = descendants
+        return closure
+
+    @staticmethod
+    def read_complex_attributes_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''SELECT dtc.name, dtc.uri, dtc.label_nl, dtc.deprecated_version, dtca.name, dtca.label_nl, dtca.class_uri, 
                 dtca.kardinaliteit_min, dtca.kardinaliteit_max, dtca.uri, dtca.type, dtca.deprecated_version, 
                 dtca.constraints, TypeLinkTabel.item_tabel  
             FROM OSLODatatypeComplex dtc 
                 LEFT JOIN OSLODatatypeComplexAttributen dtca ON dtc.uri = dtca.class_uri
                 LEFT JOIN TypeLinkTabel ON dtca."type" = TypeLinkTabel.item_uri
-            ORDER BY dtc.uri;''', params={})
+            ORDER BY dtc.uri, dtca.uri;''', params={})
 
     @staticmethod
-    def add_attributes_to_graph(g: Graph, rows: [tuple], attribute_type: str) -> Graph:
+    def add_attributes_to_graph(g: Graph, rows: [tuple], attribute_type: str,
+                                shape_index: ShapeIndex = None,
+                                union_encoding: str = 'pairwise') -> Graph:
+        if shape_index is None:
+            shape_index = OTLShaclGenerator.build_shape_index(g)
         union_dict = {}
+        triples = []
+        # (datatype, attribute) pairs to link once all shapes exist, so rows is only iterated once
+        links = []
         for row in rows:
-            if row[1] == str(RDFS.Literal) or 'http://www.w3.org/2001/XMLSchema' in row[1]:
+            OTLShaclGenerator.flush_triples(g, triples)
+            links.append((row[1], row[9]))
+            if OTLShaclGenerator.is_literal_type(row[1]):
                 continue
 
-            attribute_node_ref = URIRef(row[9] + 'Shape')
+            attribute_node_ref = OTLShaclGenerator.get_uri_ref(row[9] + 'Shape')
+            type_ref = OTLShaclGenerator.get_uri_ref(row[10])
 
-            g.add((attribute_node_ref, RDF.type, SH.PropertyShape))
-            g.add((attribute_node_ref, SH.name, Literal(row[4])))
-            g.add((attribute_node_ref, SH.path, URIRef(row[9])))
-            g.add((attribute_node_ref, RDFS.label, Literal(row[5])))
+            triples.append((attribute_node_ref, RDF.type, SH.PropertyShape))
+            triples.append((attribute_node_ref, SH.name, Literal(row[4])))
+            triples.append((attribute_node_ref, SH.path, OTLShaclGenerator.get_uri_ref(row[9])))
+            triples.append((attribute_node_ref, RDFS.label, Literal(row[5])))
 
-            if row[10] == str(RDFS.Literal) or 'http://www.w3.org/2001/XMLSchema' in row[10]:
-                g.add((attribute_node_ref, SH.nodeKind, SH.Literal))
-                g.add((attribute_node_ref, SH.datatype, URIRef(row[10])))
+            if OTLShaclGenerator.is_literal_type(row[10]):
+                triples.append((attribute_node_ref, SH.nodeKind, SH.Literal))
+                triples.append((attribute_node_ref, SH.datatype, type_ref))
             elif row[13] == 'OSLOEnumeration':
-                g.add((attribute_node_ref, SH.nodeKind, SH.IRI))
-                g.add((attribute_node_ref, RDFS.comment, URIRef(row[10])))
+                triples.append((attribute_node_ref, SH.nodeKind, SH.IRI))
+                triples.append((attribute_node_ref, RDFS.comment, type_ref))
+                OTLShaclGenerator.add_to_shape_index(shape_index, type_ref, attribute_node_ref)
             else:
-                g.add((attribute_node_ref, SH.nodeKind, SH.BlankNode))
-                g.add((attribute_node_ref, RDFS.comment, URIRef(row[10])))
+                triples.append((attribute_node_ref, SH.nodeKind, SH.BlankNode))
+                triples.append((attribute_node_ref, RDFS.comment, type_ref))
+                OTLShaclGenerator.add_to_shape_index(shape_index, type_ref, attribute_node_ref)
 
             if row[11] != '':
-                g.add((attribute_node_ref, OWL.deprecated, Literal(True)))
-            g.add((attribute_node_ref, SH.minCount, Literal(0)))  # can't enforce kardinaliteit_min = 1
+                triples.append((attribute_node_ref, OWL.deprecated, LITERAL_TRUE))
+            triples.append((attribute_node_ref, SH.minCount, LITERAL_ZERO))  # can't enforce kardinaliteit_min = 1
             if row[8] != '*':
-                g.add((attribute_node_ref, SH.maxCount, Literal(int(row[8]))))
+                triples.append((attribute_node_ref, SH.maxCount, OTLShaclGenerator.get_int_literal(row[8])))
 
             if attribute_type == 'primitive':
                 if row[10] == str(RDFS.Literal):
                     if '"^^cdt:ucumunit' in row[12]:
                         unit = row[12].split('"')[1]
-                        g.add((attribute_node_ref, SH.pattern, Literal(unit)))
+                        triples.append((attribute_node_ref, SH.pattern, Literal(unit)))
 
             if attribute_type == 'union':
                 if row[1] not in union_dict:
@@ -216,111 +806,181 @@ class OTLShaclGenerator:
                 union_dict[row[1]].append(row[9])
 
         # do this after creating the shapes to avoid missing attributes in complex datatypes (nested)
-        for row in rows:
-            subjects = g.subjects(predicate=RDFS.comment, object=URIRef(row[1]))
-            for subj in subjects:
-                g.add((subj, SH.property, URIRef(row[9] + 'Shape')))
+        for datatype_uri, attribute_uri in links:
+            for subj in shape_index.get(OTLShaclGenerator.get_uri_ref(datatype_uri), ()):
+                triples.append((subj, SH.property, OTLShaclGenerator.get_uri_ref(attribute_uri + 'Shape')))
+            OTLShaclGenerator.flush_triples(g, triples)
 
         # add union contraints
         if attribute_type == 'union':
             for union_type_uri, attribute_list in union_dict.items():
-                g.add((URIRef(union_type_uri + 'UnionConstraint'), RDF.type, SH.NodeShape))
-                g.add((URIRef(union_type_uri + 'UnionConstraint'), RDFS.comment, Literal(f'union constraint of {union_type_uri}')))
-                g.add((URIRef(union_type_uri + 'UnionConstraint'), SH.targetObjectsOf, URIRef(union_type_uri)))
+                constraint_ref = OTLShaclGenerator.get_uri_ref(union_type_uri + 'UnionConstraint')
+                triples.append((constraint_ref, RDF.type, SH.NodeShape))
+                triples.append((constraint_ref, RDFS.comment, Literal(f'union constraint of {union_type_uri}')))
+                triples.append((constraint_ref, SH.targetObjectsOf, OTLShaclGenerator.get_uri_ref(union_type_uri)))
+                if union_encoding == 'xone':
+                    OTLShaclGenerator.add_union_constraint_xone(triples, constraint_ref, attribute_list)
+                elif union_encoding == 'pairwise':
+                    OTLShaclGenerator.add_union_constraint_pairwise(triples, constraint_ref, attribute_list)
+                else:
+                    raise ValueError(f'{union_encoding} is not a valid union encoding, use pairwise or xone')
+                OTLShaclGenerator.flush_triples(g, triples)
+
+        return OTLShaclGenerator.add_triples(g, triples)
 
-                or_node_list = []
+    @staticmethod
+    def add_union_constraint_pairwise(triples: [tuple], constraint_ref: URIRef, attribute_list: [str]):
+        """sh:or of "no attribute has a value" and, for each attribute, "only this attribute has a value".
+        Every alternative lists all attributes, so the size grows quadratically with the number of attributes."""
+        or_node_list = []
 
-                # 0 maxcount node
-                and_node_list = []
-                for attribute in attribute_list:
+        # 0 maxcount node
+        and_node_list = []
+        for attribute in attribute_list:
+            node = BNode()
+            and_node_list.append(node)
+            triples.append((node, SH.path, OTLShaclGenerator.get_uri_ref(attribute)))
+            triples.append((node, SH.maxCount, LITERAL_ZERO))
+        zero_node_list = OTLShaclGenerator.create_shacl_list(and_node_list, triples)
+        zero_node = BNode()
+        triples.append((zero_node, SH_AND, zero_node_list[0]))
+        or_node_list.append(zero_node)
+
+        # 1 mincount node for each attribute
+        for one_attribute in attribute_list:
+            and_node_list = []
+            for attribute in attribute_list:
+                if attribute == one_attribute:
+                    node = BNode()
+                    and_node_list.append(node)
+                    triples.append((node, SH.path, OTLShaclGenerator.get_uri_ref(attribute)))
+                    triples.append((node, SH.minCount, LITERAL_ONE))
+                else:
                     node = BNode()
                     and_node_list.append(node)
-                    g.add((node, SH.path, URIRef(attribute)))
-                    g.add((node, SH.maxCount, Literal(0)))
-                zero_node_list = OTLShaclGenerator.create_shacl_list(and_node_list, g)
-                zero_node = BNode()
-                g.add((zero_node, URIRef('http://www.w3.org/ns/shacl#and'), zero_node_list[0]))
-                or_node_list.append(zero_node)
-
-                # 1 mincount node for each attribute
-                for one_attribute in attribute_list:
-                    and_node_list = []
-                    for attribute in attribute_list:
-                        if attribute == one_attribute:
-                            node = BNode()
-                            and_node_list.append(node)
-                            g.add((node, SH.path, URIRef(attribute)))
-                            g.add((node, SH.minCount, Literal(1)))
-                        else:
-                            node = BNode()
-                            and_node_list.append(node)
-                            g.add((node, SH.path, URIRef(attribute)))
-                            g.add((node, SH.maxCount, Literal(0)))
-                    one_node_list = OTLShaclGenerator.create_shacl_list(and_node_list, g)
-                    one_node = BNode()
-                    g.add((one_node, URIRef('http://www.w3.org/ns/shacl#and'), one_node_list[0]))
-                    or_node_list.append(one_node)
-
-                or_list = OTLShaclGenerator.create_shacl_list(or_node_list, g)
-                g.add((URIRef(union_type_uri + 'UnionConstraint'), URIRef('http://www.w3.org/ns/shacl#or'), or_list[0]))
+                    triples.append((node, SH.path, OTLShaclGenerator.get_uri_ref(attribute)))
+                    triples.append((node, SH.maxCount, LITERAL_ZERO))
+            one_node_list = OTLShaclGenerator.create_shacl_list(and_node_list, triples)
+            one_node = BNode()
+            triples.append((one_node, SH_AND, one_node_list[0]))
+            or_node_list.append(one_node)
 
-        return g
+        or_list = OTLShaclGenerator.create_shacl_list(or_node_list, triples)
+        triples.append((constraint_ref, SH_OR, or_list[0]))
+
+    @staticmethod
+    def add_union_constraint_xone(triples: [tuple], constraint_ref: URIRef, attribute_list: [str]):
+        """sh:xone of one shape per attribute that requires a value for that attribute, plus one shape that requires
+        none of the attributes to have a value. Exactly one of those conforms if and only if at most one attribute is
+        used, with a size linear in the number of attributes."""
+        xone_node_list = []
+        for attribute in attribute_list:
+            node = BNode()
+            xone_node_list.append(node)
+            triples.append((node, SH.path, OTLShaclGenerator.get_uri_ref(attribute)))
+            triples.append((node, SH.minCount, LITERAL_ONE))
+
+        alternative_path_list = OTLShaclGenerator.create_shacl_list(
+            [OTLShaclGenerator.get_uri_ref(a) for a in attribute_list], triples)
+        alternative_path_node = BNode()
+        triples.append((alternative_path_node, SH.alternativePath, alternative_path_list[0]))
+        zero_node = BNode()
+        triples.append((zero_node, SH.path, alternative_path_node))
+        triples.append((zero_node, SH.maxCount, LITERAL_ZERO))
+        xone_node_list.append(zero_node)
+
+        xone_list = OTLShaclGenerator.create_shacl_list(xone_node_list, triples)
+        triples.append((constraint_ref, SH_XONE, xone_list[0]))
 
     @staticmethod
-    def create_shacl_list(element_list: Iterable, g: Graph):
+    def create_shacl_list(element_list: Iterable, triples: [tuple]) -> [BNode]:
+        """Appends the triples of an rdf list with the given elements to triples and returns the list nodes."""
         or_node_list = []
         for element in element_list:
             list_item_node = BNode()
             or_node_list.append(list_item_node)
-            g.add((list_item_node, RDF.first, element))
+            triples.append((list_item_node, RDF.first, element))
         for index, node in enumerate(or_node_list[0:-1]):
-            g.add((or_node_list[index], RDF.rest, or_node_list[index + 1]))
-        g.add((or_node_list[-1], RDF.rest, RDF.nil))
+            triples.append((or_node_list[index], RDF.rest, or_node_list[index + 1]))
+        triples.append((or_node_list[-1], RDF.rest, RDF.nil))
         return or_node_list
 
     @staticmethod
-    def add_complex_attributes_to_graph(g: Graph, rows: [tuple]) -> Graph:
-        return OTLShaclGenerator.add_attributes_to_graph(g, rows, 'complex')
+    def add_complex_attributes_to_graph(g: Graph, rows: [tuple],
+                                        shape_index: ShapeIndex = None) -> Graph:
+        return OTLShaclGenerator.add_attributes_to_graph(g, rows, 'complex', shape_index=shape_index)
     @staticmethod
-    def get_enum_values_from_graph(keuzelijstnaam: str, enum_creator: OTLEnumerationCreator):
-        g = enum_creator.get_graph(keuzelijstnaam, enum_creator.env)
-        return g.subjects(predicate=RDF.type, object=SKOS.Concept)
+    def get_enum_values_from_graph(keuzelijstnaam: str, codelist_store: CodelistStore,
+                                   env: str = OTLEnumerationCreator.default_environment) -> Tuple[URIRef, ...]:
+        return codelist_store.get_concepts(keuzelijstnaam, env)
 
     @staticmethod
-    def read_enums_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def read_enums_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''SELECT name, uri, label_nl, codelist, deprecated_version FROM OSLOEnumeration;''', params={})
 
     @staticmethod
-    def add_enum_to_graph(enum_row: tuple, g: Graph, enum_creator: OTLEnumerationCreator): # does not use adm status
-        subjects = g.subjects(predicate=RDFS.comment, object=URIRef(enum_row[1]))
+    def add_enum_to_graph(enum_row: tuple, g: Graph, codelist_store: CodelistStore,
+                          shape_index: ShapeIndex = None, enum_list_cache: Dict[str, tuple] = None,
+                          env: str = OTLEnumerationCreator.default_environment) -> int: # does not use adm status
+        """Adds a sh:in constraint to every shape referencing the enumeration. The rdf list with the concepts is
+        created once per codelist and shared by all those shapes, enum_list_cache keeps the list head and its size
+        across calls. Returns the number of triples saved by sharing the list."""
+        if shape_index is None:
+            shape_index = OTLShaclGenerator.build_shape_index(g)
+        if enum_list_cache is None:
+            enum_list_cache = {}
+        subjects = shape_index.get(OTLShaclGenerator.get_uri_ref(enum_row[1]), {})
+        if not subjects:
+            return 0
+
+        triples = []
+        saved_triples = 0
+        if enum_row[0] in enum_list_cache:
+            list_head, list_triple_count = enum_list_cache[enum_row[0]]
+            saved_triples += list_triple_count
+        else:
+            enum_values = list(OTLShaclGenerator.get_enum_values_from_graph(enum_row[0], codelist_store, env))
+            if not enum_values:
+                return 0
+            list_head = OTLShaclGenerator.create_shacl_list(enum_values, triples)[0]
+            list_triple_count = 2 * len(enum_values)
+            enum_list_cache[enum_row[0]] = (list_head, list_triple_count)
+
         for subj in subjects:
-            enum_values = OTLShaclGenerator.get_enum_values_from_graph(enum_row[0], enum_creator)
-            if enum_values is not None:
-                enum_node_list = []
-                for enum_value in enum_values:
-                    list_item_node = BNode()
-                    enum_node_list.append(list_item_node)
-                    g.add((list_item_node, RDF.first, enum_value))
-                for index, node in enumerate(enum_node_list[0:-1]):
-                    g.add((enum_node_list[index], RDF.rest, enum_node_list[index + 1]))
-                g.add((enum_node_list[-1], RDF.rest, RDF.nil))
-                g.add((subj, URIRef('http://www.w3.org/ns/shacl#in'), enum_node_list[0]))
-
-    @staticmethod
-    def add_enums_to_graph(g: Graph, rows: [tuple]) -> Graph:
-        with OTLEnumerationCreator(oslo_collector=None, env='prd') as enum_creator:
-            enum_creator.download_unzip_and_parse_to_dict(enum_creator.env)
-            executor = ThreadPoolExecutor(1)
-            futures = [executor.submit(OTLShaclGenerator.add_enum_to_graph, enum_row=enum_row, g=g, enum_creator=enum_creator)
-                       for enum_row in rows]
-            concurrent.futures.wait(futures)
+            triples.append((subj, SH_IN, list_head))
+        OTLShaclGenerator.add_triples(g, triples)
+        return saved_triples + list_triple_count * (len(subjects) - 1)
 
+    @staticmethod
+    def add_enums_to_graph(g: Graph, rows: [tuple], shape_index: ShapeIndex = None,
+                           codelist_store: CodelistStore = None,
+                           env: str = OTLEnumerationCreator.default_environment) -> Graph:
+        """Adds the sh:in constraints of the enumerations, with the codelists of env. Without a codelist_store, the
+        codelists are loaded into a new one."""
+        if codelist_store is None:
+            codelist_store = CodelistStore()
+
+        if shape_index is None:
+            shape_index = OTLShaclGenerator.build_shape_index(g)
+        enum_list_cache = {}
+        saved_triples = 0
+        for enum_row in rows:
+            try:
+                saved_triples += OTLShaclGenerator.add_enum_to_graph(
+                    enum_row=enum_row, g=g, codelist_store=codelist_store, shape_index=shape_index,
+                    enum_list_cache=enum_list_cache, env=env)
+            except ValueError as exc:
+                logging.warning(exc)
+
+        logging.info(f'Sharing the sh:in lists of {len(enum_list_cache)} enumerations saved {saved_triples} triples')
         return g
 
     @staticmethod
-    def read_primitive_attributes_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def read_primitive_attributes_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''
             SELECT dtp.name, dtp.uri, dtp.label_nl, dtp.deprecated_version, dtpa.name, dtpa.label_nl, dtpa.class_uri, 
                 dtpa.kardinaliteit_min, dtpa.kardinaliteit_max, dtpa.uri, dtpa.type, dtpa.deprecated_version, 
@@ -328,54 +988,72 @@ class OTLShaclGenerator:
             FROM OSLODatatypePrimitive dtp 
                 LEFT JOIN OSLODatatypePrimitiveAttributen dtpa ON dtp.uri = dtpa.class_uri
                 LEFT JOIN TypeLinkTabel ON dtpa."type" = TypeLinkTabel.item_uri
-            ORDER BY dtp.uri;''', params={})
+            ORDER BY dtp.uri, dtpa.uri;''', params={})
 
     @staticmethod
-    def add_primitive_attributes_to_graph(g: Graph, rows: [tuple]) -> Graph:
-        return OTLShaclGenerator.add_attributes_to_graph(g, rows, 'primitive')
+    def add_primitive_attributes_to_graph(g: Graph, rows: [tuple],
+                                          shape_index: ShapeIndex = None) -> Graph:
+        return OTLShaclGenerator.add_attributes_to_graph(g, rows, 'primitive', shape_index=shape_index)
 
     @staticmethod
-    def read_union_attributes_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def read_union_attributes_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''SELECT dtu.name, dtu.uri, dtu.label_nl, dtu.deprecated_version, dtua.name, dtua.label_nl, dtua.class_uri,
             dtua.kardinaliteit_min, dtua.kardinaliteit_max, dtua.uri, dtua.type, dtua.deprecated_version,
             dtua.constraints, TypeLinkTabel.item_tabel  
             FROM OSLODatatypeUnion dtu 
                 LEFT JOIN OSLODatatypeUnionAttributen dtua ON dtu.uri = dtua.class_uri
                 LEFT JOIN TypeLinkTabel ON dtua."type" = TypeLinkTabel.item_uri
-            ORDER BY dtu.uri;''', params={})
+            ORDER BY dtu.uri, dtua.uri;''', params={})
 
     @staticmethod
-    def add_union_attributes_to_graph(g: Graph, rows: [tuple]) -> Graph:
-        return OTLShaclGenerator.add_attributes_to_graph(g, rows, 'union')
+    def add_union_attributes_to_graph(g: Graph, rows: [tuple], shape_index: ShapeIndex = None,
+                                      union_encoding: str = 'pairwise') -> Graph:
+        return OTLShaclGenerator.add_attributes_to_graph(g, rows, 'union', shape_index=shape_index,
+                                                         union_encoding=union_encoding)
 
     @staticmethod
-    def read_relations_from_reader(reader) -> [tuple]:
-        return reader.perform_read_query(
+    def read_relations_from_reader(reader, lazy: bool = False) -> Iterable[tuple]:
+        query = reader.iter_query if lazy else reader.perform_read_query
+        return query(
             '''SELECT bron_overerving, doel_overerving, bron_uri, doel_uri, uri, richting, usagenote_nl, 
             deprecated_version FROM OSLORelaties WHERE bron_overerving = '' And doel_overerving = '';''', params={})
 
     @staticmethod
-    def add_relations_to_graph(g: Graph, rows: [tuple]):
+    def add_relations_to_graph(g: Graph, rows: [tuple], subclasses: Dict[str, List[str]] = None):
+        """With subclasses (see get_subclass_closure), the target classes and the sh:class checks include the
+        subclasses, so no subclass inference is needed at validation time."""
+        g = OTLShaclGenerator.add_relatie_object_constraint_to_graph(g, subclasses=subclasses)
+        return OTLShaclGenerator.add_relation_constraints_to_graph(g, rows, subclasses=subclasses)
 
-        g.add((URIRef('RelatieObjectConstraint'), RDF.type, SH.NodeShape))
-        g.add((URIRef('RelatieObjectConstraint'), SH.targetClass,
-               URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject')))
+    @staticmethod
+    def add_relatie_object_constraint_to_graph(g: Graph, subclasses: Dict[str, List[str]] = None) -> Graph:
+        constraint_ref = URIRef(
+            'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObjectConstraint')
+        triples = []
+        triples.append((constraint_ref, RDF.type, SH.NodeShape))
+        for class_uri in OTLShaclGenerator.add_subclasses(
+                ['https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject'], subclasses):
+            triples.append((constraint_ref, SH.targetClass, OTLShaclGenerator.get_uri_ref(class_uri)))
 
         bron_node = BNode()
         doel_node = BNode()
 
-        g.add((bron_node, SH.path,
-               URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject.bron')))
-        g.add((bron_node, SH.minCount, Literal(1)))
-        g.add((doel_node, SH.path,
-               URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject.doel')))
-        g.add((doel_node, SH.minCount, Literal(1)))
+        triples.append((bron_node, SH.path,
+               RELATIE_OBJECT_BRON))
+        triples.append((bron_node, SH.minCount, LITERAL_ONE))
+        triples.append((doel_node, SH.path,
+               RELATIE_OBJECT_DOEL))
+        triples.append((doel_node, SH.minCount, LITERAL_ONE))
 
         lijst = [bron_node, doel_node]
-        and_node_list = OTLShaclGenerator.create_shacl_list(lijst, g)
-        g.add((URIRef('RelatieObjectConstraint'), URIRef('http://www.w3.org/ns/shacl#and'), and_node_list[0]))
+        and_node_list = OTLShaclGenerator.create_shacl_list(lijst, triples)
+        triples.append((constraint_ref, SH_AND, and_node_list[0]))
+        return OTLShaclGenerator.add_triples(g, triples)
 
+    @staticmethod
+    def add_relation_constraints_to_graph(g: Graph, rows: [tuple], subclasses: Dict[str, List[str]] = None) -> Graph:
         relatie_dict = {}
         for row in rows:
             if row[4] not in relatie_dict:
@@ -385,36 +1063,74 @@ class OTLShaclGenerator:
             else:
                 relatie_dict[row[4]][row[2]].append(row[3])
 
-        executor = ThreadPoolExecutor(10)
-        futures = [executor.submit(OTLShaclGenerator.add_relation_contraints, relatie_dict=relatie_dict, g=g,
-                                   relation_uri=relation_uri)
-                   for relation_uri in relatie_dict]
-        concurrent.futures.wait(futures)
+        triples = []
+        for relation_uri in relatie_dict:
+            OTLShaclGenerator.add_relation_contraints(triples=triples, relatie_dict=relatie_dict,
+                                                      relation_uri=relation_uri, subclasses=subclasses)
+            OTLShaclGenerator.flush_triples(g, triples)
 
-        return g
+        return OTLShaclGenerator.add_triples(g, triples)
 
     @staticmethod
-    def add_relation_contraints(g, relatie_dict, relation_uri):
-        g.add((URIRef(relation_uri + 'RelationConstraint'), RDF.type, SH.NodeShape))
-        g.add((URIRef(relation_uri + 'RelationConstraint'), SH.targetClass, URIRef(relation_uri)))
-        or_node_list = []
+    def add_relation_contraints(triples: [tuple], relatie_dict: dict, relation_uri: str,
+                                subclasses: Dict[str, List[str]] = None):
+        """Adds a sh:or with one alternative per group of source classes that allow the same target classes, instead
+        of one alternative per (bron, doel) pair. Each alternative checks the bron against the source classes of the
+        group and the doel against the allowed target classes of that group."""
+        constraint_ref = OTLShaclGenerator.get_uri_ref(relation_uri + 'RelationConstraint')
+        triples.append((constraint_ref, RDF.type, SH.NodeShape))
+        for class_uri in OTLShaclGenerator.add_subclasses([relation_uri], subclasses):
+            triples.append((constraint_ref, SH.targetClass, OTLShaclGenerator.get_uri_ref(class_uri)))
+
+        # group the source classes that allow exactly the same target classes
+        bron_groups = {}
         for bron, doelen in relatie_dict[relation_uri].items():
-            for doel in doelen:
-                and_node = BNode()
-                or_node_list.append(and_node)
-                bron_node = BNode()
-                doel_node = BNode()
-
-                g.add((bron_node, SH.path,
-                       URIRef(
-                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject.bron')))
-                g.add((bron_node, URIRef('http://www.w3.org/ns/shacl#class'), URIRef(bron)))
-                g.add((doel_node, SH.path,
-                       URIRef(
-                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#RelatieObject.doel')))
-                g.add((doel_node, URIRef('http://www.w3.org/ns/shacl#class'), URIRef(doel)))
-                and_node_list = [bron_node, doel_node]
-                and_node_list = OTLShaclGenerator.create_shacl_list(and_node_list, g)
-                g.add((and_node, URIRef('http://www.w3.org/ns/shacl#and'), and_node_list[0]))
-        or_node_list = OTLShaclGenerator.create_shacl_list(or_node_list, g)
-        g.add((URIRef(relation_uri + 'RelationConstraint'), URIRef('http://www.w3.org/ns/shacl#or'), or_node_list[0]))
+            doelen_key = tuple(sorted(set(doelen)))
+            if doelen_key not in bron_groups:
+                bron_groups[doelen_key] = []
+            bron_groups[doelen_key].append(bron)
+
+        or_node_list = []
+        for doelen, bronnen in bron_groups.items():
+            bron_node = OTLShaclGenerator.create_class_constraint(
+                triples, RELATIE_OBJECT_BRON, OTLShaclGenerator.add_subclasses(bronnen, subclasses))
+            doel_node = OTLShaclGenerator.create_class_constraint(
+                triples, RELATIE_OBJECT_DOEL, OTLShaclGenerator.add_subclasses(doelen, subclasses))
+            and_node = BNode()
+            or_node_list.append(and_node)
+            and_node_list = OTLShaclGenerator.create_shacl_list([bron_node, doel_node], triples)
+            triples.append((and_node, SH_AND, and_node_list[0]))
+        or_node_list = OTLShaclGenerator.create_shacl_list(or_node_list, triples)
+        triples.append((constraint_ref, SH_OR, or_node_list[0]))
+
+    @staticmethod
+    def add_subclasses(class_uris: Iterable[str], subclasses: Dict[str, List[str]] = None) -> [str]:
+        """Returns class_uris followed by their subclasses that are not in the list yet."""
+        class_uris = list(class_uris)
+        if not subclasses:
+            return class_uris
+        seen = set(class_uris)
+        for class_uri in list(class_uris):
+            for subclass_uri in subclasses.get(class_uri, ()):
+                if subclass_uri not in seen:
+                    seen.add(subclass_uri)
+                    class_uris.append(subclass_uri)
+        return class_uris
+
+    @staticmethod
+    def create_class_constraint(triples: [tuple], path_ref: URIRef, class_uris: [str]) -> BNode:
+        """Creates a property shape on path_ref that requires the values to be an instance of one of class_uris."""
+        node = BNode()
+        triples.append((node, SH.path, path_ref))
+        if len(class_uris) == 1:
+            triples.append((node, SH_CLASS, OTLShaclGenerator.get_uri_ref(class_uris[0])))
+            return node
+
+        class_node_list = []
+        for class_uri in class_uris:
+            class_node = BNode()
+            class_node_list.append(class_node)
+            triples.append((class_node, SH_CLASS, OTLShaclGenerator.get_uri_ref(class_uri)))
+        class_node_list = OTLShaclGenerator.create_shacl_list(class_node_list, triples)
+        triples.append((node, SH_OR, class_node_list[0]))
+        return node
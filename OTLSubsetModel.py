@@ -0,0 +1,116 @@
+import pickle
+from pathlib import Path
+from typing import NamedTuple, List
+
+
+class ClassRecord(NamedTuple):
+    label_nl: str
+    name: str
+    uri: str
+    definition_nl: str
+    usagenote_nl: str
+    abstract: int
+    deprecated_version: str
+
+
+class PropertyRecord(NamedTuple):
+    name: str
+    label_nl: str
+    definition_nl: str
+    class_uri: str
+    kardinaliteit_min: str
+    kardinaliteit_max: str
+    uri: str
+    type: str
+    overerving: int
+    constraints: str
+    readonly: int
+    usagenote_nl: str
+    deprecated_version: str
+    item_tabel: str
+
+
+class InheritanceRecord(NamedTuple):
+    base_uri: str
+    class_uri: str
+    deprecated_version: str
+
+
+class DatatypeAttributeRecord(NamedTuple):
+    """One attribute of a complex, primitive or union datatype, joined with the datatype itself."""
+    datatype_name: str
+    datatype_uri: str
+    datatype_label_nl: str
+    datatype_deprecated_version: str
+    name: str
+    label_nl: str
+    class_uri: str
+    kardinaliteit_min: str
+    kardinaliteit_max: str
+    uri: str
+    type: str
+    deprecated_version: str
+    constraints: str
+    item_tabel: str
+
+
+class EnumRecord(NamedTuple):
+    name: str
+    uri: str
+    label_nl: str
+    codelist: str
+    deprecated_version: str
+
+
+class RelationRecord(NamedTuple):
+    bron_overerving: str
+    doel_overerving: str
+    bron_uri: str
+    doel_uri: str
+    uri: str
+    richting: str
+    usagenote_nl: str
+    deprecated_version: str
+
+
+class OTLSubsetModel:
+    """The rows of a subset the generator works with, as typed records. The records are NamedTuples, so the generator
+    stages can keep indexing them like the sqlite3 rows. Can be saved to and loaded from a binary file, so the subset
+    is only queried once."""
+    version = 1
+    record_types = {'classes': ClassRecord, 'properties': PropertyRecord, 'inheritances': InheritanceRecord,
+                    'union_attributes': DatatypeAttributeRecord, 'complex_attributes': DatatypeAttributeRecord,
+                    'primitive_attributes': DatatypeAttributeRecord, 'enums': EnumRecord,
+                    'relations': RelationRecord}
+
+    def __init__(self, classes: List[ClassRecord], properties: List[PropertyRecord],
+                 inheritances: List[InheritanceRecord], union_attributes: List[DatatypeAttributeRecord],
+                 complex_attributes: List[DatatypeAttributeRecord], primitive_attributes: List[DatatypeAttributeRecord],
+                 enums: List[EnumRecord], relations: List[RelationRecord]):
+        self.classes = classes
+        self.properties = properties
+        self.inheritances = inheritances
+        self.union_attributes = union_attributes
+        self.complex_attributes = complex_attributes
+        self.primitive_attributes = primitive_attributes
+        self.enums = enums
+        self.relations = relations
+
+    @classmethod
+    def from_rows(cls, **rows_per_table) -> 'OTLSubsetModel':
+        return cls(**{table: list(map(record_type._make, rows_per_table[table]))
+                      for table, record_type in cls.record_types.items()})
+
+    def save(self, path: Path):
+        # plain tuples pickle much smaller and faster than NamedTuples, which store their class with every record
+        content = {table: [tuple(record) for record in getattr(self, table)] for table in self.record_types}
+        with open(path, 'wb') as model_file:
+            pickle.dump((self.version, content), model_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path) -> 'OTLSubsetModel':
+        with open(path, 'rb') as model_file:
+            version, content = pickle.load(model_file)
+        if version != cls.version:
+            raise ValueError(f'{path} holds version {version} of the subset model, expected {cls.version}')
+        return cls.from_rows(**content)
@@ -1,13 +1,28 @@
 import os
 import sqlite3
 from pathlib import Path
+from typing import Iterator
 
 
 class SQLDbReader:
     """SQLDbReader performs read query's. It first checks if the provided path has a file. Provides an easy way to
-    override querying for testing purposes. """
+    override querying for testing purposes. The database is opened read-only and immutable on the first query and
+    that connection is reused until close() is called, or the reader is used as a context manager and exits. The file
+    must not change while the reader is open."""
+    mmap_size = 256 * 1024 * 1024
+    cache_size_kib = 64 * 1024
+    # (table, column) indexes built in the in memory snapshot, the subsets ship without indexes on the join and filter
+    # columns of the generator queries
+    snapshot_indexes = [('TypeLinkTabel', 'item_uri'), ('OSLOAttributen', 'class_uri'),
+                        ('OSLOAttributen', 'overerving'), ('OSLODatatypeComplexAttributen', 'class_uri'),
+                        ('OSLODatatypePrimitiveAttributen', 'class_uri'), ('OSLODatatypeUnionAttributen', 'class_uri'),
+                        ('OSLORelaties', 'bron_overerving')]
 
-    def __init__(self, path: Path = None):
+    def __init__(self, path: Path = None, in_memory: bool = False):
+        """With in_memory, the database is copied into an in memory database with the backup API on the first query
+        and the snapshot_indexes are built there. The file itself is never modified."""
+        self.connection = None
+        self.in_memory = in_memory
         if path is None or path == '':
             self.file_exists = False
         else:
@@ -16,15 +31,55 @@ class SQLDbReader:
             if not self.file_exists:
                 raise FileNotFoundError(str(self.path) + " is not a valid path. File does not exist.")
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_connection(self) -> sqlite3.Connection:
+        if self.connection is None:
+            if not os.path.isfile(self.path):
+                raise FileNotFoundError(str(self.path) + " is not a valid path. File does not exist.")
+            self.connection = sqlite3.connect(self.path.as_uri() + '?mode=ro&immutable=1', uri=True,
+                                              check_same_thread=False)
+            self.connection.execute(f'PRAGMA mmap_size = {self.mmap_size}')
+            self.connection.execute(f'PRAGMA cache_size = -{self.cache_size_kib}')
+            if self.in_memory:
+                self.connection = self.create_snapshot(self.connection)
+        return self.connection
+
+    @staticmethod
+    def create_snapshot(file_connection: sqlite3.Connection) -> sqlite3.Connection:
+        snapshot = sqlite3.connect(':memory:', check_same_thread=False)
+        file_connection.backup(snapshot)
+        file_connection.close()
+
+        tables = {row[0] for row in snapshot.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, column in SQLDbReader.snapshot_indexes:
+            if table in tables:
+                snapshot.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ("{column}")')
+        snapshot.execute('ANALYZE')
+        snapshot.execute('PRAGMA query_only = 1')
+        return snapshot
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
     def perform_read_query(self, query: str, params: dict):
-        self.file_exists = os.path.isfile(self.path)
-        if not self.file_exists:
-            raise FileNotFoundError(str(self.path) + " is not a valid path. File does not exist.")
-
-        con = sqlite3.connect(self.path)
-        cur = con.cursor()
-        data = []
-        for row in cur.execute(query, params):
-            data.append(row)
-        con.close()
-        return data
+        return self.get_connection().execute(query, params).fetchall()
+
+    def iter_query(self, query: str, params: dict, batch_size: int = 1000) -> Iterator[tuple]:
+        """Yields the rows of the query, fetching batch_size rows at a time instead of the whole result. The reader
+        must stay open until the iterator is exhausted."""
+        cursor = self.get_connection().execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cursor.close()
@@ -0,0 +1,47 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+class ShaclManifest:
+    """Sidecar file of a generated shacl file. Keeps the content hashes of the subset tables and, per unit (a class,
+    datatype, enumeration or relation), the hash of its rows, the shapes it owns and the shapes it links into, so a
+    next run can rebuild only the units that changed."""
+    version = 1
+
+    def __init__(self, settings: dict, table_hashes: Dict[str, str], units: Dict[str, dict]):
+        self.settings = settings
+        self.table_hashes = table_hashes
+        self.units = units
+
+    @staticmethod
+    def get_default_path(shacl_path: Path) -> Path:
+        return shacl_path.with_name(shacl_path.stem + '.manifest.json')
+
+    @staticmethod
+    def hash_rows(rows: Iterable[tuple]) -> str:
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(repr(row).encode('utf-8'))
+            digest.update(b'\n')
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['ShaclManifest']:
+        """Returns None if there is no manifest at path or it was written by another version."""
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding='utf-8') as manifest_file:
+            content = json.load(manifest_file)
+        if content.get('version') != cls.version:
+            return None
+        return cls(settings=content['settings'], table_hashes=content['tables'], units=content['units'])
+
+    def save(self, path: Path):
+        temp_path = Path(str(path) + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as manifest_file:
+            json.dump({'version': self.version, 'settings': self.settings, 'tables': self.table_hashes,
+                       'units': self.units}, manifest_file, indent=1)
+        os.replace(temp_path, path)
@@ -0,0 +1,72 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+
+class ShaclOutputCache:
+    """Directory of generated shacl and ontology files, one entry per key. The key is computed from everything the
+    output depends on, so an entry never has to be invalidated. When the entries take more than max_size bytes, the
+    least recently used ones are removed."""
+    shacl_file_name = 'shacl.ttl'
+    ont_file_name = 'ont.ttl'
+
+    def __init__(self, cache_dir: Path, max_size: int = 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def get_key(subset_path: Path, codelist_snapshot: str, env: str, generator_version: str, settings: dict) -> str:
+        digest = hashlib.sha256()
+        with open(subset_path, 'rb') as subset_file:
+            for block in iter(lambda: subset_file.read(1024 * 1024), b''):
+                digest.update(block)
+        digest.update(repr((codelist_snapshot, env, generator_version, sorted(settings.items()))).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str, shacl_path: Path, ont_path: Path) -> bool:
+        """Copies the files of the entry to shacl_path and ont_path. Returns False if there is no entry for key."""
+        entry_path = self.cache_dir / key
+        try:
+            shutil.copyfile(entry_path / self.shacl_file_name, shacl_path)
+            shutil.copyfile(entry_path / self.ont_file_name, ont_path)
+        except FileNotFoundError:
+            return False
+        os.utime(entry_path)
+        return True
+
+    def put(self, key: str, shacl_path: Path, ont_path: Path):
+        """Stores copies of the files under key. The entry is prepared next to the others and renamed in place, so
+        concurrent readers never see half an entry."""
+        entry_path = self.cache_dir / key
+        if entry_path.exists():
+            os.utime(entry_path)
+            return
+        temp_path = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-'))
+        shutil.copyfile(shacl_path, temp_path / self.shacl_file_name)
+        shutil.copyfile(ont_path, temp_path / self.ont_file_name)
+        try:
+            os.rename(temp_path, entry_path)
+        except OSError:
+            # another process stored the same key in the meantime
+            shutil.rmtree(temp_path, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for entry_path in self.cache_dir.iterdir():
+            if not entry_path.is_dir() or entry_path.name.startswith('.tmp-'):
+                continue
+            size = sum(file_path.stat().st_size for file_path in entry_path.iterdir())
+            entries.append((entry_path.stat().st_mtime, size, entry_path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
+            logging.info(f'Evicted {entry_path.name} from the shacl cache')
@@ -0,0 +1,103 @@
+import threading
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from rdflib import URIRef
+
+from CodelistStore import CodelistStore
+from LazyCodelistIndex import LazyCodelistIndex
+
+KEUZELIJST_PATH = Path(__file__).parent / 'KlTestKeuzelijst.ttl'
+
+
+def create_codelists(env: str, concept_count: int = 10) -> dict:
+    scheme_uri = 'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlTestKeuzelijst'
+    return {scheme_uri: tuple(URIRef(f'https://example.org/{env}/waarde-{i}') for i in range(concept_count))}
+
+
+class CodelistStoreTests(TestCase):
+    def test_loads_every_environment_once(self):
+        loaded = []
+
+        def loader(env):
+            loaded.append(env)
+            time.sleep(0.05)
+            return create_codelists(env)
+
+        store = CodelistStore(loader=loader)
+        threads = [threading.Thread(target=store.get_codelists, args=(env,)) for env in ['prd', 'tei'] * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['prd', 'tei'], sorted(loaded))
+        self.assertEqual(URIRef('https://example.org/tei/waarde-0'), store.get_concepts('KlTestKeuzelijst', 'tei')[0])
+
+    def test_prefetch_loads_environments_concurrently(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def loader(env):
+            with lock:
+                running.append(env)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(env)
+            return create_codelists(env)
+
+        store = CodelistStore(loader=loader)
+        store.prefetch(['prd', 'tei', 'dev'])
+        self.assertEqual(3, max(max_running))
+        self.assertEqual({'prd', 'tei', 'dev'}, set(store.futures))
+
+    def test_evicts_least_recently_used_environment(self):
+        loaded = []
+
+        def loader(env):
+            loaded.append(env)
+            return create_codelists(env, concept_count=100)
+
+        size = CodelistStore.get_size(create_codelists('prd', concept_count=100))
+        store = CodelistStore(max_size=int(size * 2.5), loader=loader)
+        store.get_codelists('prd')
+        store.get_codelists('tei')
+        store.get_codelists('prd')
+        store.get_codelists('dev')
+        self.assertEqual(['prd', 'dev'], list(store.futures))
+
+        store.get_codelists('tei')
+        self.assertEqual(['prd', 'tei', 'dev', 'tei'], loaded)
+
+    def test_failed_load_is_retried(self):
+        attempts = []
+
+        def loader(env):
+            attempts.append(env)
+            if len(attempts) == 1:
+                raise OSError('no network')
+            return create_codelists(env)
+
+        store = CodelistStore(loader=loader)
+        with self.assertRaises(OSError):
+            store.get_codelists('prd')
+        self.assertIn('https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlTestKeuzelijst',
+                      store.get_codelists('prd'))
+
+    def test_loads_with_the_enumeration_creator(self):
+        store = CodelistStore(codelist_paths={'unittest': KEUZELIJST_PATH}, lazy=True)
+        self.assertEqual(6, len(store.get_concepts('KlTestKeuzelijst', 'unittest')))
+
+    def test_size_of_lazy_index_grows_with_parsed_concepts(self):
+        store = CodelistStore(loader=lambda env: LazyCodelistIndex(KEUZELIJST_PATH.read_bytes()))
+        store.put('prd', create_codelists('prd'))
+        store.max_size = store.sizes['prd'] + CodelistStore.get_size(LazyCodelistIndex(KEUZELIJST_PATH.read_bytes()))
+        store.get_codelists('unittest')
+        unparsed_size = store.sizes['unittest']
+        self.assertEqual(['prd', 'unittest'], list(store.futures))
+
+        self.assertEqual(6, len(store.get_concepts('KlTestKeuzelijst', 'unittest')))
+        self.assertGreater(store.sizes['unittest'], unparsed_size)
+        self.assertEqual(['unittest'], list(store.futures))
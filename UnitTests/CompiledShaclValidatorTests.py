@@ -0,0 +1,113 @@
+import inspect
+from collections import Counter
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from pyshacl import validate
+from rdflib import Graph, Literal, RDF, SH, URIRef
+
+import OTLShaclGeneratorTests as generator_tests
+from CompiledShaclValidator import CompiledShaclValidator
+from OTLShaclGenerator import OTLShaclGenerator
+from SQLDbReader import SQLDbReader
+
+ROOT_PATH = Path(__file__).parent.parent
+SHAPES = '''@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+<https://example.org/ns#BordShape> a sh:NodeShape ;
+    sh:targetClass <https://example.org/ns#Bord> ;
+    sh:property [ sh:path <https://example.org/ns#Bord.naam> ; sh:datatype xsd:string ; sh:maxCount 1 ] .
+<https://example.org/ns#NaamShape> a sh:NodeShape ;
+    sh:targetClass <https://example.org/ns#Bord> ;
+    sh:property [ sh:path <https://example.org/ns#Bord.naam> ; sh:minLength 6 ] .
+'''
+DATA = b'''<https://example.org/id/1> a <https://example.org/ns#Bord> ;
+    <https://example.org/ns#Bord.naam> "A01.1", "A01.22" .
+'''
+
+
+def assert_same_results(test_case: TestCase, expected, actual):
+    test_case.assertEqual(expected[0], actual[0])
+    test_case.assertEqual(Counter(CompiledShaclValidator.get_results(expected[1])),
+                          Counter(CompiledShaclValidator.get_results(actual[1])))
+
+
+class CompiledShaclValidatorGeneratorTests(generator_tests.OTLShaclGeneratorTests):
+    """Runs the tests of OTLShaclGeneratorTests that validate, with every validation also done by the compiled
+    shapes."""
+    def setUp(self):
+        test_source = inspect.getsource(getattr(self, self._testMethodName))
+        if 'validate(' not in test_source:
+            self.skipTest('does not validate')
+        if ('OTL_AllCasesTestClass' in test_source or 'generate_data_shacl_ont_asset_for_testclass' in test_source) \
+                and not Path('OTL_AllCasesTestClass.db').exists():
+            self.skipTest('needs OTL_AllCasesTestClass.db')
+
+        def validate_both(data_graph, shacl_graph, ont_graph=None, allow_infos=False, allow_warnings=False):
+            expected = validate(data_graph, shacl_graph=shacl_graph, ont_graph=ont_graph, allow_infos=allow_infos,
+                                allow_warnings=allow_warnings)
+            actual = CompiledShaclValidator(shacl_graph).validate(
+                data_graph, ont_graph=ont_graph, allow_infos=allow_infos, allow_warnings=allow_warnings)
+            assert_same_results(self, expected, actual)
+            return expected
+
+        validate_patch = patch.object(generator_tests, 'validate', side_effect=validate_both)
+        validate_patch.start()
+        self.addCleanup(validate_patch.stop)
+
+
+class CompiledShaclValidatorTests(TestCase):
+    def test_same_results_as_validate(self):
+        shacl_graph = Graph().parse(ROOT_PATH / 'generated_shacl_otl_dyn_borden.ttl')
+        ont_graph = Graph().parse(ROOT_PATH / 'generated_ont_otl_dyn_borden.ttl')
+        data_graph = Graph().parse(ROOT_PATH / 'assets_dyn_borden.jsonld')
+        compiled = CompiledShaclValidator(shacl_graph)
+        self.assertIsNone(compiled.fallback_graph)
+
+        actual = compiled.validate(data_graph, ont_graph=ont_graph, allow_infos=True, allow_warnings=True)
+        expected = validate(data_graph, shacl_graph=shacl_graph, ont_graph=ont_graph, allow_infos=True,
+                            allow_warnings=True)
+        assert_same_results(self, expected, actual)
+        self.assertIn(f'Results ({len(CompiledShaclValidator.get_results(expected[1]))}):', actual[2])
+
+    def test_falls_back_to_pyshacl(self):
+        shacl_graph = Graph().parse(data=SHAPES, format='turtle')
+        data_graph = Graph().parse(data=DATA, format='turtle')
+        compiled = CompiledShaclValidator(shacl_graph)
+        self.assertEqual([URIRef('https://example.org/ns#BordShape')], [shape for shape, _, _ in compiled.shapes])
+        self.assertIn((URIRef('https://example.org/ns#NaamShape'), RDF.type, SH.NodeShape), compiled.fallback_graph)
+        self.assertNotIn((URIRef('https://example.org/ns#BordShape'), RDF.type, SH.NodeShape),
+                         compiled.fallback_graph)
+
+        actual = compiled.validate(data_graph)
+        assert_same_results(self, validate(data_graph, shacl_graph=shacl_graph), actual)
+        self.assertEqual({SH.MaxCountConstraintComponent, SH.MinLengthConstraintComponent},
+                         set(actual[1].objects(None, SH.sourceConstraintComponent)))
+        self.assertIn((None, SH.value, Literal('A01.1')), actual[1])
+
+    def test_pattern_with_other_flags_falls_back_to_pyshacl(self):
+        shapes = SHAPES.replace('sh:minLength 6', 'sh:pattern "^a01.1$" ; sh:flags "is"')
+        shacl_graph = Graph().parse(data=shapes, format='turtle')
+        data_graph = Graph().parse(data=DATA, format='turtle')
+        compiled = CompiledShaclValidator(shacl_graph)
+        self.assertIn((URIRef('https://example.org/ns#NaamShape'), RDF.type, SH.NodeShape), compiled.fallback_graph)
+
+        actual = compiled.validate(data_graph)
+        assert_same_results(self, validate(data_graph, shacl_graph=shacl_graph), actual)
+        self.assertIn((None, SH.value, Literal('A01.22')), actual[1])
+
+    def test_materialized_inheritance_is_compiled(self):
+        with SQLDbReader(ROOT_PATH / 'OTL_Dynamische_borden.db') as reader:
+            model = OTLShaclGenerator.read_model_from_reader(reader)
+        subclasses = OTLShaclGenerator.get_subclass_closure(model.inheritances)
+        shacl_graph = OTLShaclGenerator.add_classes_to_graph(Graph(), model.classes, subclasses=subclasses)
+        shacl_graph = OTLShaclGenerator.add_properties_to_graph(shacl_graph, model.properties)
+        shacl_graph = OTLShaclGenerator.add_relations_to_graph(shacl_graph, model.relations, subclasses=subclasses)
+        self.assertTrue(any(len(list(shacl_graph.objects(shape, SH.targetClass))) > 1
+                            for shape in shacl_graph.subjects(RDF.type, SH.NodeShape)))
+
+        compiled = CompiledShaclValidator(shacl_graph)
+        self.assertIsNone(compiled.fallback_graph)
+        data_graph = Graph().parse(ROOT_PATH / 'assets_dyn_borden.jsonld')
+        assert_same_results(self, validate(data_graph, shacl_graph=shacl_graph), compiled.validate(data_graph))
@@ -0,0 +1,39 @@
+from pathlib import Path
+from unittest import TestCase
+
+from rdflib import URIRef
+
+from LazyCodelistIndex import LazyCodelistIndex
+from OTLEnumerationCreator import OTLEnumerationCreator
+
+KEUZELIJST_PATH = Path(__file__).parent / 'KlTestKeuzelijst.ttl'
+KEUZELIJST_URI = 'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlTestKeuzelijst'
+
+
+class LazyCodelistIndexTests(TestCase):
+    def test_same_concepts_as_full_parse(self):
+        index = LazyCodelistIndex(KEUZELIJST_PATH.read_bytes())
+        self.assertEqual(OTLEnumerationCreator.parse_graph_to_dict(KEUZELIJST_PATH), dict(index))
+
+    def test_only_looked_up_schemes_are_parsed(self):
+        text = (b'@prefix skos: <http://www.w3.org/2004/02/skos/core#> .\n'
+                b'<http://example.org/A> a skos:ConceptScheme .\n'
+                b'<http://example.org/B> a skos:ConceptScheme .\n'
+                b'<http://example.org/a1> a skos:Concept ;\n  skos:inScheme <http://example.org/A> .\n'
+                b'<http://example.org/b1> a skos:Concept ;\n  skos:inScheme <http://example.org/B> .\n'
+                b'<http://example.org/b2> a skos:Concept ; skos:inScheme <http://example.org/B> .\n')
+        index = LazyCodelistIndex(text)
+        self.assertEqual(2, len(index))
+        self.assertEqual((URIRef('http://example.org/b1'), URIRef('http://example.org/b2')),
+                         index['http://example.org/B'])
+        self.assertEqual(['http://example.org/B'], list(index.concepts))
+        self.assertIsNone(index.get('http://example.org/C'))
+
+    def test_parses_all_when_statements_can_not_be_split(self):
+        text = (b'@prefix skos: <http://www.w3.org/2004/02/skos/core#> .\n'
+                b'<http://example.org/A> a skos:ConceptScheme ;\n  skos:definition """first line.\n'
+                b'second line.""" .\n'
+                b'<http://example.org/a1> a skos:Concept ; skos:inScheme <http://example.org/A> .\n')
+        index = LazyCodelistIndex(text)
+        self.assertEqual((URIRef('http://example.org/a1'),), index['http://example.org/A'])
+        self.assertTrue(index.parsed_all)
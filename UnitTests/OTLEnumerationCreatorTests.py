@@ -0,0 +1,84 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+from zipfile import ZipFile
+
+from rdflib import URIRef
+
+from OTLEnumerationCreator import OTLEnumerationCreator
+
+KEUZELIJST_PATH = Path(__file__).parent / 'KlTestKeuzelijst.ttl'
+KEUZELIJST_URI = 'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlTestKeuzelijst'
+
+
+class OTLEnumerationCreatorTests(TestCase):
+    def test_codelist_path_ttl(self):
+        codelists = OTLEnumerationCreator(oslo_collector=None, env='unittest',
+                                          codelist_path=KEUZELIJST_PATH).read_codelists()
+        concepts = OTLEnumerationCreator.get_concepts(codelists, 'KlTestKeuzelijst')
+        self.assertEqual(6, len(concepts))
+        self.assertIn(URIRef('https://wegenenverkeer.data.vlaanderen.be/id/concept/KlTestKeuzelijst/waarde-1'),
+                      concepts)
+        with self.assertRaises(ValueError):
+            OTLEnumerationCreator.get_concepts(codelists, 'KlOnbekend')
+
+    def test_codelist_path_zip_uses_parsed_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = Path(temp_dir) / 'all.ttl.zip'
+            with ZipFile(zip_path, 'w') as zip_file:
+                zip_file.write(KEUZELIJST_PATH, arcname='all.ttl')
+            cache_dir = Path(temp_dir) / 'cache'
+
+            OTLEnumerationCreator(oslo_collector=None, env='unittest', cache_dir=cache_dir,
+                                  codelist_path=zip_path).read_codelists()
+            self.assertEqual(1, len(list((cache_dir / 'unittest').glob('parsed-*.pickle'))))
+
+            with patch.object(OTLEnumerationCreator, 'parse_graph_to_dict', side_effect=AssertionError('parsed')):
+                codelists = OTLEnumerationCreator(oslo_collector=None, env='unittest', cache_dir=cache_dir,
+                                                  codelist_path=zip_path).read_codelists()
+            self.assertEqual(6, len(codelists[KEUZELIJST_URI]))
+
+    def test_offline_uses_previous_download(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_dir = Path(temp_dir)
+            with self.assertRaises(FileNotFoundError):
+                OTLEnumerationCreator(oslo_collector=None, env='unittest', cache_dir=cache_dir,
+                                      offline=True).read_codelists()
+
+            (cache_dir / 'unittest').mkdir()
+            with ZipFile(cache_dir / 'unittest' / 'all.ttl.zip', 'w') as zip_file:
+                zip_file.write(KEUZELIJST_PATH, arcname='all.ttl')
+            with patch('OTLEnumerationCreator.urlretrieve', side_effect=AssertionError('downloaded')):
+                codelists = OTLEnumerationCreator(oslo_collector=None, env='unittest', cache_dir=cache_dir,
+                                                  offline=True).read_codelists()
+            self.assertIn(KEUZELIJST_URI, codelists)
+
+    def test_lazy_zip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            zip_path = Path(temp_dir) / 'all.ttl.zip'
+            with ZipFile(zip_path, 'w') as zip_file:
+                zip_file.write(KEUZELIJST_PATH, arcname='all.ttl')
+            codelists = OTLEnumerationCreator(oslo_collector=None, env='unittest', codelist_path=zip_path,
+                                              lazy=True).read_codelists()
+        self.assertEqual({}, codelists.concepts)
+        self.assertEqual(OTLEnumerationCreator.parse_graph_to_dict(KEUZELIJST_PATH)[KEUZELIJST_URI],
+                         OTLEnumerationCreator.get_concepts(codelists, 'KlTestKeuzelijst'))
+
+    def test_download_is_parsed_from_the_zip(self):
+        def download(url, path):
+            with ZipFile(path, 'w') as zip_file:
+                zip_file.write(KEUZELIJST_PATH, arcname='all.ttl')
+
+        module_dir = Path(__file__).parent.parent
+        files_before = set(module_dir.iterdir())
+        with patch('OTLEnumerationCreator.urlretrieve', side_effect=download), \
+                patch.object(ZipFile, 'extract', side_effect=AssertionError('extracted')), \
+                patch.object(ZipFile, 'extractall', side_effect=AssertionError('extracted')):
+            codelists = OTLEnumerationCreator(oslo_collector=None, env='prd').read_codelists()
+        self.assertEqual(6, len(codelists[KEUZELIJST_URI]))
+        self.assertEqual(files_before, set(module_dir.iterdir()))
+
+    def test_offline_without_source(self):
+        with self.assertRaises(ValueError):
+            OTLEnumerationCreator(oslo_collector=None, offline=True)
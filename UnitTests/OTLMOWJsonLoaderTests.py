@@ -0,0 +1,84 @@
+import io
+import json
+from decimal import Decimal
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from pyshacl import validate
+from rdflib import Graph, Literal, RDF, URIRef, XSD
+
+from OTLMOWJsonLoader import OTLMOWJsonLoader
+
+ROOT_PATH = Path(__file__).parent.parent
+ONDERDEEL = 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#'
+IMEL = 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#'
+
+
+class OTLMOWJsonLoaderTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.loader = OTLMOWJsonLoader(ROOT_PATH / 'OTL_Dynamische_borden.db')
+
+    def test_load_assets(self):
+        with open(ROOT_PATH / 'assets_dyn_borden.json', 'rb') as json_file:
+            g = self.loader.load(json_file)
+        bord = URIRef('https://data.awvvlaanderen.be/id/asset/BORD_1')
+        relation = URIRef('https://data.awvvlaanderen.be/id/assetrelatie/Sturing_-_BORD_1_-_OMV_1')
+        self.assertIn((bord, RDF.type, URIRef(ONDERDEEL + 'DynBordRSS')), g)
+        self.assertIn((bord, URIRef(IMEL + 'AIMToestand.toestand'),
+                       URIRef('https://wegenenverkeer.data.vlaanderen.be/id/concept/KlAIMToestand/in-gebruik')), g)
+        self.assertIn((bord, URIRef(IMEL + 'AIMObject.typeURI'), Literal(ONDERDEEL + 'DynBordRSS',
+                                                                          datatype=XSD.anyURI)), g)
+        self.assertEqual({Decimal('1000.0'), Decimal('1500.0')},
+                         {o.value for o in g.objects(None, URIRef(IMEL + 'KwantWrdInMillimeter.waarde'))})
+        self.assertIn((relation, URIRef(IMEL + 'RelatieObject.bron'), bord), g)
+        self.assertIn((relation, URIRef(IMEL + 'RelatieObject.doel'),
+                       URIRef('https://data.awvvlaanderen.be/id/asset/OMV_1')), g)
+
+        shacl_graph = Graph().parse(ROOT_PATH / 'generated_shacl_otl_dyn_borden.ttl')
+        ont_graph = Graph().parse(ROOT_PATH / 'generated_ont_otl_dyn_borden.ttl')
+        self.assertTrue(validate(g, shacl_graph=shacl_graph, ont_graph=ont_graph)[0])
+
+    def test_literals_of_the_wrong_type_fail_validation(self):
+        assets = [{'typeURI': ONDERDEEL + 'DynBordRSS', 'assetId': {'identificator': 'BORD_2'}, 'naam': 12,
+                   'aantalLichtsensoren': 'veel', 'afmeting': {'vierhoekig': {'breedte': 1000}}}]
+        g = self.loader.load(io.BytesIO(json.dumps(assets).encode()))
+        self.assertIn(Literal(12), set(g.objects(None, URIRef(IMEL + 'AIMNaamObject.naam'))))
+        self.assertIn(Literal('1000', datatype=XSD.decimal),
+                      set(g.objects(None, URIRef(IMEL + 'KwantWrdInMillimeter.waarde'))))
+
+        shacl_graph = Graph().parse(ROOT_PATH / 'generated_shacl_otl_dyn_borden.ttl')
+        ont_graph = Graph().parse(ROOT_PATH / 'generated_ont_otl_dyn_borden.ttl')
+        results_text = validate(g, shacl_graph=shacl_graph, ont_graph=ont_graph)[2]
+        self.assertIn('Results (2)', results_text)
+        self.assertIn('AIMNaamObject.naam', results_text)
+        self.assertIn('LEDBord.aantalLichtsensoren', results_text)
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(ValueError):
+            self.loader.load(io.BytesIO(json.dumps([{'typeURI': ONDERDEEL + 'DynBordRSS', 'kleur': 'rood'}]).encode()))
+        with self.assertRaises(ValueError):
+            self.loader.load(io.BytesIO(json.dumps([{'typeURI': ONDERDEEL + 'Onbekend'}]).encode()))
+
+    def test_iter_assets_in_small_chunks(self):
+        content = (ROOT_PATH / 'assets_dyn_borden.json').read_bytes()
+        with patch.object(OTLMOWJsonLoader, 'chunk_size', 5):
+            self.assertEqual(json.loads(content), list(OTLMOWJsonLoader.iter_assets(io.BytesIO(content))))
+        self.assertEqual([], list(OTLMOWJsonLoader.iter_assets(io.BytesIO(b' [ ] '))))
+
+        for content in [b'{"typeURI": "x"}', b'[{"typeURI": "x"}', b'[{"typeURI": "x"} {}]', b'[{}, ]', b'[1]']:
+            with self.assertRaises(ValueError):
+                list(OTLMOWJsonLoader.iter_assets(io.BytesIO(content)))
+
+    def test_iter_assets_raises_malformed_json_without_reading_on(self):
+        content = b'[{"typeURI": "x"}, {"typeURI" "y"}, ' + b', '.join([b'{"typeURI": "x"}'] * 10000) + b']'
+        source = io.BytesIO(content)
+        with patch.object(OTLMOWJsonLoader, 'chunk_size', 100), self.assertRaises(json.JSONDecodeError):
+            list(OTLMOWJsonLoader.iter_assets(source))
+        self.assertLessEqual(source.tell(), 200)
+
+        for value in [b'"A01.1"', b'-1.5e+3', b'true', b'"\\u00e9"']:
+            content = b'[' + b', '.join([b'{"typeURI": "x", "naam": ' + value + b'}'] * 100) + b']'
+            with patch.object(OTLMOWJsonLoader, 'chunk_size', 7):
+                self.assertEqual(json.loads(content), list(OTLMOWJsonLoader.iter_assets(io.BytesIO(content))))
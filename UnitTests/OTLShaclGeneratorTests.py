@@ -1,13 +1,25 @@
 import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
+from collections import Counter
 from pathlib import Path
 from unittest import TestCase
+from unittest.mock import patch
 
 from pyshacl import validate
 from rdflib import Graph, URIRef, RDF, RDFS, OWL, Literal, SH, BNode, XSD
+from rdflib.collection import Collection
+from rdflib.compare import isomorphic
 
+from CodelistStore import CodelistStore
+from NTriplesWriter import NTriplesWriter
+from OTLEnumerationCreator import OTLEnumerationCreator
 from OTLShaclGenerator import OTLShaclGenerator
 from SQLDbReader import SQLDbReader
+from ShaclManifest import ShaclManifest
+from ShaclOutputCache import ShaclOutputCache
 
 
 def generate_data_shacl_ont_asset_for_testclass(gerenate_new: bool = True):
@@ -261,6 +273,10 @@ class OTLShaclGeneratorTests(TestCase):
         self.assertTrue((shape_ref, RDFS.label, Literal('All Cases TestClass')) in g)
         self.assertTrue((shape_ref, OWL.deprecated, Literal(True)) in g)
 
+        subclass_uri = 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#SubTestClass'
+        g = OTLShaclGenerator.add_classes_to_graph(Graph(), rows, subclasses={rows[0][2]: [subclass_uri]})
+        self.assertTrue((shape_ref, SH.targetClass, URIRef(subclass_uri)) in g)
+
     def test_add_owl_classes_to_graph(self):
         rows = [('All Cases TestClass', 'AllCasesTestClass',
                  'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass',
@@ -457,6 +473,36 @@ class OTLShaclGeneratorTests(TestCase):
         self.assertTrue((attribute_c2_ref, SH.nodeKind, SH.BlankNode) in g)
         self.assertTrue((attribute_c2_str_ref, SH.nodeKind, SH.Literal) in g)
 
+    def test_add_complex_attributes_to_graph_with_shape_index(self):
+        property_rows = [('testComplexType', 'Test ComplexType', 'Test attribuut voor een complexe waarde',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass', '1', '1',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testComplexType',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtcTestComplexType', 0, '',
+                          0, '', '', 'OSLODatatypeComplex')]
+        attribute_rows = [('DtcTestComplexType',
+                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtcTestComplexType',
+                           'Test ComplexType', '', 'testStringField', 'Test tekstveld',
+                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtcTestComplexType', '1',
+                           '1',
+                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtcTestComplexType.testStringField',
+                           'http://www.w3.org/2001/XMLSchema#string', '', '', 'OSLODatatypePrimitive')]
+
+        shape_index = {}
+        g = Graph()
+        g = OTLShaclGenerator.add_properties_to_graph(g, property_rows, shape_index=shape_index)
+
+        dtc_ref = URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtcTestComplexType')
+        attribute_ref = URIRef(
+            'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testComplexTypeShape')
+        string_field_ref = URIRef(
+            'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtcTestComplexType.testStringFieldShape')
+
+        self.assertEqual({dtc_ref: {attribute_ref: None}}, shape_index)
+        self.assertEqual(shape_index, OTLShaclGenerator.build_shape_index(g))
+
+        g = OTLShaclGenerator.add_complex_attributes_to_graph(g, attribute_rows, shape_index=shape_index)
+        self.assertTrue((attribute_ref, SH.property, string_field_ref) in g)
+
     def test_read_enums_from_reader(self):
         reader = SQLDbReader(Path('OTL_AllCasesTestClass.db'))
         rows = OTLShaclGenerator.read_enums_from_reader(reader)
@@ -503,6 +549,39 @@ class OTLShaclGeneratorTests(TestCase):
         self.assertEqual(URIRef('https://wegenenverkeer.data.vlaanderen.be/id/concept/KlTestKeuzelijst/waarde-1'),
                          first_elem_node_2)
 
+    def test_add_enum_to_graph_shares_enum_list(self):
+        property_rows = [
+            ('testKeuzelijst', 'Test Keuzelijst', 'Test attribuut voor een keuzelijst',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass', '1', '1',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testKeuzelijst',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/abstracten#KlTestKeuzelijst', 0, '', 0, '', '',
+             'OSLOEnumeration'),
+            ('testKeuzelijstMetKard', 'Test Keuzelijst Met Kard',
+             'Test attribuut voor een keuzelijst met kardinaliteit > 1',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass', '1', '*',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testKeuzelijstMetKard',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/abstracten#KlTestKeuzelijst', 0, '', 0, '', '',
+             'OSLOEnumeration')]
+        enum_row = ('KlTestKeuzelijst', 'https://wegenenverkeer.data.vlaanderen.be/ns/abstracten#KlTestKeuzelijst',
+                    'Test keuzelijst', 'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlTestKeuzelijst', '')
+        codelist_store = CodelistStore()
+        codelist_store.put('unittest', OTLEnumerationCreator.parse_graph_to_dict(Path('KlTestKeuzelijst.ttl')))
+
+        g = Graph()
+        g = OTLShaclGenerator.add_properties_to_graph(g, property_rows)
+        saved_triples = OTLShaclGenerator.add_enum_to_graph(enum_row, g, codelist_store, env='unittest')
+
+        shape_ref = URIRef(
+            'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testKeuzelijstShape')
+        shape_ref_2 = URIRef(
+            'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testKeuzelijstMetKardShape')
+
+        enum_list_node = g.value(subject=shape_ref, predicate=SH['in'])
+        self.assertIsNotNone(enum_list_node)
+        self.assertEqual(enum_list_node, g.value(subject=shape_ref_2, predicate=SH['in']))
+        self.assertEqual(6, len(list(Collection(g, enum_list_node))))
+        self.assertEqual(12, saved_triples)
+
     def test_read_primitive_attributes_from_reader(self):
         reader = SQLDbReader(Path('OTL_AllCasesTestClass.db'))
         rows = OTLShaclGenerator.read_primitive_attributes_from_reader(reader)
@@ -616,6 +695,362 @@ class OTLShaclGeneratorTests(TestCase):
         self.assertTrue((union_string_ref, SH.nodeKind, SH.Literal) in g)
         self.assertTrue((union_string_ref, SH.datatype, XSD.string) in g)
 
+    def test_union_encodings_give_same_validation_results(self):
+        class_rows = [('All Cases TestClass', 'AllCasesTestClass',
+                       'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass',
+                       'Testclass containing all possible datatypes and combinations', '', 0, '')]
+        attribute_rows = [
+            ('DtuTestUnionType', 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType',
+             'Test UnionType', '', 'unionKwantWrd', 'Union kwantitatieve waarde',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType', '0', '1',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType.unionKwantWrd',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#KwantWrdTest', '', '',
+             'OSLODatatypePrimitive'),
+            ('DtuTestUnionType', 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType',
+             'Test UnionType', '', 'unionString', 'Union tekstveld',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType', '0', '*',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType.unionString',
+             'http://www.w3.org/2001/XMLSchema#string', '', '', 'OSLODatatypePrimitive')]
+        union_type_ref = URIRef('https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType')
+        kwant_wrd_ref = URIRef(attribute_rows[0][9])
+        string_ref = URIRef(attribute_rows[1][9])
+
+        def create_data_graph(values: [tuple]) -> Graph:
+            data_g = Graph()
+            asset_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0000')
+            union_ref = BNode()
+            data_g.add((asset_ref, RDF.type, URIRef(class_rows[0][2])))
+            data_g.add((asset_ref, union_type_ref, union_ref))
+            for predicate, value in values:
+                data_g.add((union_ref, predicate, value))
+            return data_g
+
+        cases = {'no value': [], 'kwantWrd': [(kwant_wrd_ref, BNode())], 'string': [(string_ref, Literal('test'))],
+                 'two strings': [(string_ref, Literal('test')), (string_ref, Literal('test2'))],
+                 'kwantWrd and string': [(kwant_wrd_ref, BNode()), (string_ref, Literal('test'))]}
+        expected = {'no value': True, 'kwantWrd': True, 'string': True, 'two strings': True,
+                    'kwantWrd and string': False}
+
+        for union_encoding in ['pairwise', 'xone']:
+            g = OTLShaclGenerator.add_classes_to_graph(Graph(), class_rows)
+            g = OTLShaclGenerator.add_union_attributes_to_graph(g, attribute_rows, union_encoding=union_encoding)
+            for case, values in cases.items():
+                with self.subTest(f'{union_encoding}: {case}'):
+                    conforms, results_graph, results_text = validate(create_data_graph(values), shacl_graph=g)
+                    self.assertEqual(expected[case], conforms)
+
+        with self.assertRaises(ValueError):
+            OTLShaclGenerator.add_union_attributes_to_graph(Graph(), attribute_rows, union_encoding='unknown')
+
+    def test_add_relations_to_graph_grouped_by_source(self):
+        onderdeel = 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#'
+        imel = 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#'
+        rows = [('', '', f'{onderdeel}AllCasesTestClass', f'{onderdeel}AnotherTestClass', f'{onderdeel}Voedt',
+                 'Source -> Destination', '', ''),
+                ('', '', f'{onderdeel}ThirdTestClass', f'{onderdeel}AnotherTestClass', f'{onderdeel}Voedt',
+                 'Source -> Destination', '', ''),
+                ('', '', f'{onderdeel}AnotherTestClass', f'{onderdeel}AllCasesTestClass', f'{onderdeel}Voedt',
+                 'Source -> Destination', '', '')]
+        g = OTLShaclGenerator.add_relations_to_graph(Graph(), rows)
+
+        or_list_node = g.value(subject=URIRef(f'{onderdeel}VoedtRelationConstraint'),
+                               predicate=URIRef('http://www.w3.org/ns/shacl#or'))
+        self.assertEqual(2, len(list(Collection(g, or_list_node))))
+
+        def validate_relation(bron_type: str, doel_type: str) -> bool:
+            data_g = Graph()
+            bron_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0000')
+            doel_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0001')
+            relation_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0002')
+            data_g.add((bron_ref, RDF.type, URIRef(f'{onderdeel}{bron_type}')))
+            data_g.add((doel_ref, RDF.type, URIRef(f'{onderdeel}{doel_type}')))
+            data_g.add((relation_ref, RDF.type, URIRef(f'{onderdeel}Voedt')))
+            data_g.add((relation_ref, URIRef(f'{imel}RelatieObject.bron'), bron_ref))
+            data_g.add((relation_ref, URIRef(f'{imel}RelatieObject.doel'), doel_ref))
+            return validate(data_g, shacl_graph=g)[0]
+
+        self.assertTrue(validate_relation('AllCasesTestClass', 'AnotherTestClass'))
+        self.assertTrue(validate_relation('ThirdTestClass', 'AnotherTestClass'))
+        self.assertTrue(validate_relation('AnotherTestClass', 'AllCasesTestClass'))
+        self.assertFalse(validate_relation('AllCasesTestClass', 'AllCasesTestClass'))
+        self.assertFalse(validate_relation('AnotherTestClass', 'AnotherTestClass'))
+
+    def test_get_subclass_closure(self):
+        rows = [('A', 'B', ''), ('B', 'C', ''), ('B', 'D', ''), ('A', 'D', ''), ('C', 'A', '')]
+        closure = OTLShaclGenerator.get_subclass_closure(rows)
+        self.assertEqual(['B', 'C', 'D'], closure['A'])
+        self.assertEqual(['C', 'A', 'D'], closure['B'])
+        self.assertEqual(['A', 'B', 'D'], closure['C'])
+        self.assertNotIn('D', closure)
+
+    def test_add_relations_to_graph_with_materialized_inheritance(self):
+        onderdeel = 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#'
+        imel = 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#'
+        rows = [('', '', f'{onderdeel}AllCasesTestClass', f'{onderdeel}AnotherTestClass', f'{onderdeel}Voedt',
+                 'Source -> Destination', '', '')]
+        inheritance_rows = [(f'{imel}AIMObject', f'{onderdeel}AllCasesTestClass', ''),
+                            (f'{onderdeel}AllCasesTestClass', f'{onderdeel}SubTestClass', ''),
+                            (f'{imel}RelatieObject', f'{onderdeel}Voedt', ''),
+                            (f'{onderdeel}Voedt', f'{onderdeel}SubVoedt', '')]
+        subclasses = OTLShaclGenerator.get_subclass_closure(inheritance_rows)
+        g = OTLShaclGenerator.add_relations_to_graph(Graph(), rows, subclasses=subclasses)
+
+        self.assertTrue((URIRef(f'{imel}RelatieObjectConstraint'), SH.targetClass, URIRef(f'{onderdeel}SubVoedt'))
+                        in g)
+        self.assertTrue((URIRef(f'{onderdeel}VoedtRelationConstraint'), SH.targetClass,
+                         URIRef(f'{onderdeel}SubVoedt')) in g)
+
+        def validate_relation(bron_type: str, relation_type: str) -> bool:
+            data_g = Graph()
+            bron_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0000')
+            doel_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0001')
+            relation_ref = URIRef('https://data.awvvlaanderen.be/id/asset/0002')
+            data_g.add((bron_ref, RDF.type, URIRef(f'{onderdeel}{bron_type}')))
+            data_g.add((doel_ref, RDF.type, URIRef(f'{onderdeel}AnotherTestClass')))
+            data_g.add((relation_ref, RDF.type, URIRef(f'{onderdeel}{relation_type}')))
+            data_g.add((relation_ref, URIRef(f'{imel}RelatieObject.bron'), bron_ref))
+            data_g.add((relation_ref, URIRef(f'{imel}RelatieObject.doel'), doel_ref))
+            return validate(data_g, shacl_graph=g)[0]
+
+        # no ontology graph and no inference needed for the subclasses
+        self.assertTrue(validate_relation('SubTestClass', 'Voedt'))
+        self.assertTrue(validate_relation('AllCasesTestClass', 'SubVoedt'))
+        self.assertFalse(validate_relation('AnotherTestClass', 'SubVoedt'))
+
+    def test_chunk_rows_keeps_groups_together(self):
+        rows = [('a', 1), ('a', 2), ('b', 3), ('c', 4), ('c', 5), ('d', 6)]
+        chunks = OTLShaclGenerator.chunk_rows(rows, 3, key_index=0)
+        self.assertEqual([[('a', 1), ('a', 2), ('b', 3)], [('c', 4), ('c', 5), ('d', 6)]], chunks)
+        self.assertEqual([[row] for row in rows], OTLShaclGenerator.chunk_rows(rows, 10))
+
+    def test_build_shapes_in_parallel_equals_sequential_build(self):
+        property_rows = [('testKwantWrd', 'Test KwantWrd', 'Test attribuut voor een kwantitatieve waarde',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass', '1', '1',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testKwantWrd',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#KwantWrdTest', 0, '', 0,
+                          '', '', 'OSLODatatypePrimitive'),
+                         ('testUnionType', 'Test UnionType', 'Test attribuut voor een union type',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass', '1', '1',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass.testUnionType',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType', 0, '',
+                          0, '', '', 'OSLODatatypeUnion')]
+        union_rows = [
+            ('DtuTestUnionType', 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType',
+             'Test UnionType', '', 'unionKwantWrd', 'Union kwantitatieve waarde',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType', '0', '1',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType.unionKwantWrd',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#KwantWrdTest', '', '',
+             'OSLODatatypePrimitive'),
+            ('DtuTestUnionType', 'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType',
+             'Test UnionType', '', 'unionString', 'Union tekstveld',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType', '0', '1',
+             'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#DtuTestUnionType.unionString',
+             'http://www.w3.org/2001/XMLSchema#string', '', '', 'OSLODatatypePrimitive')]
+        primitive_rows = [('KwantWrdTest',
+                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#KwantWrdTest',
+                           'Kwantitatieve test waarde', '', 'waarde', 'waarde',
+                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#KwantWrdTest', '1', '1',
+                           'https://wegenenverkeer.data.vlaanderen.be/ns/implementatieelement#KwantWrdTest.waarde',
+                           'http://www.w3.org/2001/XMLSchema#decimal', '', '', 'OSLODatatypePrimitive')]
+        relation_rows = [('', '', 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AnotherTestClass',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#Voedt', 'Source -> Destination', '',
+                          '')]
+
+        shape_index = {}
+        sequential_g = Graph()
+        sequential_g = OTLShaclGenerator.add_properties_to_graph(sequential_g, property_rows, shape_index=shape_index)
+        sequential_g = OTLShaclGenerator.add_union_attributes_to_graph(sequential_g, union_rows,
+                                                                       shape_index=shape_index)
+        sequential_g = OTLShaclGenerator.add_primitive_attributes_to_graph(sequential_g, primitive_rows,
+                                                                           shape_index=shape_index)
+        sequential_g = OTLShaclGenerator.add_relations_to_graph(sequential_g, relation_rows)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with NTriplesWriter(Path(temp_dir) / 'shacl.nt') as writer:
+                parallel_index = OTLShaclGenerator.build_shapes_in_parallel(
+                    writer, stage_rows={'properties': property_rows, 'union': union_rows, 'primitive': primitive_rows,
+                                        'relations': relation_rows}, jobs=2)
+            parallel_g = Graph().parse(writer.path, format='nt')
+
+        self.assertEqual(shape_index, parallel_index)
+        self.assertEqual(len(parallel_g), writer.triple_count)
+        self.assertTrue(isomorphic(sequential_g, parallel_g))
+
+    def test_stages_hand_triples_to_the_graph_in_batches(self):
+        with SQLDbReader(Path(__file__).parent.parent / 'OTL_Dynamische_borden.db') as reader:
+            model = OTLShaclGenerator.read_model_from_reader(reader)
+        batch_sizes = []
+
+        class BatchRecorder(Graph):
+            def addN(self, quads):
+                quads = list(quads)
+                batch_sizes.append(len(quads))
+                return super().addN(quads)
+
+        with patch.object(OTLShaclGenerator, 'triple_batch_size', 50):
+            batched_g = BatchRecorder()
+            shape_index = {}
+            OTLShaclGenerator.add_classes_to_graph(batched_g, model.classes)
+            OTLShaclGenerator.add_properties_to_graph(batched_g, model.properties, shape_index=shape_index)
+            OTLShaclGenerator.add_complex_attributes_to_graph(batched_g, model.complex_attributes,
+                                                              shape_index=shape_index)
+            OTLShaclGenerator.add_relations_to_graph(batched_g, model.relations)
+
+        g = Graph()
+        shape_index = {}
+        OTLShaclGenerator.add_classes_to_graph(g, model.classes)
+        OTLShaclGenerator.add_properties_to_graph(g, model.properties, shape_index=shape_index)
+        OTLShaclGenerator.add_complex_attributes_to_graph(g, model.complex_attributes, shape_index=shape_index)
+        OTLShaclGenerator.add_relations_to_graph(g, model.relations)
+
+        # a batch holds at most triple_batch_size triples plus those of one row or relation
+        self.assertGreater(len(batch_sizes), 10)
+        self.assertLess(max(batch_sizes), len(g) / 10)
+        self.assertTrue(isomorphic(g, batched_g))
+
+    def test_ntriples_writer_writes_same_triples_as_graph(self):
+        class_rows = [('All Cases TestClass', 'AllCasesTestClass',
+                       'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass',
+                       'Testclass containing all possible datatypes and combinations', '', 0, 'deprecated since OTL 2.3')]
+        relation_rows = [('', '', 'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AllCasesTestClass',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#AnotherTestClass',
+                          'https://wegenenverkeer.data.vlaanderen.be/ns/onderdeel#Voedt', 'Source -> Destination', '',
+                          '')]
+        nt_path = Path('ntriples_writer_test.nt')
+        try:
+            with NTriplesWriter(nt_path) as writer:
+                writer.addN((s, p, o, writer) for s, p, o in OTLShaclGenerator.get_initial_graph())
+                OTLShaclGenerator.add_classes_to_graph(writer, class_rows)
+                OTLShaclGenerator.add_relations_to_graph(writer, relation_rows)
+            streamed_g = Graph().parse(nt_path, format='nt')
+        finally:
+            nt_path.unlink(missing_ok=True)
+
+        g = OTLShaclGenerator.get_initial_graph()
+        g = OTLShaclGenerator.add_classes_to_graph(g, class_rows)
+        g = OTLShaclGenerator.add_relations_to_graph(g, relation_rows)
+
+        self.assertEqual(len(g), writer.triple_count)
+        self.assertTrue(isomorphic(g, streamed_g))
+
+    def test_regenerate_shacl_from_otl_equals_full_build(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            subset_path = Path(temp_dir) / 'subset.db'
+            shutil.copy(Path(__file__).parent.parent / 'OTL_Dynamische_borden.db', subset_path)
+            # no enumerations, so no codelists are downloaded
+            with sqlite3.connect(subset_path) as con:
+                con.execute('DELETE FROM OSLOEnumeration')
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            ont_path = Path(temp_dir) / 'ont.ttl'
+
+            all_units = OTLShaclGenerator.regenerate_shacl_from_otl(subset_path, shacl_path, ont_path)
+            self.assertEqual([], OTLShaclGenerator.regenerate_shacl_from_otl(subset_path, shacl_path, ont_path))
+
+            with sqlite3.connect(subset_path) as con:
+                con.execute("UPDATE OSLOAttributen SET label_nl = 'gewijzigd' WHERE uri = "
+                            "'https://wegenenverkeer.data.vlaanderen.be/ns/abstracten#LEDBord.ipAdres'")
+            rebuilt_units = OTLShaclGenerator.regenerate_shacl_from_otl(subset_path, shacl_path, ont_path)
+            self.assertIn('class:https://wegenenverkeer.data.vlaanderen.be/ns/abstracten#LEDBord', rebuilt_units)
+            self.assertLess(len(rebuilt_units), len(all_units))
+            incremental_g = Graph().parse(shacl_path)
+
+            os.unlink(ShaclManifest.get_default_path(shacl_path))
+            OTLShaclGenerator.regenerate_shacl_from_otl(subset_path, shacl_path, ont_path)
+            self.assertTrue(isomorphic(Graph().parse(shacl_path), incremental_g))
+
+    def test_codelist_store_and_env_are_used_by_every_entry_point(self):
+        concepts = (URIRef('https://wegenenverkeer.data.vlaanderen.be/id/concept/KlAIMToestand/in-gebruik'),
+                    URIRef('https://wegenenverkeer.data.vlaanderen.be/id/concept/KlAIMToestand/verwijderd'))
+        codelist_store = CodelistStore()
+        codelist_store.put('unittest', {
+            'https://wegenenverkeer.data.vlaanderen.be/id/conceptscheme/KlAIMToestand': concepts})
+        subset_path = Path(__file__).parent.parent / 'OTL_Dynamische_borden.db'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            ont_path = Path(temp_dir) / 'ont.ttl'
+            generated = {}
+            OTLShaclGenerator.stream_shacl_from_otl(subset_path, shacl_path.with_suffix('.nt'),
+                                                    ont_path.with_suffix('.nt'), codelist_store=codelist_store,
+                                                    env='unittest')
+            generated['stream'] = Graph().parse(shacl_path.with_suffix('.nt'), format='nt')
+            OTLShaclGenerator.regenerate_shacl_from_otl(subset_path, shacl_path, ont_path,
+                                                        codelist_store=codelist_store, env='unittest')
+            generated['incremental'] = Graph().parse(shacl_path)
+            os.unlink(shacl_path)
+            OTLShaclGenerator.generate_shacl_files_with_cache(
+                subset_path, shacl_path, ont_path, cache=ShaclOutputCache(Path(temp_dir) / 'cache'),
+                codelist_snapshot='unittest', codelist_store=codelist_store, env='unittest')
+            generated['cache'] = Graph().parse(shacl_path)
+
+        for entry_point, g in generated.items():
+            with self.subTest(entry_point=entry_point):
+                lists = [list(Collection(g, node)) for node in set(g.objects(None, SH['in']))]
+                self.assertEqual([list(concepts)], lists)
+
+    def test_generate_shacl_files_with_cache_key_has_env_and_settings(self):
+        codelist_store = CodelistStore()
+        codelist_store.put('unittest', {})
+        codelist_store.put('unittest2', {})
+        subset_path = Path(__file__).parent.parent / 'OTL_Dynamische_borden.db'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ShaclOutputCache(Path(temp_dir) / 'cache')
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            ont_path = Path(temp_dir) / 'ont.ttl'
+            hits = []
+            for env, materialize_inheritance in [('unittest', False), ('unittest2', False), ('unittest', True),
+                                                 ('unittest', False)]:
+                hits.append(OTLShaclGenerator.generate_shacl_files_with_cache(
+                    subset_path, shacl_path, ont_path, cache=cache, codelist_snapshot='unittest',
+                    codelist_store=codelist_store, env=env, materialize_inheritance=materialize_inheritance))
+            self.assertEqual([False, False, False, True], hits)
+
+    def test_stream_shacl_from_otl_materializes_inheritance(self):
+        codelist_store = CodelistStore()
+        codelist_store.put('unittest', {})
+        subset_path = Path(__file__).parent.parent / 'OTL_Dynamische_borden.db'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.nt'
+            ont_path = Path(temp_dir) / 'ont.nt'
+            OTLShaclGenerator.stream_shacl_from_otl(subset_path, shacl_path, ont_path, codelist_store=codelist_store,
+                                                    env='unittest', in_memory=True, materialize_inheritance=True)
+            streamed_g = Graph().parse(shacl_path, format='nt')
+            g, _ = OTLShaclGenerator.generate_shacl_from_otl(
+                subset_path, shacl_path.with_suffix('.ttl'), ont_path.with_suffix('.ttl'),
+                codelist_store=codelist_store, env='unittest', materialize_inheritance=True)
+
+        self.assertTrue(any(len(list(streamed_g.objects(shape, SH.targetClass))) > 1
+                            for shape in streamed_g.subjects(RDF.type, SH.NodeShape)))
+        self.assertEqual(len(g), len(streamed_g))
+        self.assertEqual(set(g.triples((None, SH.targetClass, None))),
+                         set(streamed_g.triples((None, SH.targetClass, None))))
+        self.assertEqual(Counter(g.objects(None, SH['class'])), Counter(streamed_g.objects(None, SH['class'])))
+
+    def test_generate_shacl_for_subsets_with_shared_codelists(self):
+        codelist_store = CodelistStore()
+        codelist_store.put('unittest', OTLEnumerationCreator.parse_graph_to_dict(
+            Path(__file__).parent / 'KlTestKeuzelijst.ttl'))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            subset_paths = []
+            for name in ('subset_a', 'subset_b'):
+                subset_path = Path(temp_dir) / f'{name}.db'
+                shutil.copy(Path(__file__).parent.parent / 'OTL_Dynamische_borden.db', subset_path)
+                subset_paths.append(subset_path)
+
+            generated = OTLShaclGenerator.generate_shacl_for_subsets(subset_paths, output_dir=Path(temp_dir), jobs=2,
+                                                                     codelist_store=codelist_store, env='unittest')
+
+            self.assertEqual(set(subset_paths), set(generated))
+            shacl_a = Graph().parse(generated[subset_paths[0]][0])
+            self.assertTrue(isomorphic(shacl_a, Graph().parse(generated[subset_paths[1]][0])))
+            self.assertEqual(Path(temp_dir) / 'generated_ont_subset_a.ttl', generated[subset_paths[0]][1])
+            self.assertIn((None, SH.targetClass, None), shacl_a)
+
+        with self.assertRaises(ValueError):
+            OTLShaclGenerator.generate_shacl_for_subsets([Path('a/subset.db'), Path('b/subset.db')],
+                                                         output_dir=Path(), codelist_store=codelist_store,
+                                                         env='unittest')
+
     def test_generate_subset_and_test_data_relations(self):
         with self.subTest('correct use of Voedt relation'):
             data_g, shacl, ont, asset_ref = generate_data_shacl_ont_asset_for_testclass()
@@ -0,0 +1,27 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from OTLShaclGenerator import OTLShaclGenerator
+from OTLSubsetModel import OTLSubsetModel, PropertyRecord
+from SQLDbReader import SQLDbReader
+
+
+class OTLSubsetModelTests(TestCase):
+    def test_save_and_load_gives_the_same_records(self):
+        with SQLDbReader(Path(__file__).parent.parent / 'OTL_Dynamische_borden.db') as reader:
+            model = OTLShaclGenerator.read_model_from_reader(reader)
+            property_rows = OTLShaclGenerator.read_properties_from_reader(reader)
+
+        self.assertEqual(property_rows, model.properties)
+        self.assertIsInstance(model.properties[0], PropertyRecord)
+        self.assertEqual(model.properties[0][6], model.properties[0].uri)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            model_path = Path(temp_dir) / 'subset.model'
+            model.save(model_path)
+            loaded_model = OTLSubsetModel.load(model_path)
+
+        for table in OTLSubsetModel.record_types:
+            self.assertEqual(getattr(model, table), getattr(loaded_model, table))
+        self.assertIsInstance(loaded_model.relations[0], OTLSubsetModel.record_types['relations'])
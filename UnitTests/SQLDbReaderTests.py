@@ -0,0 +1,49 @@
+import os
+import sqlite3
+from pathlib import Path
+from unittest import TestCase
+
+from OTLShaclGenerator import OTLShaclGenerator
+from SQLDbReader import SQLDbReader
+
+
+class SQLDbReaderTests(TestCase):
+    subset_path = Path(__file__).parent.parent / 'OTL_Dynamische_borden.db'
+
+    def test_reuses_one_read_only_connection(self):
+        with SQLDbReader(self.subset_path) as reader:
+            class_count = reader.perform_read_query('SELECT count(*) FROM OSLOClass', params={})[0][0]
+            connection = reader.connection
+            self.assertLess(0, class_count)
+            self.assertEqual([(class_count,)], reader.perform_read_query('SELECT count(*) FROM OSLOClass', params={}))
+            self.assertIs(connection, reader.connection)
+            with self.assertRaises(sqlite3.OperationalError):
+                reader.perform_read_query('DELETE FROM OSLOClass', params={})
+        self.assertIsNone(reader.connection)
+
+    def test_iter_query_yields_the_same_rows_in_batches(self):
+        query = 'SELECT uri, class_uri FROM OSLOAttributen ORDER BY uri'
+        with SQLDbReader(self.subset_path) as reader:
+            rows = reader.perform_read_query(query, params={})
+            self.assertLess(3, len(rows))
+            self.assertEqual(rows, list(reader.iter_query(query, params={}, batch_size=3)))
+
+    def test_in_memory_snapshot_gives_the_same_rows_and_leaves_the_file_untouched(self):
+        modified_time = os.path.getmtime(self.subset_path)
+        with SQLDbReader(self.subset_path) as file_reader, \
+                SQLDbReader(self.subset_path, in_memory=True) as memory_reader:
+            for read_function in (OTLShaclGenerator.read_properties_from_reader,
+                                  OTLShaclGenerator.read_complex_attributes_from_reader,
+                                  OTLShaclGenerator.read_primitive_attributes_from_reader,
+                                  OTLShaclGenerator.read_union_attributes_from_reader,
+                                  OTLShaclGenerator.read_relations_from_reader):
+                self.assertEqual(read_function(file_reader), read_function(memory_reader))
+            indexes = memory_reader.perform_read_query(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name = 'idx_TypeLinkTabel_item_uri'",
+                params={})
+            self.assertEqual(1, len(indexes))
+        self.assertEqual(modified_time, os.path.getmtime(self.subset_path))
+
+    def test_missing_file(self):
+        with self.assertRaises(FileNotFoundError):
+            SQLDbReader(Path('does_not_exist.db'))
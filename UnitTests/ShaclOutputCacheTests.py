@@ -0,0 +1,45 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from ShaclOutputCache import ShaclOutputCache
+
+
+class ShaclOutputCacheTests(TestCase):
+    def test_get_key_depends_on_subset_and_codelist_snapshot(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            subset_path = Path(temp_dir) / 'subset.db'
+            subset_path.write_bytes(b'subset')
+            key = ShaclOutputCache.get_key(subset_path, 'snapshot1', 'prd', 'v1', {'union_encoding': 'pairwise'})
+            self.assertEqual(key, ShaclOutputCache.get_key(subset_path, 'snapshot1', 'prd', 'v1',
+                                                           {'union_encoding': 'pairwise'}))
+            self.assertNotEqual(key, ShaclOutputCache.get_key(subset_path, 'snapshot2', 'prd', 'v1',
+                                                              {'union_encoding': 'pairwise'}))
+            self.assertNotEqual(key, ShaclOutputCache.get_key(subset_path, 'snapshot1', 'prd', 'v1',
+                                                              {'union_encoding': 'xone'}))
+            subset_path.write_bytes(b'changed subset')
+            self.assertNotEqual(key, ShaclOutputCache.get_key(subset_path, 'snapshot1', 'prd', 'v1',
+                                                              {'union_encoding': 'pairwise'}))
+
+    def test_put_get_and_evict_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            ont_path = Path(temp_dir) / 'ont.ttl'
+            shacl_path.write_text('s' * 60)
+            ont_path.write_text('o' * 40)
+            cache = ShaclOutputCache(Path(temp_dir) / 'cache', max_size=250)
+
+            self.assertFalse(cache.get('a', shacl_path, ont_path))
+            cache.put('a', shacl_path, ont_path)
+            cache.put('b', shacl_path, ont_path)
+            # make 'a' older than 'b', then use it so 'b' becomes the least recently used entry
+            os.utime(cache.cache_dir / 'a', (time.time() - 10, time.time() - 10))
+            os.utime(cache.cache_dir / 'b', (time.time() - 5, time.time() - 5))
+            shacl_path.unlink()
+            self.assertTrue(cache.get('a', shacl_path, ont_path))
+            self.assertEqual('s' * 60, shacl_path.read_text())
+
+            cache.put('c', shacl_path, ont_path)
+            self.assertEqual(['a', 'c'], sorted(p.name for p in cache.cache_dir.iterdir()))
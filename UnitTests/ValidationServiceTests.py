@@ -0,0 +1,209 @@
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from pyshacl import validate
+from rdflib import BNode, Graph, RDF, RDFS, SH, URIRef
+
+from ValidationService import ValidationService
+
+ROOT_PATH = Path(__file__).parent.parent
+SHAPES = '''@prefix sh: <http://www.w3.org/ns/shacl#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+<https://example.org/ns#BordShape> a sh:NodeShape ;
+    sh:targetClass <https://example.org/ns#Bord> ;
+    sh:property [ sh:path <https://example.org/ns#Bord.naam> ; sh:datatype xsd:string ; sh:maxCount {max_count} ] .
+'''
+RELATION_SHAPES = '''@prefix sh: <http://www.w3.org/ns/shacl#> .
+<https://example.org/ns#RelatieShape> a sh:NodeShape ;
+    sh:targetClass <https://example.org/ns#Relatie> ;
+    sh:property [ sh:path <https://example.org/ns#bron> ; sh:class <https://example.org/ns#Bord> ] .
+'''
+RELATION_DATA = b'''<https://example.org/id/1> a <https://example.org/ns#Bord> ;
+    <https://example.org/ns#Bord.naam> "A01.1", "A01.2" ;
+    <https://example.org/ns#Bord.afmeting> [ <https://example.org/ns#breedte> 1000 ] .
+<https://example.org/id/2> a <https://example.org/ns#Bord> ;
+    <https://example.org/ns#Bord.naam> "A01.3" .
+<https://example.org/id/3> a <https://example.org/ns#Kast> .
+<https://example.org/id/r1> a <https://example.org/ns#Relatie> ;
+    <https://example.org/ns#bron> <https://example.org/id/1> .
+<https://example.org/id/r2> a <https://example.org/ns#Relatie> ;
+    <https://example.org/ns#bron> <https://example.org/id/3> .
+'''
+DATA = b'''<https://example.org/id/1> a <https://example.org/ns#Bord> ;
+    <https://example.org/ns#Bord.naam> "A01.1", "A01.2" .
+'''
+
+
+class ValidationServiceTests(TestCase):
+    def test_same_results_as_validate(self):
+        shacl_path = ROOT_PATH / 'generated_shacl_otl_dyn_borden.ttl'
+        ont_path = ROOT_PATH / 'generated_ont_otl_dyn_borden.ttl'
+        data = (ROOT_PATH / 'assets_dyn_borden.jsonld').read_bytes()
+        shacl_graph = Graph()
+        shacl_graph.parse(format='turtle', source=ont_path)
+        shacl_graph.parse(format='turtle', source=shacl_path)
+        expected = validate(Graph().parse(data=data, format='json-ld'), shacl_graph=shacl_graph,
+                            allow_infos=True, allow_warnings=True)
+
+        service = ValidationService(shacl_path=shacl_path, ont_path=ont_path)
+        for _ in range(2):
+            conforms, _, results_text = service.validate(ValidationService.parse_data(data, 'application/ld+json'))
+            self.assertEqual(expected[0], conforms)
+            self.assertEqual(expected[2], results_text)
+
+    def test_reloads_changed_shapes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            shacl_path.write_text(SHAPES.replace('{max_count}', '1'))
+            service = ValidationService(shacl_path=shacl_path)
+            data_graph = ValidationService.parse_data(DATA, 'text/turtle')
+            self.assertFalse(service.validate(data_graph)[0])
+
+            shacl_path.write_text('this is not turtle')
+            os.utime(shacl_path, ns=(0, 1))
+            self.assertFalse(service.validate(data_graph)[0])
+
+            shacl_path.write_text(SHAPES.replace('{max_count}', '2'))
+            os.utime(shacl_path, ns=(0, 2))
+            self.assertTrue(service.validate(data_graph)[0])
+            self.assertFalse(service.reload_if_changed())
+
+    def test_server(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            shacl_path.write_text(SHAPES.replace('{max_count}', '1'))
+            server = ValidationService(shacl_path=shacl_path).create_server(port=0)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                url = f'http://localhost:{server.server_port}'
+                response = ValidationService.request_validation(url, DATA, 'text/turtle')
+                self.assertFalse(response['conforms'])
+                self.assertIn('MaxCountConstraintComponent', response['results_text'])
+                with self.assertRaises(ValueError):
+                    ValidationService.request_validation(url, DATA, 'text/csv')
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+
+    def test_server_answers_validation_errors(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            shacl_path.write_text(SHAPES.replace('{max_count}', '1'))
+            service = ValidationService(shacl_path=shacl_path)
+            server = service.create_server(port=0)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                url = f'http://localhost:{server.server_port}'
+                with patch.object(service, 'validate', side_effect=RuntimeError('validation failed')), \
+                        self.assertRaisesRegex(ValueError, 'validation failed'), self.assertLogs(level='ERROR'):
+                    ValidationService.request_validation(url, DATA, 'text/turtle')
+                self.assertTrue(ValidationService.request_validation(url, DATA.replace(b', "A01.2"', b''),
+                                                                     'text/turtle')['conforms'])
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+
+    def test_parses_otlmow_json(self):
+        data = (ROOT_PATH / 'assets_dyn_borden.json').read_bytes()
+        service = ValidationService(shacl_path=ROOT_PATH / 'generated_shacl_otl_dyn_borden.ttl',
+                                    ont_path=ROOT_PATH / 'generated_ont_otl_dyn_borden.ttl')
+        with self.assertRaises(ValueError):
+            service.parse_request_data(data, 'application/json')
+
+        service = ValidationService(shacl_path=ROOT_PATH / 'generated_shacl_otl_dyn_borden.ttl',
+                                    subset_path=ROOT_PATH / 'OTL_Dynamische_borden.db')
+        self.assertEqual(30, len(service.parse_request_data(data, 'application/json; charset=utf-8')))
+        self.assertEqual(3, len(service.parse_request_data(DATA, 'text/turtle')))
+
+    def test_partition_has_endpoint_types(self):
+        data_graph = ValidationService.parse_data(RELATION_DATA, 'text/turtle')
+        roots = ValidationService.get_partition_roots(data_graph)
+        self.assertEqual(5, len(roots))
+
+        partition, owned = ValidationService.get_partition(data_graph, [URIRef('https://example.org/id/r1')])
+        self.assertEqual({URIRef('https://example.org/id/r1')}, owned)
+        self.assertEqual({(URIRef('https://example.org/id/1'), RDF.type, URIRef('https://example.org/ns#Bord'))},
+                         set(partition.triples((URIRef('https://example.org/id/1'), None, None))))
+
+        partition, owned = ValidationService.get_partition(data_graph, [URIRef('https://example.org/id/1')])
+        self.assertEqual(2, len(owned))
+        self.assertEqual(1, len([node for node in owned if isinstance(node, BNode)]))
+        self.assertEqual(5, len(partition))
+
+    def test_partitioned_same_results_as_validate(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            shacl_path.write_text(SHAPES.replace('{max_count}', '1') + RELATION_SHAPES)
+            data_graph = ValidationService.parse_data(RELATION_DATA, 'text/turtle')
+            expected = validate(data_graph, shacl_graph=Graph().parse(shacl_path), allow_infos=True,
+                                allow_warnings=True)
+
+            service = ValidationService(shacl_path=shacl_path)
+            for jobs in [1, 2]:
+                with self.subTest(jobs=jobs):
+                    conforms, results_graph, results_text = service.validate_partitioned(
+                        data_graph, jobs=jobs, partition_size=1)
+                    self.assertEqual(expected[0], conforms)
+                    self.assertEqual(sorted(expected[2].splitlines()), sorted(results_text.splitlines()))
+                    self.assertEqual(len(expected[1]), len(results_graph))
+
+    def test_partitioned_without_fork_sends_the_sliced_shapes(self):
+        initargs = []
+
+        class RecordingExecutor(ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                initargs.append(kwargs['initargs'])
+                super().__init__(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shacl_path = Path(temp_dir) / 'shacl.ttl'
+            shacl_path.write_text(SHAPES.replace('{max_count}', '1') + RELATION_SHAPES)
+            data = DATA + b'<https://example.org/id/2> a <https://example.org/ns#Bord> .'
+            data_graph = ValidationService.parse_data(data, 'text/turtle')
+            service = ValidationService(shacl_path=shacl_path)
+            with patch('multiprocessing.get_all_start_methods', return_value=['spawn']), \
+                    patch('ValidationService.ProcessPoolExecutor', RecordingExecutor):
+                conforms, _, results_text = service.validate_partitioned(data_graph, jobs=2, partition_size=1,
+                                                                         sliced=True)
+            expected = validate(data_graph, shacl_graph=Graph().parse(shacl_path))
+
+        self.assertEqual(expected[0], conforms)
+        self.assertEqual(sorted(expected[2].splitlines()), sorted(results_text.splitlines()))
+        shapes_text, shapes_graph, _ = initargs[0]
+        self.assertIsNone(shapes_graph)
+        worker_shapes = Graph().parse(data=shapes_text, format='nt')
+        self.assertNotIn((URIRef('https://example.org/ns#RelatieShape'), RDF.type, SH.NodeShape), worker_shapes)
+        self.assertIn((URIRef('https://example.org/ns#BordShape'), RDF.type, SH.NodeShape), worker_shapes)
+
+    def test_slice_shapes(self):
+        shapes_graph = Graph().parse(data=SHAPES.replace('{max_count}', '1') + RELATION_SHAPES, format='turtle')
+        shapes_graph.add((URIRef('https://example.org/ns#Bord'), RDFS.subClassOf,
+                          URIRef('https://example.org/ns#AIMObject')))
+        data_graph = ValidationService.parse_data(DATA, 'text/turtle')
+
+        sliced = ValidationService.slice_shapes(shapes_graph, data_graph)
+        self.assertIn((URIRef('https://example.org/ns#BordShape'), RDF.type, SH.NodeShape), sliced)
+        self.assertNotIn((URIRef('https://example.org/ns#RelatieShape'), RDF.type, SH.NodeShape), sliced)
+        self.assertIn((URIRef('https://example.org/ns#Bord'), RDFS.subClassOf,
+                       URIRef('https://example.org/ns#AIMObject')), sliced)
+        self.assertEqual(len(shapes_graph) - 5, len(sliced))
+        self.assertEqual(validate(data_graph, shacl_graph=shapes_graph)[2],
+                         validate(data_graph, shacl_graph=sliced)[2])
+
+    def test_slice_shapes_of_superclasses(self):
+        shapes_graph = Graph().parse(data=SHAPES.replace('{max_count}', '1'), format='turtle')
+        data_graph = Graph()
+        data_graph.add((URIRef('https://example.org/id/4'), RDF.type, URIRef('https://example.org/ns#Sub')))
+        self.assertEqual(0, len(ValidationService.slice_shapes(shapes_graph, data_graph)))
+
+        data_graph.add((URIRef('https://example.org/ns#Sub'), RDFS.subClassOf, URIRef('https://example.org/ns#Bord')))
+        self.assertEqual(len(shapes_graph), len(ValidationService.slice_shapes(shapes_graph, data_graph)))
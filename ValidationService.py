@@ -0,0 +1,350 @@
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pyshacl import Validator
+from pyshacl.shapes_graph import ShapesGraph
+from rdflib import BNode, Graph, Literal, RDF, RDFS, SH, URIRef
+
+from OTLMOWJsonLoader import OTLMOWJsonLoader
+
+
+class ValidationService:
+    """Validates data graphs against generated shacl and ontology files that are parsed, and whose shapes are
+    harvested, only once. Before every validation the files are checked for changes: changed files are parsed into a
+    new shapes graph next to the current one, which is only swapped in when it is complete, so validations never see
+    half a reload. Validations run one at a time, as the shapes are shared."""
+    data_formats = {
+        'application/ld+json': 'json-ld',
+        'text/turtle': 'turtle',
+        'application/n-triples': 'nt',
+    }
+    # the graphs of a worker process of validate_partitioned, set by its initializer
+    worker_shapes_graph: ShapesGraph = None
+    worker_data_graph: Graph = None
+
+    def __init__(self, shacl_path: Path, ont_path: Path = None, subset_path: Path = None):
+        """With subset_path, OTLMOW json (application/json) is accepted as well."""
+        self.json_loader = None if subset_path is None else OTLMOWJsonLoader(subset_path)
+        self.paths = [path for path in [ont_path, shacl_path] if path is not None]
+        self.reload_lock = threading.Lock()
+        self.validation_lock = threading.Lock()
+        self.failed_stamps = None
+        # (stamps of the files, shapes graph with harvested shapes), replaced as a whole on reload
+        self.state: Tuple[List[Tuple[int, int]], ShapesGraph] = self.load()
+
+    @property
+    def shapes_graph(self) -> ShapesGraph:
+        """The shapes of the last successful (re)load."""
+        return self.state[1]
+
+    def get_stamps(self) -> List[Tuple[int, int]]:
+        stamps = []
+        for path in self.paths:
+            stat = os.stat(path)
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        return stamps
+
+    def load(self) -> Tuple[List[Tuple[int, int]], ShapesGraph]:
+        start = time.time()
+        stamps = self.get_stamps()
+        g = Graph()
+        for path in self.paths:
+            g.parse(format='turtle', source=path)
+        shapes_graph = ShapesGraph(g)
+        shapes = shapes_graph.shapes  # This property getter triggers shapes harvest.
+        logging.info(f'Loaded {len(g)} triples with {len(shapes)} shapes in {round(time.time() - start, 2)} seconds')
+        if stamps != self.get_stamps():
+            raise RuntimeError('the shacl files changed while they were loaded')
+        return stamps, shapes_graph
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the files if they changed since they were loaded. A reload that fails, e.g. because the files are
+        still being written, keeps the current shapes and is retried when the files change again. Returns True if
+        the shapes were reloaded."""
+        if not self.reload_lock.acquire(blocking=False):
+            return False  # another thread is reloading, use the current shapes meanwhile
+        try:
+            stamps = self.get_stamps()
+            if stamps == self.state[0] or stamps == self.failed_stamps:
+                return False
+            try:
+                self.state = self.load()
+            except Exception:
+                logging.exception('Could not reload the shacl files, the previous shapes are used')
+                self.failed_stamps = stamps
+                return False
+            self.failed_stamps = None
+            return True
+        finally:
+            self.reload_lock.release()
+
+    def validate(self, data_graph: Graph, allow_infos: bool = True, allow_warnings: bool = True,
+                 sliced: bool = False) -> Tuple[bool, Graph, str]:
+        """Validates data_graph like pyshacl.validate, returning (conforms, results_graph, results_text). When sliced,
+        only the shapes that can apply to data_graph are used, see slice_shapes."""
+        shapes_graph = self.get_shapes_graph(data_graph, sliced)
+        validator = Validator(data_graph, shacl_graph=shapes_graph.graph,
+                              options={'allow_infos': allow_infos, 'allow_warnings': allow_warnings})
+        validator.shacl_graph = shapes_graph
+        with self.validation_lock:
+            return validator.run()
+
+    def validate_partitioned(self, data_graph: Graph, jobs: int = os.cpu_count(), partition_size: int = None,
+                             allow_infos: bool = True, allow_warnings: bool = True,
+                             sliced: bool = False) -> Tuple[bool, Graph, str]:
+        """Validates data_graph like validate, one partition of assets at a time, in jobs processes that share the
+        shapes and data_graph via fork. Without fork, the shapes (sliced or not) are sent to the processes as
+        N-Triples. The results of the partitions are merged into one report. partition_size is the number of assets
+        per partition, by default the assets are spread over four partitions per job."""
+        shapes_graph = self.get_shapes_graph(data_graph, sliced)
+        roots = self.get_partition_roots(data_graph)
+        if partition_size is None:
+            partition_size = max(math.ceil(len(roots) / (jobs * 4)), 1)
+        partitions = [roots[i:i + partition_size] for i in range(0, len(roots), partition_size)]
+        options = (allow_infos, allow_warnings)
+
+        if jobs == 1 or len(partitions) < 2:
+            with self.validation_lock:
+                self.set_worker_graphs(None, shapes_graph, data_graph)
+                try:
+                    partition_results = [self.validate_partition(roots, *options) for roots in partitions]
+                finally:
+                    self.set_worker_graphs(None, None, None)
+        else:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                mp_context, initargs = multiprocessing.get_context('fork'), (None, shapes_graph, data_graph)
+            else:
+                mp_context, initargs = None, (shapes_graph.graph.serialize(format='nt'), None, data_graph)
+            with ProcessPoolExecutor(max_workers=min(jobs, len(partitions)), mp_context=mp_context,
+                                     initializer=self.set_worker_graphs, initargs=initargs) as executor:
+                partition_results = list(executor.map(self.validate_partition, partitions,
+                                                      *[[option] * len(partitions) for option in options]))
+        return self.merge_partition_results(shapes_graph, partition_results)
+
+    def get_shapes_graph(self, data_graph: Graph, sliced: bool = False) -> ShapesGraph:
+        """Returns the loaded shapes, reloaded if the files changed, or the slice of them for data_graph."""
+        self.reload_if_changed()
+        shapes_graph = self.shapes_graph
+        if not sliced:
+            return shapes_graph
+        start = time.time()
+        sliced_graph = ShapesGraph(self.slice_shapes(shapes_graph.graph, data_graph))
+        logging.info(f'Sliced the shapes from {len(shapes_graph.graph)} to {len(sliced_graph.graph)} triples and from '
+                     f'{len(shapes_graph.shapes)} to {len(sliced_graph.shapes)} shapes in '
+                     f'{round(time.time() - start, 3)} seconds')
+        return sliced_graph
+
+    @staticmethod
+    def set_worker_graphs(shapes_text: Optional[str], shapes_graph: Optional[ShapesGraph],
+                          data_graph: Optional[Graph]):
+        """Worker initializer of validate_partitioned. Without fork, the shapes are parsed from shapes_text."""
+        if shapes_graph is None and shapes_text is not None:
+            shapes_graph = ShapesGraph(Graph().parse(data=shapes_text, format='nt'))
+        ValidationService.worker_shapes_graph = shapes_graph
+        ValidationService.worker_data_graph = data_graph
+
+    @staticmethod
+    def get_partition_roots(data_graph: Graph) -> List:
+        """Returns the assets of data_graph: the subjects that are no blank node, followed by the blank nodes that are
+        not the value of another node."""
+        roots = sorted({subject for subject in data_graph.subjects() if not isinstance(subject, BNode)})
+        objects = {o for o in data_graph.objects() if isinstance(o, BNode)}
+        roots.extend(sorted({subject for subject in data_graph.subjects()
+                             if isinstance(subject, BNode) and subject not in objects}))
+        return roots
+
+    @staticmethod
+    def get_partition(data_graph: Graph, roots: Iterable) -> Tuple[Graph, Set]:
+        """Returns the partition with roots and the nodes it owns: the roots and the blank nodes of their complex
+        attributes, with all their triples. The partition also has the rdf:type triples of the nodes that are
+        referred to, like the bron and doel of a relation, and the rdfs:subClassOf triples, but does not own them."""
+        partition = Graph()
+        for prefix, namespace in data_graph.namespaces():
+            partition.bind(prefix, namespace)
+        owned = set()
+        referred = set()
+        nodes = list(roots)
+        while nodes:
+            node = nodes.pop()
+            if node in owned:
+                continue
+            owned.add(node)
+            for _, p, o in data_graph.triples((node, None, None)):
+                partition.add((node, p, o))
+                if isinstance(o, BNode):
+                    nodes.append(o)
+                elif not isinstance(o, Literal) and p != RDF.type:
+                    referred.add(o)
+        for node in referred - owned:
+            for triple in data_graph.triples((node, RDF.type, None)):
+                partition.add(triple)
+        for triple in data_graph.triples((None, RDFS.subClassOf, None)):
+            partition.add(triple)
+        return partition, owned
+
+    @staticmethod
+    def validate_partition(roots: List, allow_infos: bool = True,
+                           allow_warnings: bool = True) -> Tuple[bool, List[str], List[BNode], List[Tuple]]:
+        """Validates the partition with roots against the shapes, with only the nodes the partition owns as focus
+        nodes. Returns (conforms, results texts, result nodes, results triples without the report node)."""
+        shapes_graph = ValidationService.worker_shapes_graph
+        partition, owned = ValidationService.get_partition(ValidationService.worker_data_graph, roots)
+        conforms = True
+        reports = []
+        for shape in shapes_graph.shapes:
+            focus = [node for node in shape.focus_nodes(partition) if node in owned]
+            if not focus:
+                continue
+            shape_conforms, shape_reports = shape.validate(partition, focus=focus, allow_infos=allow_infos,
+                                                           allow_warnings=allow_warnings)
+            conforms = conforms and shape_conforms
+            reports.extend(shape_reports)
+        results_graph, _ = Validator.create_validation_report(shapes_graph, conforms, reports)
+        report = results_graph.value(predicate=RDF.type, object=SH.ValidationReport)
+        return (conforms, [result[0] for result in reports], list(results_graph.objects(report, SH.result)),
+                [triple for triple in results_graph if triple[0] != report])
+
+    @staticmethod
+    def merge_partition_results(shapes_graph: ShapesGraph, partition_results: List[Tuple]) -> Tuple[bool, Graph, str]:
+        """Merges the results of validate_partition into one report, like the one of pyshacl."""
+        conforms = all(partition_conforms for partition_conforms, _, _, _ in partition_results)
+        results_graph = Graph()
+        for prefix, namespace in shapes_graph.graph.namespace_manager.namespaces():
+            results_graph.namespace_manager.bind(prefix, namespace)
+        report = BNode()
+        results_graph.add((report, RDF.type, SH.ValidationReport))
+        results_graph.add((report, SH.conforms, Literal(conforms)))
+        results_text = f'Validation Report\nConforms: {conforms}\n'
+        texts = [text for _, partition_texts, _, _ in partition_results for text in partition_texts]
+        if texts:
+            results_text += f'Results ({len(texts)}):\n' + ''.join(texts)
+        for _, _, result_nodes, triples in partition_results:
+            for result_node in result_nodes:
+                results_graph.add((report, SH.result, result_node))
+            for triple in triples:
+                results_graph.add(triple)
+        return conforms, results_graph, results_text
+
+    @staticmethod
+    def slice_shapes(shapes_graph: Graph, data_graph: Graph) -> Graph:
+        """Returns the part of shapes_graph that can apply to data_graph: the shapes that target the rdf:types of the
+        data, their superclasses or the predicates of the data, with the property shapes, nested datatype shapes,
+        enum lists and other nodes they refer to. The triples that are not about shapes, like the ontology, are kept
+        as well. Validating data_graph against the slice gives the same results as against shapes_graph."""
+        shape_types = (SH.NodeShape, SH.PropertyShape)
+        shapes = {s for shape_type in shape_types for s in shapes_graph.subjects(RDF.type, shape_type)}
+
+        classes = set(data_graph.objects(None, RDF.type))
+        superclasses = list(classes)
+        while superclasses:
+            class_uri = superclasses.pop()
+            for g in [shapes_graph, data_graph]:
+                for superclass in g.objects(class_uri, RDFS.subClassOf):
+                    if superclass not in classes:
+                        classes.add(superclass)
+                        superclasses.append(superclass)
+        predicates = set(data_graph.predicates())
+        targets = {SH.targetClass: classes, SH.targetSubjectsOf: predicates, SH.targetObjectsOf: predicates,
+                   SH.targetNode: set(data_graph.subjects()) | set(data_graph.objects())}
+
+        nodes = [s for target, values in targets.items() for s, o in shapes_graph.subject_objects(target)
+                 if o in values]
+        nodes.extend(s for s in set(shapes_graph.subjects()) if isinstance(s, URIRef) and s not in shapes)
+        sliced = Graph()
+        for prefix, namespace in shapes_graph.namespaces():
+            sliced.bind(prefix, namespace)
+        visited = set()
+        while nodes:
+            node = nodes.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            for triple in shapes_graph.triples((node, None, None)):
+                sliced.add(triple)
+                if isinstance(triple[2], BNode) or triple[2] in shapes:
+                    nodes.append(triple[2])
+        return sliced
+
+    @classmethod
+    def parse_data(cls, data: bytes, content_type: str) -> Graph:
+        data_format = cls.data_formats.get(content_type.split(';')[0].strip())
+        if data_format is None:
+            raise ValueError(f'Content type {content_type} is not supported, use one of {", ".join(cls.data_formats)}')
+        return Graph().parse(data=data, format=data_format)
+
+    def parse_request_data(self, data: bytes, content_type: str) -> Graph:
+        if content_type.split(';')[0].strip() != 'application/json':
+            return self.parse_data(data, content_type)
+        if self.json_loader is None:
+            raise ValueError('OTLMOW json is only supported by a service with a subset database')
+        return self.json_loader.load(io.BytesIO(data))
+
+    def create_server(self, host: str = 'localhost', port: int = 8080) -> ThreadingHTTPServer:
+        """Creates a server that validates the data POSTed to /validate and answers with the conforms flag and the
+        results text as json. GET /health answers when the shapes are loaded."""
+        service = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/health':
+                    self.send_json(404, {'error': f'{self.path} not found'})
+                    return
+                self.send_json(200, {'triples': len(service.shapes_graph.graph)})
+
+            def do_POST(self):
+                if self.path != '/validate':
+                    self.send_json(404, {'error': f'{self.path} not found'})
+                    return
+                data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                try:
+                    content_type = self.headers.get('Content-Type', 'application/ld+json')
+                    data_graph = service.parse_request_data(data, content_type)
+                except Exception as exc:
+                    self.send_json(400, {'error': str(exc)})
+                    return
+                start = time.time()
+                try:
+                    conforms, _, results_text = service.validate(data_graph)
+                except Exception as exc:
+                    logging.exception('Could not validate the data')
+                    self.send_json(500, {'error': str(exc)})
+                    return
+                self.send_json(200, {'conforms': conforms, 'results_text': results_text, 'triples': len(data_graph),
+                                     'seconds': round(time.time() - start, 4)})
+
+            def send_json(self, status: int, body: dict):
+                content = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                logging.debug(format, *args)
+
+        return ThreadingHTTPServer((host, port), RequestHandler)
+
+    @classmethod
+    def request_validation(cls, url: str, data: bytes, content_type: str = 'application/ld+json',
+                           timeout: Optional[float] = None) -> Dict:
+        """Sends data to the /validate endpoint of a running service and returns its json answer."""
+        request = urllib.request.Request(url.rstrip('/') + '/validate', data=data, method='POST',
+                                         headers={'Content-Type': content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            raise ValueError(json.loads(exc.read()).get('error', str(exc))) from exc
@@ -1,10 +1,94 @@
+import argparse
+import logging
 from pathlib import Path
+from CodelistStore import CodelistStore
+from OTLEnumerationCreator import OTLEnumerationCreator
 from OTLShaclGenerator import OTLShaclGenerator
+from OTLSubsetModel import OTLSubsetModel
+from SQLDbReader import SQLDbReader
+from ShaclOutputCache import ShaclOutputCache
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Generate the SHACL shapes and ontology files for an OTL subset.')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of processes used to build the shapes, 1 builds them in this process')
+    parser.add_argument('--union-encoding', choices=['pairwise', 'xone'], default='pairwise',
+                        help='encoding of the union datatype constraints')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='query an indexed in memory copy of the subset instead of the file')
+    parser.add_argument('--materialize-inheritance', action='store_true',
+                        help='write the subclasses into the shapes, so they validate without the ontology and rdfs '
+                             'inference')
+    parser.add_argument('--model', type=Path,
+                        help='load the subset model from this file instead of querying the subset, or save it there '
+                             'if it does not exist yet')
+    parser.add_argument('--stream', action='store_true',
+                        help='write the shapes and ontology straight to N-Triples files instead of building graphs')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only rebuild the shapes whose rows changed since the previous run (see the manifest)')
+    parser.add_argument('--cache-dir', type=Path,
+                        help='reuse the files generated for the same subset, codelist snapshot and settings')
+    parser.add_argument('--codelist-snapshot',
+                        help='identifies the codelist release the files are generated with, required by --cache-dir')
+    parser.add_argument('--codelist-cache-dir', type=Path,
+                        help='keep the codelist download and the parsed codelists here, to parse them only once')
+    parser.add_argument('--codelist-path', type=Path,
+                        help='read the codelists from this local all.ttl or all.ttl.zip instead of downloading them')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the previous codelist download in --codelist-cache-dir instead of downloading')
+    parser.add_argument('--lazy-codelists', action='store_true',
+                        help='only parse the codelists the subset uses, instead of all of them up front')
+    args = parser.parse_args()
+    if args.offline and args.codelist_path is None and args.codelist_cache_dir is None:
+        parser.error('--offline requires --codelist-path or --codelist-cache-dir')
+    modes = [option for option, used in [('--cache-dir', args.cache_dir is not None), ('--incremental', args.incremental),
+                                         ('--stream', args.stream), ('--model', args.model is not None)] if used]
+    if len(modes) > 1:
+        parser.error(f'{" and ".join(modes)} can not be combined')
+    if args.incremental and (args.jobs > 1 or args.materialize_inheritance):
+        parser.error('--incremental does not support --jobs or --materialize-inheritance')
+    if args.stream and args.jobs > 1:
+        parser.error('--stream does not support --jobs')
+
     subset_path = Path('OTL_Dynamische_borden.db')
     shacl_path = Path('generated_shacl_otl_dyn_borden.ttl')
     ont_path = Path('generated_ont_otl_dyn_borden.ttl')
-    shacl, ont = OTLShaclGenerator.generate_shacl_from_otl(subset_path=subset_path, shacl_path=shacl_path,
-                                                           ont_path=ont_path)
+    codelist_paths = {} if args.codelist_path is None else {
+        OTLEnumerationCreator.default_environment: args.codelist_path}
+    codelist_store = CodelistStore(cache_dir=args.codelist_cache_dir, codelist_paths=codelist_paths,
+                                   offline=args.offline, lazy=args.lazy_codelists)
+    if args.cache_dir is not None:
+        if args.codelist_snapshot is None:
+            parser.error('--cache-dir requires --codelist-snapshot')
+        OTLShaclGenerator.generate_shacl_files_with_cache(
+            subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path,
+            cache=ShaclOutputCache(args.cache_dir), codelist_snapshot=args.codelist_snapshot,
+            union_encoding=args.union_encoding, jobs=args.jobs, codelist_store=codelist_store, in_memory=args.in_memory,
+            materialize_inheritance=args.materialize_inheritance)
+    elif args.incremental:
+        OTLShaclGenerator.regenerate_shacl_from_otl(subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path,
+                                                    union_encoding=args.union_encoding,
+                                                    codelist_store=codelist_store, in_memory=args.in_memory)
+    elif args.stream:
+        OTLShaclGenerator.stream_shacl_from_otl(subset_path=subset_path, shacl_path=shacl_path.with_suffix('.nt'),
+                                                ont_path=ont_path.with_suffix('.nt'),
+                                                union_encoding=args.union_encoding, codelist_store=codelist_store,
+                                                in_memory=args.in_memory,
+                                                materialize_inheritance=args.materialize_inheritance)
+    elif args.model is not None:
+        if args.model.exists():
+            model = OTLSubsetModel.load(args.model)
+        else:
+            with SQLDbReader(subset_path, in_memory=args.in_memory) as reader:
+                model = OTLShaclGenerator.read_model_from_reader(reader)
+            model.save(args.model)
+        shacl, ont = OTLShaclGenerator.generate_shacl_from_model(
+            model=model, shacl_path=shacl_path, ont_path=ont_path, union_encoding=args.union_encoding,
+            jobs=args.jobs, codelist_store=codelist_store, materialize_inheritance=args.materialize_inheritance)
+    else:
+        shacl, ont = OTLShaclGenerator.generate_shacl_from_otl(
+            subset_path=subset_path, shacl_path=shacl_path, ont_path=ont_path,
+            union_encoding=args.union_encoding, jobs=args.jobs, codelist_store=codelist_store,
+            in_memory=args.in_memory, materialize_inheritance=args.materialize_inheritance)
@@ -0,0 +1,48 @@
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from CodelistStore import CodelistStore
+from OTLEnumerationCreator import OTLEnumerationCreator
+from OTLShaclGenerator import OTLShaclGenerator
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Generate the SHACL shapes and ontology files for many OTL subsets, '
+                                                 'downloading and parsing the codelists only once.')
+    parser.add_argument('subsets', type=Path, nargs='+',
+                        help='subset .db files, or directories whose .db files are all generated')
+    parser.add_argument('--output-dir', type=Path, default=Path('.'),
+                        help='directory the generated_shacl_<subset>.ttl and generated_ont_<subset>.ttl files go to')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help='number of subsets generated at the same time')
+    parser.add_argument('--union-encoding', choices=['pairwise', 'xone'], default='pairwise',
+                        help='encoding of the union datatype constraints')
+    parser.add_argument('--codelist-cache-dir', type=Path,
+                        help='keep the codelist download and the parsed codelists here, to parse them only once')
+    parser.add_argument('--codelist-path', type=Path,
+                        help='read the codelists from this local all.ttl or all.ttl.zip instead of downloading them')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the previous codelist download in --codelist-cache-dir instead of downloading')
+    parser.add_argument('--lazy-codelists', action='store_true',
+                        help='only parse the codelists the subset uses, instead of all of them up front')
+    args = parser.parse_args()
+    if args.offline and args.codelist_path is None and args.codelist_cache_dir is None:
+        parser.error('--offline requires --codelist-path or --codelist-cache-dir')
+
+    subset_paths = []
+    for path in args.subsets:
+        subset_paths.extend(sorted(path.glob('*.db')) if path.is_dir() else [path])
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    codelist_paths = {} if args.codelist_path is None else {
+        OTLEnumerationCreator.default_environment: args.codelist_path}
+    codelist_store = CodelistStore(cache_dir=args.codelist_cache_dir, codelist_paths=codelist_paths,
+                                   offline=args.offline, lazy=args.lazy_codelists)
+    generated = OTLShaclGenerator.generate_shacl_for_subsets(
+        subset_paths=subset_paths, output_dir=args.output_dir, jobs=args.jobs, union_encoding=args.union_encoding,
+        codelist_store=codelist_store)
+    if len(generated) < len(subset_paths):
+        sys.exit(f'{len(subset_paths) - len(generated)} of {len(subset_paths)} subsets could not be generated')
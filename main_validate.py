@@ -4,29 +4,72 @@
 # http://www.validatingrdf.com/
 # https://15926.org/topics/SHACL/index.htm
 
+import argparse
+import logging
 import time
 from pathlib import Path
 
 from pyshacl import validate
 from rdflib import Graph
 
+from CompiledShaclValidator import CompiledShaclValidator
+from OTLMOWJsonLoader import OTLMOWJsonLoader
+from ValidationService import ValidationService
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Validate the assets against the generated SHACL shapes.')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='validate partitions of the assets in this many processes')
+    parser.add_argument('--partition-size', type=int,
+                        help='number of assets per partition, by default four partitions per job')
+    parser.add_argument('--slice', action='store_true',
+                        help='only validate with the shapes that can apply to the rdf:types and predicates of the '
+                             'assets')
+    parser.add_argument('--otlmow-json', action='store_true',
+                        help='load the assets from the OTLMOW json with the subset database instead of from json-ld')
+    parser.add_argument('--compiled', action='store_true',
+                        help='validate with the shapes compiled to python functions instead of with pyshacl')
+    args = parser.parse_args()
+    if args.compiled and args.jobs > 1:
+        parser.error('--compiled can not be combined with --jobs')
+
     # load the SHACL graphs
-    g = Graph()
-    g.parse(format='turtle', source=Path('generated_ont_otl_dyn_borden.ttl'))
-    g.parse(format='turtle', source=Path('generated_shacl_otl_dyn_borden.ttl'))
+    if args.jobs > 1:
+        service = ValidationService(shacl_path=Path('generated_shacl_otl_dyn_borden.ttl'),
+                                    ont_path=Path('generated_ont_otl_dyn_borden.ttl'))
+        g = service.shapes_graph.graph
+    else:
+        g = Graph()
+        g.parse(format='turtle', source=Path('generated_ont_otl_dyn_borden.ttl'))
+        g.parse(format='turtle', source=Path('generated_shacl_otl_dyn_borden.ttl'))
     print(f'Loaded {len(g)} triples in SHACL graph')
 
     # load the data graph
-    h = Graph()
-    h.parse(format='json-ld', source=Path('assets_dyn_borden.jsonld'))
+    if args.otlmow_json:
+        with open('assets_dyn_borden.json', 'rb') as json_file:
+            h = OTLMOWJsonLoader(subset_path=Path('OTL_Dynamische_borden.db')).load(json_file)
+    else:
+        h = Graph()
+        h.parse(format='json-ld', source=Path('assets_dyn_borden.jsonld'))
     print(f'Loaded {len(h)} triples in data graph')
 
     start = time.time()
-    r = validate(h,
-                 shacl_graph=g,
-                 allow_infos=True,
-                 allow_warnings=True)
+    if args.jobs > 1:
+        r = service.validate_partitioned(h, jobs=args.jobs, partition_size=args.partition_size, sliced=args.slice)
+    else:
+        if args.slice:
+            sliced = ValidationService.slice_shapes(g, h)
+            print(f'Sliced the SHACL graph from {len(g)} to {len(sliced)} triples in '
+                  f'{round(time.time() - start, 2)} seconds')
+            g = sliced
+        if args.compiled:
+            r = CompiledShaclValidator(g).validate(h, allow_infos=True, allow_warnings=True)
+        else:
+            r = validate(h,
+                         shacl_graph=g,
+                         allow_infos=True,
+                         allow_warnings=True)
     conforms, results_graph, results_text = r
     end = time.time()
     print(f'Validation done in {round(end - start, 2)} seconds')
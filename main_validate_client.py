@@ -0,0 +1,27 @@
+import argparse
+import sys
+from pathlib import Path
+
+from ValidationService import ValidationService
+
+content_types = {'.jsonld': 'application/ld+json', '.ttl': 'text/turtle', '.nt': 'application/n-triples',
+                 '.json': 'application/json'}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate asset files with a running validation service, '
+                                                 'see main_validation_service.py.')
+    parser.add_argument('data', type=Path, nargs='+', help='.jsonld, .ttl, .nt or OTLMOW .json files with the assets')
+    parser.add_argument('--url', default='http://localhost:8080', help='url of the validation service')
+    args = parser.parse_args()
+
+    conforms = True
+    for path in args.data:
+        if path.suffix not in content_types:
+            parser.error(f'{path} is not a {", ".join(content_types)} file')
+        response = ValidationService.request_validation(args.url, path.read_bytes(), content_types[path.suffix])
+        print(f'{path}: {response["triples"]} triples validated in {response["seconds"]} seconds')
+        print(response['results_text'])
+        conforms = conforms and response['conforms']
+    if not conforms:
+        sys.exit(1)
@@ -0,0 +1,30 @@
+import argparse
+import logging
+from pathlib import Path
+
+from ValidationService import ValidationService
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Serve validations against SHACL shapes that are loaded only once, '
+                                                 'and reloaded when the shapes files change.')
+    parser.add_argument('--shacl', type=Path, default=Path('generated_shacl_otl_dyn_borden.ttl'),
+                        help='generated SHACL shapes file')
+    parser.add_argument('--ont', type=Path, default=Path('generated_ont_otl_dyn_borden.ttl'),
+                        help='generated ontology file')
+    parser.add_argument('--subset', type=Path,
+                        help='subset database, to also accept OTLMOW json with the application/json content type')
+    parser.add_argument('--host', default='localhost', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    args = parser.parse_args()
+
+    server = ValidationService(shacl_path=args.shacl, ont_path=args.ont, subset_path=args.subset).create_server(
+        host=args.host, port=args.port)
+    logging.info(f'Validating on http://{args.host}:{server.server_port}/validate')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()